@@ -18,23 +18,61 @@ Fixes:
 - All other enhancements (size‑resolved dust, weathering, greenhouse effect, Omori aftershocks) are kept.
 - Fixed overflow in silicate_weathering_rate() by clamping the exponential argument.
 
+The impact is followed by one of four integrators (--integrator euler,
+ivp, adaptive or multirate), for one scenario, for a --sweep of them over
+a process pool or for an AsteroidImpactEnsemble.  Runs can be
+checkpointed, resumed, cached and recorded sparsely, and are written as
+CSV, HTML, JSON, NDJSON or .npy.  --help lists the options, and the class
+or function behind each one documents it.
+
 Usage examples:
   python earth_asteroid_enhanced.py --diameter 12 --output impact_enhanced
   python earth_asteroid_enhanced.py --diameter 10 --target oceanic --years 0 100000
+  python earth_asteroid_enhanced.py --sweep diameter=5,10,15 --sweep seed=0:99 --workers 8
+  python earth_asteroid_enhanced.py --years 0 1000000 --stream --format ndjson -o - | jq .co2_ppm
+  python earth_asteroid_enhanced.py --integrator ivp --years 0 1000000
+  python earth_asteroid_enhanced.py --integrator multirate --dt-slow 1000 --years 0 1000000
+  python earth_asteroid_enhanced.py --resume asteroid_impact_enhanced_checkpoint.json --extend-to 2000000
+  python earth_asteroid_enhanced.py --years 0 1000000 --output-times logspace:0.01:1e6:200
+  python earth_asteroid_enhanced.py --years 0 1000000 --steady-state --output-times linspace:0:1e6:101
+  python -m earth_sims asteroid --diameter 10 --years 0 1000
 """
 
 import argparse
-import csv
+import bisect
+import contextlib
+import copy
+import functools
+import inspect
+import itertools
 import json
 import logging
 import math
 import sys
+import tracemalloc
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import numpy as np
-from scipy.integrate import solve_ivp
-from scipy.optimize import fsolve
+
+# The code shared by the simulators lives in the earth_sims package at the
+# repository root, which is not on the path when this script is run directly
+if str(Path(__file__).resolve().parent.parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import earth_sims.cache
+from earth_sims.cache import CACHE_MAX_BYTES
+from earth_sims.carbonate import CARBONATE_MODELS, carbonate_dic, equilibrium_ph
+from earth_sims.ivp import DenseTrajectory, co2_floor_event, temperature_threshold_event
+import earth_sims.profiling
+import earth_sims.recording
+from earth_sims.recording import parse_output_times, resample_results
+import earth_sims.sweep
+from earth_sims.telemetry import run_telemetry
+import earth_sims.writers
+from earth_sims.writers import write_csv, write_json, write_ndjson
+import earth_sims.trajectory
+from earth_sims.trajectory import convert_to_npy, write_npy
 
 # ----------------------------------------------------------------------
 # Physical constants
@@ -75,6 +113,8 @@ WEATHERING_CO2_HALF_SAT = 500.0        # ppm, for Michaelis‑Menten
 # Ocean carbonate chemistry (simplified buffer factor)
 BUFFER_FACTOR = 10.0                    # Revelle factor typical
 PIC_POC_RAIN_RATIO = 0.1                # carbonate to organic export
+# --carbonate: the original 'ratio' model is pH = -log10(DIC/ALK · 1e-8)
+# clamped to 6–8.5; 'equilibrium' and 'table' are earth_sims.carbonate
 
 # Methane lifetime
 METHANE_LIFETIME_BASELINE = 10.0        # years
@@ -93,6 +133,74 @@ BASELINE_BIODIVERSITY = 1.0
 BASELINE_METHANE = 700.0                  # ppb
 BASELINE_MAGNETOSPHERE = 1.0
 
+# Surface temperature (°C) above which the ejecta pulse releases methane
+PULSE_METHANE_THRESHOLD = 30.0
+
+INTEGRATORS = ('euler', 'adaptive', 'ivp', 'multirate')
+
+# Aftershock samplers: one Bernoulli draw per step with probability
+# 0.1·intensity·dt (the original scheme, only right while that is ≪ 1), or
+# the exact event times of the Omori Poisson process
+AFTERSHOCK_SAMPLERS = ('step', 'poisson')
+
+# Layout version of checkpoint snapshots (snapshot()/from_snapshot())
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Step-doubling controller (--integrator adaptive)
+ADAPTIVE_SAFETY = 0.9
+ADAPTIVE_MAX_GROWTH = 5.0                 # largest dt increase per step
+ADAPTIVE_MIN_SHRINK = 0.2                 # largest dt decrease per rejection
+ADAPTIVE_DT_MIN = 1e-6                    # years; a step this small is always accepted
+ADAPTIVE_MAX_QUAKE_PROBABILITY = 0.05     # cap on the aftershock probability per step
+
+# Steady-state fast-forward (steady_tol): the output columns whose change per
+# year, relative to their magnitude but at least the scale below, must fall
+# under the rate (the aftershock columns are not watched: their quakes are
+# still drawn exactly), the default rate, the relative step of the
+# finite-difference Jacobian, and the fraction of the time since the start
+# one linearization may span
+STEADY_COLUMNS = ('temp_anomaly_c', 'co2_ppm', 'ocean_ph', 'biodiversity_index', 'methane_ppb',
+                  'dust_optical_depth', 'magnetosphere_strength')
+STEADY_SCALE = np.array([1.0, BASELINE_CO2, 1.0, 1.0, BASELINE_METHANE, 1.0, 1.0])
+STEADY_TOL = 1e-4
+STEADY_JACOBIAN_STEP = 1e-7
+STEADY_SPAN_FRACTION = 0.1
+
+# Multi-rate integrator (--integrator multirate): the longest macro step of
+# the slow variables, and the fraction of the time since the start a macro
+# step may span, so that the post-impact transient is still resolved
+MULTIRATE_DT_SLOW = 1000.0                # years
+MULTIRATE_SLOW_FRACTION = 0.1
+
+# Compiled Euler kernel (--jit).  Columns that must match the Python loop
+# bit for bit, and the tolerance for the rest
+JIT_EXACT_COLUMNS = ('year', 'dust_optical_depth', 'subsurface_habitat_fraction', 'seismic_intensity')
+JIT_PARITY_RTOL = 1e-9
+# Steps per kernel call when a jitted run records only some rows
+# (output_times, record_changes): the kernel fills a buffer this long,
+# which is reduced to the recorded rows before the next call, instead of
+# the whole trajectory
+COMPILED_BLOCK_STEPS = 4096
+
+# Aftershock sub-model: the only consumer of the rng, and what it writes is
+# never read by the rest of the model.  So an Euler run's other variables
+# are the same for every seed: with run(replay=True) (sweep workers, the
+# server) each process keeps the last CORE_MEMO_SIZE such trajectories and
+# further seeds only replay the aftershocks
+STOCHASTIC_STATE = ('subsurface_habitat', 'last_quake_time', 'quake_times', 'quake_horizon')
+CORE_MEMO_SIZE = 8
+
+# Implicit (--integrator ivp) backend
+IVP_METHODS = ('BDF', 'Radau', 'LSODA')
+# ODE state order and the magnitude each variable's atol is scaled by.  DIC
+# is carried as its logarithm: it grows exponentially while CO₂ stays high,
+# and only enters the output through pH, which is linear in log(DIC)
+IVP_STATE = ('temp_anomaly', 'co2_ppm', 'methane_ppb', 'log_ocean_dic', 'biodiversity', 'magnetosphere')
+IVP_ATOL_SCALE = np.array([1.0, BASELINE_CO2, BASELINE_METHANE, 1.0, 1.0, 1.0])
+# The Euler step collapses biodiversity onto survival instantly; the ODE
+# relaxes onto it on this (stiff) timescale instead
+BIODIVERSITY_COLLAPSE_TIME = 1e-3         # years
+
 
 # ----------------------------------------------------------------------
 # Helper functions – CORRECTED VERSIONS
@@ -120,34 +228,33 @@ def dust_ejected(energy_J: float, diameter: float, density: float) -> float:
     mass_impactor = (4.0/3.0) * math.pi * (diameter/2.0)**3 * density
     return 100.0 * mass_impactor
 
-def solar_extinction(dust_fine: float, dust_coarse: float) -> float:
+def solar_extinction(dust_fine, dust_coarse):
     """Optical depth from fine dust only (coarse contributes little)."""
     tau = EXTINCTION_CROSS_SECTION * dust_fine / (2 * math.pi * EARTH_RADIUS**2)
     return tau
 
-def temperature_drop(tau: float) -> float:
+def temperature_drop(tau):
     """
     Temperature anomaly (°C) from dust optical depth.
     Uses a logarithmic relation that saturates at large τ.
     """
-    return -8.0 * math.log(1.0 + tau)
+    return -8.0 * np.log(1.0 + tau)
 
-def methane_lifetime(tau: float) -> float:
+def methane_lifetime(tau):
     """Methane lifetime depends on UV flux (inversely related to dust)."""
-    if tau > 10:
-        return METHANE_LIFETIME_BASELINE * METHANE_UV_SENSITIVITY
-    else:
-        return METHANE_LIFETIME_BASELINE
+    return np.where(tau > 10,
+                    METHANE_LIFETIME_BASELINE * METHANE_UV_SENSITIVITY,
+                    METHANE_LIFETIME_BASELINE)[()]
 
-def co2_forcing(co2_ppm: float) -> float:
+def co2_forcing(co2_ppm):
     """Radiative forcing from CO₂ (W/m²)."""
-    return 5.35 * math.log(co2_ppm / BASELINE_CO2)
+    return 5.35 * np.log(co2_ppm / BASELINE_CO2)
 
-def methane_forcing(ch4_ppb: float) -> float:
+def methane_forcing(ch4_ppb):
     """Radiative forcing from methane (W/m²)."""
-    return 0.036 * (math.sqrt(ch4_ppb) - math.sqrt(BASELINE_METHANE))
+    return 0.036 * (np.sqrt(ch4_ppb) - np.sqrt(BASELINE_METHANE))
 
-def silicate_weathering_rate(temp: float, co2: float) -> float:
+def silicate_weathering_rate(temp, co2):
     """
     CO₂ drawdown rate (GtC/yr) from silicate weathering.
     Clamp the exponential argument to avoid overflow for unphysically high temperatures.
@@ -155,13 +262,468 @@ def silicate_weathering_rate(temp: float, co2: float) -> float:
     arg = WEATHERING_AC * (temp - REF_TEMP)
     # Clamp argument to avoid overflow in exp
     MAX_ARG = 50.0
-    if arg > MAX_ARG:
-        temp_factor = math.exp(MAX_ARG)
-    else:
-        temp_factor = math.exp(arg)
+    temp_factor = np.exp(np.minimum(arg, MAX_ARG))
     co2_factor = co2 / (co2 + WEATHERING_CO2_HALF_SAT)
     return WEATHERING_BASELINE * temp_factor * co2_factor
 
+def _clamp(x, lo, hi):
+    """
+    Array version of max(lo, min(hi, x)).
+    Keeps the builtins' NaN behaviour (a NaN input comes back as a bound),
+    so ensemble members track the scalar model exactly.
+    """
+    x = np.where(x < hi, x, hi)
+    return np.where(x > lo, x, lo)
+
+def _relaxation(gap, dt: float, timescale: float, exponential: bool = False):
+    """
+    Change over dt of a variable relaxing towards its target with the
+    given timescale: the explicit Euler step, or the exact exponential.
+    """
+    if exponential:
+        return gap * -math.expm1(-dt / timescale)
+    return gap * dt / timescale
+
+
+# ----------------------------------------------------------------------
+# Exogenous forcing schedule – state‑independent, shared across runs
+# ----------------------------------------------------------------------
+def forcing_blocks(start_year: float, end_year: float, dt_initial: float, dt_final: float,
+                   fine_rate: float = FINE_DUST_FALLOUT_RATE,
+                   coarse_rate: float = COARSE_DUST_FALLOUT_RATE,
+                   block: int = 4096,
+                   position: Optional[Tuple[float, float, float, float]] = None):
+    """
+    Generate the forcing schedule lazily, block by block, as arrays
+    (times, dts, fine_fraction, coarse_fraction, seismic_intensity).
+    ForcingSchedule concatenates the same blocks, so both agree bit for bit.
+    position = (time, dt, fine_fraction, coarse_fraction) of the last step
+    taken continues a run part way; the default starts at start_year.
+    """
+    if position is None:
+        position = (start_year, dt_initial, 1.0, 1.0)
+    t, dt, fine_left, coarse_left = position
+    t += dt
+    while t <= end_year:
+        # Same float arithmetic as the original run() loop, so times match exactly
+        times, dts = [], []
+        while t <= end_year and len(times) < block:
+            if t > 100:
+                dt = min(dt_final, dt * 1.1)
+            elif t > 10:
+                dt = min(1.0, dt * 1.2)
+            times.append(t)
+            dts.append(dt)
+            t += dt
+        times = np.array(times, dtype=float)
+        dts = np.array(dts, dtype=float)
+        # cumprod seeded with the carried fraction continues the product exactly
+        fine = np.cumprod(np.concatenate(([fine_left], np.exp(-fine_rate * dts))))[1:]
+        coarse = np.cumprod(np.concatenate(([coarse_left], np.exp(-coarse_rate * dts))))[1:]
+        fine_left, coarse_left = fine[-1], coarse[-1]
+        yield times, dts, fine, coarse, 1.0 / (1.0 + OMORI_K * (times - 0.0)**OMORI_P)
+
+def iter_forcing_steps(blocks, dust_fine0: float):
+    """
+    Yield (k, t, dt, fine_fraction, coarse_fraction, tau, seismic_intensity)
+    per step as Python floats from an iterable of forcing blocks.
+    """
+    k = 0
+    for times, dts, fine, coarse, intensity in blocks:
+        yield from zip(range(k, k + len(times)), times.tolist(), dts.tolist(),
+                       fine.tolist(), coarse.tolist(),
+                       solar_extinction(fine * dust_fine0, 0.0).tolist(), intensity.tolist())
+        k += len(times)
+
+
+def omori_intensity(t):
+    """Normalised Omori aftershock intensity t years after the impact."""
+    return 1.0 / (1.0 + OMORI_K * (t - 0.0)**OMORI_P)
+
+
+def sample_aftershocks(rng, start: float, end: float) -> np.ndarray:
+    """
+    Sorted aftershock times in (start, end] of the non‑homogeneous Poisson
+    process with rate 0.1·omori_intensity(t) per year, sampled by thinning.
+    The rate only falls, so on each interval of a geometric grid its value
+    at the left edge bounds it (with OMORI_P = 1 at least half the
+    candidates are kept).  Three rng calls, whatever the horizon.
+    """
+    start = max(start, 0.0)
+    if not end > start:
+        return np.empty(0)
+    edges = [start]
+    while edges[-1] < end:
+        edges.append(min(2.0 * edges[-1] + 1.0 / OMORI_K, end))
+    lo, hi = np.array(edges[:-1]), np.array(edges[1:])
+    bound = 0.1 * omori_intensity(lo)
+    counts = rng.poisson(bound * (hi - lo))
+    times = rng.uniform(np.repeat(lo, counts), np.repeat(hi, counts))
+    keep = rng.random(len(times)) * np.repeat(bound, counts) < 0.1 * omori_intensity(times)
+    return np.sort(times[keep])
+
+
+class ForcingSchedule:
+    """
+    The parts of run()/step() that do not depend on the evolving state,
+    computed once as whole arrays: the step times and sizes from the
+    dt growth rule, the fraction of fine/coarse dust left after each step,
+    and the Omori seismic intensity.  Dust masses and optical depth are
+    scaled from these by the scenario's initial load.
+    """
+
+    def __init__(self, start_year: float, end_year: float, dt_initial: float, dt_final: float,
+                 fine_rate: float = FINE_DUST_FALLOUT_RATE,
+                 coarse_rate: float = COARSE_DUST_FALLOUT_RATE,
+                 position: Optional[Tuple[float, float, float, float]] = None):
+        blocks = list(forcing_blocks(start_year, end_year, dt_initial, dt_final,
+                                     fine_rate, coarse_rate, position=position))
+        if blocks:
+            columns = [np.concatenate(c) for c in zip(*blocks)]
+        else:
+            columns = [np.empty(0) for _ in range(5)]
+        (self.times, self.dts, self.fine_fraction, self.coarse_fraction,
+         self.seismic_intensity) = columns
+        for arr in (self.times, self.dts, self.fine_fraction, self.coarse_fraction,
+                    self.seismic_intensity):
+            arr.setflags(write=False)   # shared between runs through the cache
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def pulse_step(self, pulse_time: float) -> int:
+        """Index of the step on which a pulse scheduled at pulse_time fires."""
+        return int(np.searchsorted(self.times, pulse_time, side='left'))
+
+    def dust(self, dust_fine0, dust_coarse0) -> Tuple[np.ndarray, np.ndarray]:
+        """Fine and coarse dust mass after each step (per member for array loads)."""
+        return (np.multiply.outer(self.fine_fraction, dust_fine0),
+                np.multiply.outer(self.coarse_fraction, dust_coarse0))
+
+    def blocks(self, block: int = 4096):
+        """The stored arrays in the block form produced by forcing_blocks()."""
+        for start in range(0, len(self), block):
+            stop = start + block
+            yield (self.times[start:stop], self.dts[start:stop], self.fine_fraction[start:stop],
+                   self.coarse_fraction[start:stop], self.seismic_intensity[start:stop])
+
+    def iter_steps(self, dust_fine0: float, block: int = 4096):
+        """Per-step forcing as Python floats; see iter_forcing_steps()."""
+        return iter_forcing_steps(self.blocks(block), dust_fine0)
+
+    def optical_depth(self, dust_fine0) -> np.ndarray:
+        """Dust optical depth after each step for an initial fine-dust load."""
+        return solar_extinction(np.multiply.outer(self.fine_fraction, dust_fine0), 0.0)
+
+
+@functools.lru_cache(maxsize=32)
+def forcing_schedule(start_year: float, end_year: float, dt_initial: float, dt_final: float,
+                     fine_rate: float, coarse_rate: float,
+                     position: Optional[Tuple[float, float, float, float]] = None) -> ForcingSchedule:
+    """Cached ForcingSchedule; every scenario on the same grid shares one instance."""
+    return ForcingSchedule(start_year, end_year, dt_initial, dt_final, fine_rate, coarse_rate,
+                           position)
+
+
+# ----------------------------------------------------------------------
+# Compiled Euler kernel (optional, needs Numba)
+# ----------------------------------------------------------------------
+# Flat state vector the kernel advances in place; booleans are stored as 0/1
+KERNEL_STATE = ('temp_anomaly', 'co2_ppm', 'ocean_dic', 'ocean_ph', 'biodiversity', 'methane_ppb',
+                'magnetosphere', 'subsurface_habitat', 'seismic_intensity', 'last_quake_time',
+                'ejecta_pulse_triggered')
+
+def euler_kernel(state, ocean_alk, pulse_time, pulse_temp_increment,
+                 times, dts, tau, intensity, rng, poisson, quakes, out):
+    """
+    The Euler time loop of AsteroidImpactEnhanced._iter_rows() over a whole
+    forcing schedule, written against a flat state vector (KERNEL_STATE
+    order) so Numba can compile it.  Row i of the run goes to out[:, i] in
+    STATE_COLUMNS order; aftershocks are drawn from rng exactly as the
+    Python loop draws them or, with poisson, taken from the sorted quake
+    times, of which the number used is returned.  The comparisons spell out
+    the NaN behaviour of the builtin max/min and np.clip used there.
+    """
+    (temp, co2, dic, ph, bio, ch4, mag, habitat, seismic, last_quake, pulse_pending) = state
+    q = 0
+    for i in range(times.shape[0]):
+        t = times[i]
+        dt = dts[i]
+
+        # Ejecta re‑entry pulse (once)
+        if pulse_pending != 0.0 and t >= pulse_time:
+            temp += pulse_temp_increment
+            if temp + BASELINE_TEMP > PULSE_METHANE_THRESHOLD:
+                ch4 += 500.0 * 0.01
+            pulse_pending = 0.0
+
+        # Greenhouse and dust forcing
+        forcing = 5.35 * math.log(co2 / BASELINE_CO2) + 0.036 * (math.sqrt(ch4) - math.sqrt(BASELINE_METHANE))
+        target_anomaly = -8.0 * math.log(1.0 + tau[i]) + 0.8 * forcing
+        temp += (target_anomaly - temp) * dt / 2.0
+
+        # Ocean carbonate chemistry
+        dic += (dic / BUFFER_FACTOR) * (math.log(co2 / BASELINE_CO2)) * dt / 100.0
+        ph = -math.log10((dic / ocean_alk) * 1e-8)
+        ph = ph if ph < 8.5 else 8.5
+        ph = ph if ph > 6.0 else 6.0
+
+        # Silicate weathering
+        arg = WEATHERING_AC * (temp + BASELINE_TEMP - REF_TEMP)
+        arg = 50.0 if arg > 50.0 else arg
+        weathering_rate = WEATHERING_BASELINE * math.exp(arg) * (co2 / (co2 + WEATHERING_CO2_HALF_SAT))
+        co2 += -weathering_rate * GtC_TO_PPM * dt
+
+        # Methane decay, magnetosphere recovery
+        lifetime = METHANE_LIFETIME_BASELINE * METHANE_UV_SENSITIVITY if tau[i] > 10 else METHANE_LIFETIME_BASELINE
+        ch4 *= math.exp(-dt / lifetime)
+        mag += (1.0 - mag) * dt / 100.0
+
+        # Biodiversity
+        heat = temp + BASELINE_TEMP - 2.0
+        temp_stress = math.exp(-0.1 * (heat if heat > 0.0 else 0.0))
+        ph_stress = (ph - 6.5) / (8.2 - 6.5)
+        ph_stress = ph_stress if ph_stress < 1.0 else 1.0
+        ph_stress = ph_stress if ph_stress > 0.0 else 0.0
+        survival = temp_stress * ph_stress
+        if survival > bio:
+            bio += (survival - bio) * dt / 50.0
+        else:
+            bio = survival
+        bio = 0.0 if bio < 0.0 else (1.0 if bio > 1.0 else bio)
+
+        # Seismic aftershocks (Omori law)
+        seismic = intensity[i]
+        if poisson:
+            while q < quakes.shape[0] and quakes[q] <= t:
+                habitat *= (1.0 - 0.05 * (1.0 / (1.0 + OMORI_K * (quakes[q] - 0.0)**OMORI_P)))
+                last_quake = quakes[q]
+                q += 1
+        elif rng.random() < 0.1 * seismic * dt:
+            habitat *= (1.0 - 0.05 * seismic)
+            last_quake = t
+        habitat = 0.0 if habitat < 0.0 else (1.0 if habitat > 1.0 else habitat)
+
+        # Clipping
+        co2 = co2 if co2 > 180.0 else 180.0
+        ch4 = ch4 if ch4 > 0.0 else 0.0
+
+        out[0, i] = t
+        out[1, i] = temp
+        out[2, i] = co2
+        out[3, i] = ph
+        out[4, i] = bio
+        out[5, i] = ch4
+        out[6, i] = tau[i]
+        out[7, i] = mag
+        out[8, i] = habitat
+        out[9, i] = seismic
+    state[:] = (temp, co2, dic, ph, bio, ch4, mag, habitat, seismic, last_quake, pulse_pending)
+    return q
+
+@functools.lru_cache(maxsize=None)
+def compiled_kernel():
+    """euler_kernel compiled with Numba, or None when Numba is not installed."""
+    try:
+        import numba
+    except ImportError:
+        return None
+    # Numba's on-disk cache re-imports this module by name, so only use it
+    # when that works (not for a file loaded without registering it)
+    return numba.njit(cache=__name__ in sys.modules)(euler_kernel)
+
+def check_jit_parity(seeds=(0, 1, 2, 3), rtol: float = JIT_PARITY_RTOL, **kwargs) -> bool:
+    """
+    Run each seed through the Python Euler loop and the compiled kernel
+    and compare the trajectories.  Both must consume the same rng stream
+    and agree exactly on the columns the forcing and the quakes decide
+    (JIT_EXACT_COLUMNS); the rest must agree to rtol, because NumPy's
+    scalar log/exp and the C library's (which Numba calls) may differ in
+    the last bit.  kwargs go to AsteroidImpactEnhanced.
+    """
+    if compiled_kernel() is None:
+        logging.error("Numba is not installed; nothing to check")
+        return False
+    ok = True
+    for seed in seeds:
+        python = AsteroidImpactEnhanced(seed=seed, **kwargs)
+        jitted = AsteroidImpactEnhanced(seed=seed, jit=True, **kwargs)
+        a, b = python.run(), jitted.run()
+        same = len(a) == len(b) and python.rng.random() == jitted.rng.random()
+        worst = 0.0
+        if same:
+            for name in STATE_COLUMNS:
+                if name in JIT_EXACT_COLUMNS:
+                    same &= np.array_equal(a[name], b[name], equal_nan=True)
+                else:
+                    same &= np.allclose(a[name], b[name], rtol=rtol, atol=0.0, equal_nan=True)
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        diff = np.abs(a[name] - b[name]) / np.abs(a[name])
+                    worst = max(worst, float(np.nanmax(diff, initial=0.0)))
+        logging.info(f"seed {seed}: {len(a)} rows, max relative difference {worst:.1e} "
+                     f"-> {'ok' if same else 'MISMATCH'}")
+        ok &= bool(same)
+    return ok
+
+
+# ----------------------------------------------------------------------
+# Aftershock replay (seed sweeps)
+# ----------------------------------------------------------------------
+# Deterministic Euler trajectories of recent runs, by _core_key(), oldest first
+_cores: Dict[str, Tuple['SimulationResults', Dict]] = {}
+
+
+def replay_aftershocks(times: np.ndarray, dts: np.ndarray, intensity: np.ndarray, rngs,
+                       habitat=1.0, last_quake_time=0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The aftershock sub-model on its own, for many generators at once.
+    Each rng draws one uniform per step, as the step loop does, so column j
+    is bit for bit the habitat a full run with rngs[j] produces.
+    Returns the habitat after every step, (n_steps, n_members), and each
+    member's last quake time.
+    """
+    n, m = len(times), len(rngs)
+    if not n:
+        return np.empty((0, m)), np.broadcast_to(np.asarray(last_quake_time, dtype=float), (m,))
+    # One row per member while scanning, so cumprod runs along contiguous memory
+    quake = np.empty((m, n), dtype=bool)
+    for j, rng in enumerate(rngs):
+        np.less(rng.random(n), (0.1 * intensity) * dts, out=quake[j])
+    path = np.where(quake, 1.0 - 0.05 * intensity, 1.0)
+    path[:, 0] *= habitat                   # the step loop's first product
+    np.cumprod(path, axis=1, out=path)
+    np.clip(path, 0.0, 1.0, out=path)
+    last = n - 1 - np.argmax(quake[:, ::-1], axis=1)
+    return path.T, np.where(quake.any(axis=1), times[last], last_quake_time)
+
+
+def replay_quake_times(times: np.ndarray, quake_times, habitat=1.0, last_quake_time=0.0
+                       ) -> Tuple[np.ndarray, float, int]:
+    """
+    replay_aftershocks() for sampled quake times (aftershocks='poisson')
+    and one member: each quake strikes at the end of the step it falls in,
+    as in the step loop.  Returns the habitat after every step, the last
+    quake time and how many of quake_times struck within the steps.
+    """
+    quake_times = np.asarray(quake_times, dtype=float)
+    used = int(np.searchsorted(quake_times, times[-1], side='right')) if len(times) else 0
+    struck = quake_times[:used]
+    path = np.cumprod(np.concatenate([[habitat], 1.0 - 0.05 * omori_intensity(struck)]))
+    path = np.clip(path[np.searchsorted(struck, times, side='right')], 0.0, 1.0)
+    return path, (float(struck[-1]) if used else last_quake_time), used
+
+
+def check_replay(seeds=(0, 1, 2, 3), **kwargs) -> bool:
+    """
+    Run each seed in full and by replaying its aftershocks over a shared
+    deterministic trajectory; trajectories and final states must be
+    identical.  This is the check behind the STOCHASTIC_STATE declaration.
+    kwargs go to AsteroidImpactEnhanced.
+    """
+    ok = True
+    for seed in seeds:
+        full = AsteroidImpactEnhanced(seed=seed, **kwargs)
+        replayed = AsteroidImpactEnhanced(seed=seed, **kwargs)
+        a = full.run()
+        AsteroidImpactEnhanced(seed=seed + 1, **kwargs).run(replay=True)   # memoise the core
+        b = replayed.run(replay=True)
+        same = (all(np.array_equal(a[name], b[name], equal_nan=True) for name in STATE_COLUMNS)
+                and json.dumps(full.snapshot()) == json.dumps(replayed.snapshot()))
+        logging.info(f"seed {seed}: {len(a)} rows -> {'ok' if same else 'MISMATCH'}")
+        ok &= same
+    return ok
+
+
+# ----------------------------------------------------------------------
+# Columnar result recorder
+# ----------------------------------------------------------------------
+# Output columns and the number of decimals they are rounded to on output
+STATE_ROUNDING = {
+    'year': 4,
+    'temp_anomaly_c': 4,
+    'co2_ppm': 2,
+    'ocean_ph': 3,
+    'biodiversity_index': 4,
+    'methane_ppb': 1,
+    'dust_optical_depth': 4,
+    'magnetosphere_strength': 4,
+    'subsurface_habitat_fraction': 4,
+    'seismic_intensity': 4,
+}
+STATE_COLUMNS = tuple(STATE_ROUNDING)
+
+# Default change-driven recording tolerances (--record-changes)
+RECORD_TOLERANCES = earth_sims.recording.default_tolerances(STATE_ROUNDING)
+
+
+class SimulationResults(earth_sims.recording.SimulationResults):
+    """A run's trajectory, column-wise, rounded on output to STATE_ROUNDING."""
+    rounding = STATE_ROUNDING
+
+
+class ResultRecorder(earth_sims.recording.ResultRecorder):
+    results_class = SimulationResults
+
+
+def resample_rows(rows, times, previous: Optional[Tuple[float, ...]] = None
+                  ) -> Iterator[Tuple[float, ...]]:
+    """
+    Linearly interpolate a stream of raw rows (year first, non‑decreasing)
+    onto the sorted output times, yielding each output row as soon as the
+    rows around it are known; the rows are consumed to the end either way.
+    A time that falls on rows takes the last of them (at the start year,
+    the state after the impact).  Times outside the span of the rows are
+    skipped; previous is the last row of an earlier part of the run, and
+    the times up to it belong to that part.
+    """
+    times = np.asarray(times, dtype=float).tolist()
+    i, n = 0, len(times)
+    if previous is not None:
+        while i < n and times[i] <= previous[0]:
+            i += 1
+    last = previous
+    for row in rows:
+        t = row[0]
+        while i < n and times[i] < t:
+            at = times[i]
+            if last is not None and at == last[0]:
+                yield (at,) + tuple(last[1:])
+            elif last is not None:
+                w = (at - last[0]) / (t - last[0])
+                yield (at,) + tuple(a + w * (b - a) for a, b in zip(last[1:], row[1:]))
+            i += 1
+        last = row
+    while last is not None and i < n and times[i] == last[0]:
+        yield tuple(last)
+        i += 1
+
+
+def resample_blocks(blocks, times, previous: Optional[Tuple[float, ...]] = None
+                    ) -> SimulationResults:
+    """earth_sims.recording.resample_blocks() for blocks of STATE_COLUMNS rows."""
+    return earth_sims.recording.resample_blocks(blocks, times, previous, SimulationResults)
+
+
+def parse_record_tolerances(specs: List[str]) -> Dict[str, float]:
+    """Parse --record-changes "column=tolerance" overrides of RECORD_TOLERANCES."""
+    return earth_sims.recording.parse_record_tolerances(specs, RECORD_TOLERANCES)
+
+
+def record_tolerances(tolerances: Optional[Dict[str, float]] = None,
+                      columns=STATE_COLUMNS) -> List[float]:
+    """Per-column tolerances in columns order: RECORD_TOLERANCES with overrides, inf if not watched."""
+    return earth_sims.recording.record_tolerances(RECORD_TOLERANCES, columns, tolerances)
+
+
+def changed_rows(rows, tolerances: Optional[Dict[str, float]] = None
+                 ) -> Iterator[Tuple[float, ...]]:
+    """The rows of a stream that ChangeRecorder would store, yielded as they come."""
+    return earth_sims.recording.changed_rows(rows, record_tolerances(tolerances))
+
+
+class ChangeRecorder(earth_sims.recording.ChangeRecorder):
+    results_class = SimulationResults
+
 
 # ----------------------------------------------------------------------
 # Main simulation class – unchanged except for use of corrected functions
@@ -169,6 +731,20 @@ def silicate_weathering_rate(temp: float, co2: float) -> float:
 class AsteroidImpactEnhanced:
     """
     Enhanced simulation of giant asteroid impact.
+
+    integrator selects how the post-impact state is advanced:
+    'euler' steps the forcing grid (ForcingSchedule) explicitly, 'ivp'
+    integrates the coupled temperature/CO₂/CH₄/DIC/biodiversity system with
+    an implicit solve_ivp method (ivp_method) under rtol/atol, 'adaptive'
+    takes the native step under step-doubling error control and 'multirate'
+    sub-cycles the fast processes under macro steps of up to dt_slow years.
+    carbonate 'ratio' keeps the clamped DIC/ALK approximation of pH;
+    'equilibrium' and 'table' solve the carbonate system instead
+    (earth_sims.carbonate), which stays stable at large steps.
+    jit runs the Euler loop as one Numba-compiled kernel (euler_kernel()),
+    aftershocks='poisson' samples the quake times up front
+    (sample_aftershocks()) instead of drawing once per step, and steady_tol
+    fast-forwards an Euler run once it has settled.
     """
 
     def __init__(self,
@@ -181,7 +757,32 @@ class AsteroidImpactEnhanced:
                  end_year: float = 10000.0,
                  dt_initial: float = 0.01,          # years (first year)
                  dt_final: float = 10.0,             # years (final step)
-                 seed: Optional[int] = None):
+                 seed: Optional[int] = None,
+                 integrator: str = 'euler',          # one of INTEGRATORS
+                 ivp_method: str = 'BDF',
+                 rtol: float = 1e-6,
+                 atol: float = 1e-8,
+                 jit: bool = False,             # compiled Euler loop if Numba is installed
+                 aftershocks: str = 'step',     # one of AFTERSHOCK_SAMPLERS
+                 steady_tol: Optional[float] = None,    # fast-forward once steady (STEADY_TOL)
+                 dt_slow: float = MULTIRATE_DT_SLOW,    # macro step of integrator='multirate'
+                 carbonate: str = 'ratio'):             # one of CARBONATE_MODELS
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"Unknown integrator {integrator!r}")
+        if aftershocks not in AFTERSHOCK_SAMPLERS:
+            raise ValueError(f"aftershocks must be one of {', '.join(AFTERSHOCK_SAMPLERS)}")
+        if ivp_method not in IVP_METHODS:
+            raise ValueError(f"ivp_method must be one of {', '.join(IVP_METHODS)}")
+        if jit and integrator != 'euler':
+            raise ValueError("jit compiles the euler integrator only")
+        if steady_tol is not None and (integrator != 'euler' or jit or not steady_tol > 0):
+            raise ValueError("steady_tol needs a positive rate and the Python euler integrator")
+        if not dt_slow > 0:
+            raise ValueError("dt_slow must be positive")
+        if carbonate not in CARBONATE_MODELS:
+            raise ValueError(f"carbonate must be one of {', '.join(CARBONATE_MODELS)}")
+        if jit and carbonate != 'ratio':
+            raise ValueError("jit compiles the ratio carbonate model only")
         self.diameter = diameter
         self.density = density
         self.velocity = velocity
@@ -191,7 +792,18 @@ class AsteroidImpactEnhanced:
         self.end_year = end_year
         self.dt_initial = dt_initial
         self.dt_final = dt_final
+        self.seed = seed
         self.rng = np.random.default_rng(seed)
+        self.integrator = integrator
+        self.ivp_method = ivp_method
+        self.rtol = rtol
+        self.atol = atol
+        self.jit = jit
+        self.aftershocks = aftershocks
+        self.steady_tol = steady_tol
+        self.dt_slow = dt_slow
+        self.carbonate = carbonate
+        self.solver_stats: Dict[str, int] = {}
 
         # Compute impact parameters using corrected functions
         self.energy_J = impact_energy(diameter*1000, density, velocity)
@@ -217,6 +829,9 @@ class AsteroidImpactEnhanced:
         self.ocean_dic = 2.3e-3                     # mol/kg, pre‑industrial
         self.ocean_alk = 2.4e-3                     # eq/kg
         self.ocean_temp = BASELINE_TEMP              # °C, initial
+        if carbonate != 'ratio':
+            # The equilibrium models start the box in equilibrium at BASELINE_PH
+            self.ocean_dic = carbonate_dic(self.ocean_alk, BASELINE_PH)
 
         # Ejecta pulse
         self.ejecta_pulse_triggered = False
@@ -227,33 +842,850 @@ class AsteroidImpactEnhanced:
         # Seismic aftershocks (Omori)
         self.seismic_intensity = 1.0
         self.last_quake_time = 0.0
+        # Pending aftershock times (aftershocks='poisson'), sampled up to quake_horizon
+        self.quake_times: List[float] = []
+        self.quake_horizon = start_year
+
+        # Loop position: the state is at self.time, the last step was
+        # self.dt, and these fractions of the initial dust are left
+        self.impact_applied = False
+        self.dt = dt_initial
+        self.fine_fraction = 1.0
+        self.coarse_fraction = 1.0
+
+    def run(self, checkpoint=None, checkpoint_every: Optional[float] = None,
+            cache: Optional['ResultCache'] = None, output_times=None,
+            record_changes: Optional[Dict[str, float]] = None,
+            keep_recent: int = 0, replay: bool = False) -> SimulationResults:
+        """
+        Run simulation with adaptive time stepping.
+
+        A simulator that has already run (or came from a snapshot) continues
+        where it stopped, up to end_year, and returns only the new rows.
+        With checkpoint, a snapshot is saved to that file every
+        checkpoint_every simulated years and when the run ends.
+        With cache, a seeded run is first looked up under cache_key(); a
+        hit restores the final state instead of integrating, and a
+        computed result is stored for next time.
+        With output_times (sorted years, see parse_output_times()), only the
+        states at those years are kept, interpolated between steps while
+        the run goes (see resample_rows()).  Alternatively, with
+        record_changes (per-column tolerance overrides, {} for the defaults)
+        a step is kept only when the state has moved; see ChangeRecorder,
+        which also keeps the last keep_recent steps in full.
+        With replay, an Euler run from the start reuses the deterministic
+        trajectory of an earlier run in this process that differed only by
+        seed, and replays just its own aftershocks (see STOCHASTIC_STATE).  The memo keeps copies of the
+        last CORE_MEMO_SIZE trajectories, so it is for callers that run
+        many seeds of the same physics (sweeps, the server).
+        """
+        self._check_continuable(checkpoint)
+        self._check_recording(output_times, record_changes)
+        key = (self.cache_key(output_times, record_changes, keep_recent)
+               if cache is not None else None)
+        if key is not None:
+            hit = cache.get(key)
+            if hit is not None:
+                results, snapshot = hit
+                self.__dict__.update(vars(self.from_snapshot(snapshot)))
+                if checkpoint is not None:
+                    self.save_snapshot(checkpoint)
+                return results
+        results = self._run(checkpoint, checkpoint_every, output_times, record_changes, keep_recent,
+                            replay)
+        if key is not None:
+            cache.put(key, results, self.snapshot())
+        return results
 
-    def run(self) -> List[Dict[str, float]]:
-        """Run simulation with adaptive time stepping."""
-        results = []
-        t = self.start_year
-        dt = self.dt_initial
+    def _run(self, checkpoint, checkpoint_every: Optional[float], output_times=None,
+             record_changes: Optional[Dict[str, float]] = None, keep_recent: int = 0,
+             replay: bool = False) -> SimulationResults:
+        previous = self._state_row(self.time) if self.impact_applied else None
+        if self.integrator == 'adaptive':
+            results = ResultRecorder()
+            rows = self._iter_adaptive_rows()
+        else:
+            schedule = self.forcing_schedule()
+            kernel = compiled_kernel() if self.jit else None
+            recording = output_times is not None or record_changes is not None
+            if (replay and self.integrator == 'euler' and checkpoint is None and not recording
+                    and not self.impact_applied and self.steady_tol is None):
+                return self._run_replayed(schedule)
+            if kernel is not None and recording:
+                blocks = self._compiled_blocks(kernel, schedule, checkpoint, checkpoint_every,
+                                               COMPILED_BLOCK_STEPS)
+                if output_times is not None:
+                    return resample_blocks(blocks, output_times, previous)
+                recorder = ChangeRecorder(record_changes, keep_recent)
+                for block in blocks:
+                    recorder.extend(block)
+                return recorder.results()
+            if kernel is not None:
+                return self._run_compiled(kernel, schedule, checkpoint, checkpoint_every)
+            if self.jit:
+                logging.warning("Numba is not installed; running the Python Euler loop")
+            if not recording:
+                results = ResultRecorder(capacity=len(schedule) + 2)
+            if self.integrator == 'ivp':
+                rows = self._iter_ivp_rows(schedule, output_times)
+            elif self.integrator == 'multirate':
+                rows = self._iter_multirate_rows(schedule.blocks())
+            else:
+                rows = self._iter_rows(schedule.blocks(), output_times)
+        if checkpoint is not None:
+            rows = self._checkpointed(rows, checkpoint, checkpoint_every)
+        if output_times is not None:
+            results = ResultRecorder(capacity=len(output_times))
+            rows = resample_rows(rows, output_times, previous)
+        elif record_changes is not None:
+            results = ChangeRecorder(record_changes, keep_recent)
+        for row in rows:
+            results.append(row)
+        return results.results()
+
+    def run_iter(self, checkpoint=None, checkpoint_every: Optional[float] = None,
+                 output_times=None, record_changes: Optional[Dict[str, float]] = None
+                 ) -> Iterator[Dict[str, float]]:
+        """
+        Yield each (unrounded) state as soon as it is computed.  The forcing
+        is generated lazily too, so memory stays constant over any horizon.
+        Continuation, checkpoints, output_times and record_changes work as
+        in run() (a stream has no recent steps to keep).
+        """
+        self._check_continuable(checkpoint)
+        self._check_recording(output_times, record_changes)
+        previous = self._state_row(self.time) if self.impact_applied else None
+        if self.integrator == 'ivp':
+            rows = self._iter_ivp_rows(self.forcing_schedule(), output_times)
+        elif self.integrator == 'adaptive':
+            rows = self._iter_adaptive_rows()
+        else:
+            blocks = forcing_blocks(self.start_year, self.end_year, self.dt_initial, self.dt_final,
+                                    FINE_DUST_FALLOUT_RATE, COARSE_DUST_FALLOUT_RATE,
+                                    position=self.forcing_position())
+            if self.integrator == 'multirate':
+                rows = self._iter_multirate_rows(blocks)
+            else:
+                rows = self._iter_rows(blocks, output_times)
+        if checkpoint is not None:
+            rows = self._checkpointed(rows, checkpoint, checkpoint_every)
+        if output_times is not None:
+            rows = resample_rows(rows, output_times, previous)
+        elif record_changes is not None:
+            rows = changed_rows(rows, record_changes)
+        for row in rows:
+            yield dict(zip(STATE_COLUMNS, row))
+
+    def _run_replayed(self, schedule: ForcingSchedule) -> SimulationResults:
+        """
+        Euler run from the start that reuses the deterministic trajectory of
+        an earlier run with the same physics in this process, replaying only
+        the aftershocks with this run's rng (see STOCHASTIC_STATE).
+        """
+        key = self._core_key()
+        core = _cores.pop(key, None)
+        if core is None:
+            results = self._run(None, None)
+            state = self.snapshot()['state']
+            core = (SimulationResults({name: results[name].copy() for name in results.columns}),
+                    {name: value for name, value in state.items()
+                     if name not in STOCHASTIC_STATE and name != 'seed'})
+        else:
+            results, state = core
+            start = self.subsurface_habitat
+            # apply_impact() zeroes the quake time
+            if self.aftershocks == 'poisson':
+                self._sample_aftershocks()
+                habitat, last_quake_time, used = replay_quake_times(schedule.times, self.quake_times,
+                                                                    start, 0.0)
+                del self.quake_times[:used]
+            else:
+                path, last = replay_aftershocks(schedule.times, schedule.dts,
+                                                schedule.seismic_intensity, [self.rng], start, 0.0)
+                habitat, last_quake_time = path[:, 0], last[0]
+            columns = {name: results[name].copy() for name in results.columns}
+            columns['subsurface_habitat_fraction'] = np.concatenate(([start, start], habitat))
+            self.__dict__.update(copy.deepcopy(state))
+            self.subsurface_habitat = habitat[-1] if len(habitat) else start
+            self.last_quake_time = float(last_quake_time)
+            results = SimulationResults(columns)
+        _cores[key] = core
+        while len(_cores) > CORE_MEMO_SIZE:
+            del _cores[next(iter(_cores))]
+        return results
 
-        # Pre‑impact state
-        results.append(self.get_state(t))
+    def _core_key(self) -> str:
+        """Hash of everything but the seed, rng and STOCHASTIC_STATE."""
+        state = self.snapshot()['state']
+        for name in ('seed',) + STOCHASTIC_STATE:
+            del state[name]
+        return result_cache_key(type(self).__name__, {'core': state})
+
+    def _check_continuable(self, checkpoint):
+        if self.integrator == 'ivp' and (self.impact_applied or checkpoint is not None):
+            raise ValueError("ivp runs integrate in one go; they cannot be checkpointed or continued")
+
+    @staticmethod
+    def _check_recording(output_times, record_changes):
+        if output_times is not None and record_changes is not None:
+            raise ValueError("output_times and record_changes are alternative recording policies")
+        if record_changes is not None:
+            record_tolerances(record_changes)
+
+    def _checkpointed(self, rows, checkpoint, every: Optional[float]) -> Iterator[Tuple[float, ...]]:
+        """Pass rows through, saving a snapshot every `every` simulated years and at the end."""
+        due = self.time + every if every else math.inf
+        for row in rows:
+            yield row
+            if self.time >= due:
+                self.save_snapshot(checkpoint)
+                due = self.time + every
+        self.save_snapshot(checkpoint)
+
+    def cache_key(self, output_times=None, record_changes: Optional[Dict[str, float]] = None,
+                  keep_recent: int = 0) -> Optional[str]:
+        """
+        Content address of this run for ResultCache: a hash of the full
+        state (constructor arguments, seed and rng stream, loop position),
+        the recording options of run() that are set, the module constants
+        and the model source.  None for unseeded runs, which are not meant
+        to be reproduced.
+        """
+        if self.seed is None:
+            return None
+        snapshot = self.snapshot()
+        state = snapshot['state']
+        for name, parameter in inspect.signature(type(self)).parameters.items():
+            if isinstance(parameter.default, float):
+                state[name] = float(state[name])     # diameter=10 and 10.0 are one run
+        arguments = {'state': state, 'rng': snapshot['rng']}
+        if output_times is not None:
+            arguments['output_times'] = np.asarray(output_times, dtype=float).tolist()
+        if record_changes is not None:
+            arguments['record_changes'] = record_tolerances(record_changes)
+            arguments['keep_recent'] = keep_recent
+        return result_cache_key(type(self).__name__, arguments)
+
+    def snapshot(self) -> Dict:
+        """
+        The complete simulator state as a JSON‑serialisable dict: every
+        attribute (parameters, state, loop position) plus the rng's
+        bit‑generator state.  from_snapshot() turns it back into a
+        simulator that continues the run exactly.
+        """
+        state = {name: value.item() if isinstance(value, np.generic) else value
+                 for name, value in vars(self).items() if name != 'rng'}
+        return {'format_version': SNAPSHOT_FORMAT_VERSION, 'model': type(self).__name__,
+                'state': state, 'rng': self.rng.bit_generator.state}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict) -> 'AsteroidImpactEnhanced':
+        if snapshot.get('model') != cls.__name__:
+            raise ValueError(f"Snapshot is of {snapshot.get('model')!r}, not {cls.__name__}")
+        if snapshot.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format_version {snapshot.get('format_version')!r}")
+        sim = cls.__new__(cls)
+        # Snapshots from before the Poisson aftershock sampler lack these
+        sim.__dict__.update(aftershocks='step', quake_times=[], quake_horizon=-math.inf)
+        # ... and before steady-state fast-forward, the multirate integrator
+        # and the carbonate models
+        sim.__dict__.update(steady_tol=None, dt_slow=MULTIRATE_DT_SLOW, carbonate='ratio')
+        sim.__dict__.update(snapshot['state'])
+        bit_generator = getattr(np.random, snapshot['rng']['bit_generator'])()
+        bit_generator.state = snapshot['rng']
+        sim.rng = np.random.Generator(bit_generator)
+        return sim
+
+    def save_snapshot(self, filename) -> Path:
+        """Write snapshot() as JSON; the file is replaced atomically, so a crash keeps the last one."""
+        filename = Path(filename)
+        partial = filename.with_name(filename.name + '.tmp')
+        with open(partial, 'w') as f:
+            json.dump(self.snapshot(), f)
+        partial.replace(filename)
+        return filename
+
+    @classmethod
+    def load_snapshot(cls, filename) -> 'AsteroidImpactEnhanced':
+        with open(filename) as f:
+            return cls.from_snapshot(json.load(f))
+
+    def fork(self, seed: Optional[int] = None, **changes) -> 'AsteroidImpactEnhanced':
+        """
+        An independent copy that continues from the current state, so
+        what‑if branches share one computed prefix:
+
+            prefix = AsteroidImpactEnhanced(end_year=1000, seed=0)
+            prefix.run()
+            branches = [prefix.fork(end_year=1e6, seed=k) for k in range(100)]
+
+        The copy keeps this run's rng stream unless seed is given; changes
+        set attributes (parameters or state) on the copy.
+        """
+        unknown = set(changes) - set(vars(self))
+        if unknown:
+            raise ValueError(f"Unknown attribute(s) for fork(): {', '.join(sorted(unknown))}")
+        branch = copy.deepcopy(self)
+        for name, value in changes.items():
+            setattr(branch, name, value)
+        if seed is not None:
+            branch.seed = seed
+            branch.rng = np.random.default_rng(seed)
+        return branch
+
+    def _iter_rows(self, blocks, output_times=None) -> Iterator[Tuple[float, ...]]:
+        """
+        Core time loop: raw output rows, driven by forcing blocks.  With
+        steady_tol, the loop hands over to _fast_forward() once _steady().
+        """
+        if not self.impact_applied:
+            t = self.start_year
+
+            # Pre‑impact state
+            yield self._state_row(t)
+
+            # Apply impact at t=0
+            self.apply_impact()
+            yield self._state_row(t)
+
+        dust_fine0 = self.dust_mass_kg * FINE_DUST_FRACTION
+        dust_coarse0 = self.dust_mass_kg * COARSE_DUST_FRACTION
+        steps = iter_forcing_steps(blocks, dust_fine0)
+        row = None
+        for k, t, dt, fine, coarse, tau, intensity in steps:
+            self.dust_fine = dust_fine0 * fine
+            self.dust_coarse = dust_coarse0 * coarse
+            self._coupled_step(t, dt, tau, intensity, t >= self.ejecta_pulse_time)
+            self.time, self.dt, self.fine_fraction, self.coarse_fraction = t, dt, fine, coarse
+            previous, row = row, self._state_row(t, tau)
+            yield row
+            if self.steady_tol is not None and previous is not None and self._steady(row, previous):
+                yield from self._fast_forward(steps, output_times)
+                return
+
+    def _steady(self, row: Tuple[float, ...], previous: Tuple[float, ...]) -> bool:
+        """
+        True once the ejecta pulse is spent and, over the step from previous
+        to row, every STEADY_COLUMNS variable changed by less than steady_tol
+        of its magnitude (STEADY_SCALE at least) per year.  NaN never is.
+        """
+        if self.ejecta_pulse_triggered:
+            return False
+        columns = [STATE_COLUMNS.index(name) for name in STEADY_COLUMNS]
+        now, before = np.take(row, columns), np.take(previous, columns)
+        with np.errstate(invalid='ignore', over='ignore'):
+            rates = np.abs(now - before) / (row[0] - previous[0]) / np.maximum(np.abs(now), STEADY_SCALE)
+        return bool(np.all(rates <= self.steady_tol))
+
+    def _linear_flow(self, t: float, y: np.ndarray, h: float) -> np.ndarray:
+        """
+        The ODE state h years after (t, y) under the linearization of
+        _ivp_rhs there: y + h·φ₁(hJ)·f, read off the exponential of the
+        augmented matrix [[J, f], [0, 0]].  Exact for the linear relaxations.
+        """
+        f = np.array(self._ivp_rhs(t, y))
+        n = len(y)
+        augmented = np.zeros((n + 1, n + 1))
+        augmented[:n, n] = f
+        steps = STEADY_JACOBIAN_STEP * np.maximum(np.abs(y), IVP_ATOL_SCALE)
+        for i, step in enumerate(steps):
+            shifted = y.copy()
+            shifted[i] += step
+            augmented[:n, i] = (np.array(self._ivp_rhs(t, shifted)) - f) / step
+        from scipy.linalg import expm    # SciPy is only loaded by the runs that need it
+        return y + expm(h * augmented)[:n, n]
+
+    def _flow(self, t: float, y: np.ndarray, until: float) -> np.ndarray:
+        """
+        Carry the state from (t, y) to until with _linear_flow(),
+        re-linearized every STEADY_SPAN_FRACTION of the time since the
+        start, so a drift that runs into a clamp (the DIC/ALK ratio, the
+        CO₂ floor) stops there instead of being extrapolated through it.
+        """
+        while t < until:
+            s = min(until, t + max(STEADY_SPAN_FRACTION * (t - self.start_year), self.dt_final))
+            self._set_ode_state(self._linear_flow(t, y, s - t))
+            t, y = s, self._ode_state()
+        return y
+
+    def _set_ode_state(self, y: np.ndarray):
+        """Set the state from IVP_STATE order, with the Euler step's clipping."""
+        temp, co2, ch4, log_dic, bio, mag = y.tolist()
+        self.temp_anomaly, self.magnetosphere = temp, mag
+        self.co2_ppm = max(180.0, co2)
+        self.methane_ppb = max(0.0, ch4)
+        with np.errstate(over='ignore'):
+            self.ocean_dic = float(np.exp(log_dic))
+        self.ocean_ph = float(self._ph(log_dic))
+        self.biodiversity = float(np.clip(bio, 0.0, 1.0))
+
+    def _fast_forward(self, steps, output_times=None) -> Iterator[Tuple[float, ...]]:
+        """
+        The rest of a steady Euler run.  The remaining forcing steps are
+        only scanned for aftershocks (the draws the loop would make), and
+        _flow() carries the state from quake to quake, emitting a
+        row at each output time on the way, to the last step, where the
+        loop position is left as if it had been stepped.
+        """
+        quakes, last = [], None
+        for chunk in iter(lambda: list(itertools.islice(steps, 4096)), []):
+            _, times, dts, _, _, _, intensity = (np.array(c) for c in zip(*chunk))
+            if self.aftershocks == 'step':
+                hit = self.rng.random(len(times)) < 0.1 * intensity * dts
+                quakes.extend(zip(times[hit].tolist(), intensity[hit].tolist()))
+            last = chunk[-1]
+        if last is None:
+            return
+        _, t_end, dt, fine, coarse, tau, intensity = last
+        if self.aftershocks == 'poisson':
+            self._sample_aftershocks()
+            used = bisect.bisect_right(self.quake_times, t_end)
+            quakes = [(at, omori_intensity(at)) for at in self.quake_times[:used]]
+            del self.quake_times[:used]
+
+        t, y = self.time, self._ode_state()
+        targets = [] if output_times is None else [
+            s for s in np.asarray(output_times, dtype=float).tolist() if t < s < t_end]
+        rows, start, next_quake = [], t, 0
+        for s in targets + [t_end]:
+            while next_quake < len(quakes) and quakes[next_quake][0] <= s:
+                at, strength = quakes[next_quake]
+                next_quake += 1
+                t, y = at, self._flow(t, y, at)
+                self.subsurface_habitat = np.clip(self.subsurface_habitat * (1.0 - 0.05 * strength),
+                                                  0.0, 1.0)
+                self.last_quake_time = at
+            t, y = s, self._flow(t, y, s)
+            self.seismic_intensity = omori_intensity(s)
+            if s < t_end:
+                rows.append(self._state_row(s, self._optical_depth(s)))
+
+        dust_fine0 = self.dust_mass_kg * FINE_DUST_FRACTION
+        dust_coarse0 = self.dust_mass_kg * COARSE_DUST_FRACTION
+        self.dust_fine, self.dust_coarse = dust_fine0 * fine, dust_coarse0 * coarse
+        self.time, self.dt, self.fine_fraction, self.coarse_fraction = t_end, dt, fine, coarse
+        self.seismic_intensity = intensity
+        rows.append(self._state_row(t_end, tau))
+        logging.info(f"Steady at year {start:g}; fast-forwarded to {t_end:g}")
+        yield from rows
+
+    def _run_compiled(self, kernel, schedule: ForcingSchedule, checkpoint=None,
+                      checkpoint_every: Optional[float] = None) -> SimulationResults:
+        """
+        run() for jit=True: the Euler loop in the compiled kernel, which
+        writes straight into the preallocated output columns.
+        """
+        out, = self._compiled_blocks(kernel, schedule, checkpoint, checkpoint_every)
+        return SimulationResults(dict(zip(STATE_COLUMNS, out)))
+
+    def _compiled_blocks(self, kernel, schedule: ForcingSchedule, checkpoint=None,
+                         checkpoint_every: Optional[float] = None,
+                         block: Optional[int] = None) -> Iterator[np.ndarray]:
+        """
+        The compiled Euler loop as (len(STATE_COLUMNS), m) blocks of raw
+        rows.  Without block the kernel writes the whole run into one
+        preallocated block.  With block it writes into a buffer of that many
+        steps that is reused, so each block must be consumed before the
+        next is asked for (the start rows of a fresh run come first, as a
+        block of their own).  The kernel is called once per block and per
+        checkpoint interval.
+        """
+        n = len(schedule)
+        head = 0 if self.impact_applied or block is not None else 2
+        out = np.empty((len(STATE_COLUMNS), head + (n if block is None else min(n, block))))
+        if not self.impact_applied:
+            first = out[:, :2] if head else np.empty((len(STATE_COLUMNS), 2))
+            first[:, 0] = self._state_row(self.start_year)
+            self.apply_impact()
+            first[:, 1] = self._state_row(self.start_year)
+            if not head:
+                yield first
+
+        dust_fine0 = self.dust_mass_kg * FINE_DUST_FRACTION
+        dust_coarse0 = self.dust_mass_kg * COARSE_DUST_FRACTION
+        tau = schedule.optical_depth(dust_fine0)
+        state = np.array([getattr(self, name) for name in KERNEL_STATE], dtype=float)
+        self._sample_aftershocks()
+        every = checkpoint_every if checkpoint is not None and checkpoint_every else math.inf
+        start = 0
+        while start < n:
+            stop = n
+            if every < math.inf:
+                # Up to and including the first step at or past the next checkpoint
+                stop = min(stop, int(np.searchsorted(schedule.times, self.time + every)) + 1)
+            due = stop < n
+            if block is not None and stop > start + block:
+                stop, due = start + block, False
+            rows = out[:, head + start:head + stop] if block is None else out[:, :stop - start]
+            used = kernel(state, self.ocean_alk, self.ejecta_pulse_time,
+                          self.ejecta_pulse_temp_increment, schedule.times[start:stop],
+                          schedule.dts[start:stop], tau[start:stop],
+                          schedule.seismic_intensity[start:stop], self.rng,
+                          self.aftershocks == 'poisson', np.array(self.quake_times, dtype=float),
+                          rows)
+            del self.quake_times[:used]
+
+            for name, value in zip(KERNEL_STATE, state.tolist()):
+                setattr(self, name, value)
+            self.ejecta_pulse_triggered = bool(self.ejecta_pulse_triggered)
+            last = stop - 1
+            self.time, self.dt = float(schedule.times[last]), float(schedule.dts[last])
+            self.fine_fraction = float(schedule.fine_fraction[last])
+            self.coarse_fraction = float(schedule.coarse_fraction[last])
+            self.dust_fine = dust_fine0 * self.fine_fraction
+            self.dust_coarse = dust_coarse0 * self.coarse_fraction
+            if due:
+                self.save_snapshot(checkpoint)
+            if block is not None:
+                yield rows
+            start = stop
+        if checkpoint is not None:
+            self.save_snapshot(checkpoint)
+        if block is None:
+            yield out
+
+    # Attributes the deterministic part of a step changes, saved around trial steps
+    _TRIAL_STATE = ('dust_fine', 'dust_coarse', 'temp_anomaly', 'co2_ppm', 'ocean_dic', 'ocean_ph',
+                    'methane_ppb', 'magnetosphere', 'biodiversity')
+
+    def _iter_adaptive_rows(self) -> Iterator[Tuple[float, ...]]:
+        """
+        --integrator adaptive: the native step under step‑doubling error
+        control.  Each step is taken once with dt and again as two dt/2
+        steps; their difference estimates the local error, measured against
+        rtol/atol with the per-variable scales used by the ivp backend.
+        Rejected steps are retried with a smaller dt; accepted ones keep the
+        two half steps and let dt grow.  Steps land exactly on the pulse
+        and on the forcing switches (see _next_stop()), and on each quake
+        with aftershocks='poisson'; dt drops back to dt_initial after the
+        pulse and after every quake.
+        """
+        if not self.impact_applied:
+            yield self._state_row(self.start_year)
+
+            self.apply_impact()
+            yield self._state_row(self.start_year)
+
+        atol = self.atol * IVP_ATOL_SCALE
+        t, dt = self.time, self.dt
+        accepted = self.solver_stats.get('accepted', 0)
+        rejected = self.solver_stats.get('rejected', 0)
+        while t < self.end_year:
+            t_stop = self._next_stop(t)
+            dt = min(dt, t_stop - t)
+            if self.aftershocks == 'step':
+                # Keep the per-step quake probability small, so quakes are not merged
+                intensity = 1.0 / (1.0 + OMORI_K * (t - 0.0)**OMORI_P)
+                dt = min(dt, ADAPTIVE_MAX_QUAKE_PROBABILITY / (0.1 * intensity))
+            saved = [getattr(self, name) for name in self._TRIAL_STATE]
+            self._trial_step(t + dt, dt)
+            full = self._ode_state()
+            for name, value in zip(self._TRIAL_STATE, saved):
+                setattr(self, name, value)
+            self._trial_step(t + dt / 2, dt / 2)
+            self._trial_step(t + dt, dt / 2)
+            half = self._ode_state()
+            with np.errstate(invalid='ignore'):
+                # An overflowed variable (DIC -> inf) on both paths has no error
+                diff = np.where(full == half, 0.0, np.abs(full - half))
+                err = float(np.max(diff /
+                                   (atol + self.rtol * np.maximum(np.abs(full), np.abs(half)))))
+            if not err <= 1.0 and dt > ADAPTIVE_DT_MIN:
+                # Rejected (a NaN error counts as a failure too)
+                for name, value in zip(self._TRIAL_STATE, saved):
+                    setattr(self, name, value)
+                rejected += 1
+                dt = max(ADAPTIVE_DT_MIN, dt * max(ADAPTIVE_MIN_SHRINK, ADAPTIVE_SAFETY / math.sqrt(err)))
+                continue
+
+            accepted += 1
+            t = t_stop if dt >= t_stop - t else t + dt
+            growth = ADAPTIVE_SAFETY / math.sqrt(err) if err > 0 else ADAPTIVE_MAX_GROWTH
+            dt_next = dt * min(ADAPTIVE_MAX_GROWTH, growth)
+            if self.ejecta_pulse_triggered and t >= self.ejecta_pulse_time:
+                self._ejecta_pulse()
+                dt_next = self.dt_initial
+            if self._aftershocks(t, dt, 1.0 / (1.0 + OMORI_K * (t - 0.0)**OMORI_P)):
+                dt_next = self.dt_initial
+            self.time, self.dt = t, dt_next
+            self.solver_stats = {'accepted': accepted, 'rejected': rejected}
+            yield self._state_row(t)
+            dt = dt_next
+
+        self.solver_stats = {'accepted': accepted, 'rejected': rejected}
+        logging.info(f"adaptive: {accepted} steps accepted, {rejected} rejected")
+
+    def _trial_step(self, t: float, dt: float):
+        """
+        The deterministic part of step() for the step ending at t: fallout
+        and the exponential‑Euler relaxation, evaluated at the midpoint.
+        """
+        tau = self._dust_fallout(dt)
+        self._relax(t - dt / 2, dt, tau, exponential=True)
+        self.co2_ppm = max(180.0, self.co2_ppm)
+        self.methane_ppb = max(0.0, self.methane_ppb)
 
-        # Apply impact at t=0
-        self.apply_impact()
-        results.append(self.get_state(t))
+    def _next_stop(self, t: float) -> float:
+        """The next time an adaptive step must land on exactly."""
+        stops = [self.end_year]
+        if self.ejecta_pulse_triggered:
+            stops.append(self.ejecta_pulse_time)
+        tau = solar_extinction(self.dust_fine, self.dust_coarse)
+        if tau > 10:    # methane lifetime switch
+            stops.append(t + math.log(tau / 10) / FINE_DUST_FALLOUT_RATE)
+        self._sample_aftershocks()
+        if self.quake_times:
+            stops.append(self.quake_times[0])
+        return min(s for s in stops if s > t + ADAPTIVE_DT_MIN or s == self.end_year)
+
+    def _iter_multirate_rows(self, blocks) -> Iterator[Tuple[float, ...]]:
+        """
+        --integrator multirate: the forcing grid is the fast clock.  Dust,
+        the ejecta pulse, methane decay, temperature relaxation (exponential,
+        so stable at any dt_final) and the aftershocks are sub-cycled on it
+        with CO₂, DIC, biodiversity and the magnetosphere frozen; those take
+        one macro step (_slow_step()) per span of up to dt_slow years, and
+        MULTIRATE_SLOW_FRACTION of the time since the start, fed by the
+        weathering integrated over the sub-cycle.  One row per macro step.
+        """
+        if not self.impact_applied:
+            t = self.start_year
+            yield self._state_row(t)
+
+            self.apply_impact()
+            yield self._state_row(t)
+
+        dust_fine0 = self.dust_mass_kg * FINE_DUST_FRACTION
+        dust_coarse0 = self.dust_mass_kg * COARSE_DUST_FRACTION
+        span = drawdown = 0.0
+        temp_co2 = 0.8 * co2_forcing(self.co2_ppm)
+        for k, t, dt, fine, coarse, tau, intensity in iter_forcing_steps(blocks, dust_fine0):
+            if self.ejecta_pulse_triggered and t >= self.ejecta_pulse_time:
+                self._ejecta_pulse()
+            target_anomaly = temperature_drop(tau) + temp_co2 + 0.8 * methane_forcing(self.methane_ppb)
+            self.temp_anomaly += (target_anomaly - self.temp_anomaly) * -math.expm1(-dt / 2.0)
+            drawdown += silicate_weathering_rate(self.temp_anomaly + BASELINE_TEMP, self.co2_ppm) * dt
+            self.methane_ppb = max(0.0, self.methane_ppb * math.exp(-dt / methane_lifetime(tau)))
+            self._aftershocks(t, dt, intensity)
+            self.time, self.dt, self.fine_fraction, self.coarse_fraction = t, dt, fine, coarse
+            span += dt
+            if span >= min(self.dt_slow, MULTIRATE_SLOW_FRACTION * (t - self.start_year)):
+                self.dust_fine, self.dust_coarse = dust_fine0 * fine, dust_coarse0 * coarse
+                self._slow_step(span, drawdown)
+                span = drawdown = 0.0
+                temp_co2 = 0.8 * co2_forcing(self.co2_ppm)
+                yield self._state_row(t, tau)
+        if span > 0:
+            # The run ends part way through a macro step
+            self.dust_fine, self.dust_coarse = dust_fine0 * fine, dust_coarse0 * coarse
+            self._slow_step(span, drawdown)
+            yield self._state_row(t, tau)
+
+    def _slow_step(self, span: float, drawdown: float):
+        """
+        Macro step of the slow variables over span years, at the end of a
+        fast sub-cycle: drawdown is the weathering (GtC) integrated over it.
+        Relaxations and DIC growth are integrated exactly, as in the
+        adaptive stepper; biodiversity sees the fast state at the end.
+        """
+        self.ocean_dic *= math.exp(math.log(self.co2_ppm / BASELINE_CO2) / BUFFER_FACTOR * span / 100.0)
+        if self.carbonate == 'ratio':
+            h_conc = (self.ocean_dic / self.ocean_alk) * 1e-8
+            self.ocean_ph = max(6.0, min(8.5, -math.log10(h_conc)))
+        else:
+            self.ocean_ph = self._equilibrium_ph(self.ocean_dic)
+        self.co2_ppm = max(180.0, self.co2_ppm - drawdown * GtC_TO_PPM)
+        self.magnetosphere += (1.0 - self.magnetosphere) * -math.expm1(-span / 100.0)
 
-        t += dt
-        while t <= self.end_year:
-            # Increase dt gradually after first 100 years
-            if t > 100:
-                dt = min(self.dt_final, dt * 1.1)
-            elif t > 10:
-                dt = min(1.0, dt * 1.2)
+        temp_stress = math.exp(-0.1 * max(0, self.temp_anomaly + BASELINE_TEMP - 2.0))
+        ph_stress = max(0, min(1, (self.ocean_ph - 6.5) / (8.2 - 6.5)))
+        survival = temp_stress * ph_stress
+        if survival > self.biodiversity:
+            self.biodiversity += (survival - self.biodiversity) * -math.expm1(-span / 50.0)
+        else:
+            self.biodiversity = survival
+        self.biodiversity = np.clip(self.biodiversity, 0.0, 1.0)
 
-            self.step(t, dt)
-            results.append(self.get_state(t))
-            t += dt
+    def _ode_state(self) -> np.ndarray:
+        """Current state in IVP_STATE order."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            log_dic = np.log(self.ocean_dic)
+        return np.array([self.temp_anomaly, self.co2_ppm, self.methane_ppb, log_dic,
+                         self.biodiversity, self.magnetosphere], dtype=float)
+
+    def _iter_ivp_rows(self, schedule: ForcingSchedule, output_times=None
+                       ) -> Iterator[Tuple[float, ...]]:
+        """
+        --integrator ivp: integrate once with solve_ivp, then evaluate the
+        dense output on the forcing grid, block by block, or straight at the
+        output_times within the run.
+        """
+        t = self.start_year
+        yield self._state_row(t)
 
-        return results
+        self.apply_impact()
+        yield self._state_row(t)
+
+        trajectory = self.integrate_ivp(self._draw_quakes(schedule))
+        if output_times is None:
+            grid = (times for times, *_ in schedule.blocks())
+        else:
+            times = np.asarray(output_times, dtype=float)
+            times = times[(times > t) & (times <= schedule.times[-1])]
+            grid = np.array_split(times, range(4096, len(times), 4096)) if len(times) else []
+        last = None
+        for times in grid:
+            columns = self._ivp_columns(trajectory, times)
+            yield from zip(*(c.tolist() for c in columns))
+            last = [float(c[-1]) for c in columns]
+        if output_times is not None and len(schedule):
+            last = [float(c[-1]) for c in self._ivp_columns(trajectory, schedule.times[-1:])]
+        if last is not None:
+            # Leave the state attributes at the end of the run, as the Euler loop does
+            (t, self.temp_anomaly, self.co2_ppm, self.ocean_ph, self.biodiversity,
+             self.methane_ppb, _, self.magnetosphere, self.subsurface_habitat,
+             self.seismic_intensity) = last
+            with np.errstate(over='ignore'):     # DIC may grow without bound, as in Euler
+                self.ocean_dic = float(np.exp(trajectory([t])[0][IVP_STATE.index('log_ocean_dic'), 0]))
+
+    def _draw_quakes(self, schedule: ForcingSchedule) -> List[Tuple[float, float]]:
+        """
+        (time, seismic intensity) of every aftershock.  Whether a quake
+        happens does not depend on the state, so they are drawn up front on
+        the forcing grid, from the same rng stream the Euler loop consumes
+        (or, with aftershocks='poisson', at their sampled times).
+        """
+        if self.aftershocks == 'poisson':
+            self._sample_aftershocks()
+            quakes = [(at, omori_intensity(at)) for at in self.quake_times]
+            self.quake_times = []
+            return quakes
+        quakes = []
+        for times, dts, _, _, intensity in schedule.blocks():
+            hit = self.rng.random(len(times)) < 0.1 * intensity * dts
+            quakes.extend(zip(times[hit].tolist(), intensity[hit].tolist()))
+        return quakes
+
+    def _optical_depth(self, t):
+        """Dust optical depth at time t, from the continuous fallout decay."""
+        dust_fine0 = self.dust_mass_kg * FINE_DUST_FRACTION
+        return solar_extinction(dust_fine0 * np.exp(-FINE_DUST_FALLOUT_RATE * (t - self.start_year)), 0.0)
+
+    def _ph(self, log_dic):
+        """
+        pH for log(DIC): -log10((dic / alk) * 1e-8) clamped to 6–8.5 in the
+        ratio model, else the unclamped carbonate equilibrium.
+        """
+        if self.carbonate == 'ratio':
+            return _clamp(8.0 - (log_dic - np.log(self.ocean_alk)) / np.log(10.0), 6.0, 8.5)[()]
+        return self._equilibrium_ph(np.exp(log_dic))
+
+    def _equilibrium_ph(self, dic):
+        """Carbonate-equilibrium pH of dic, warm-started from the current pH."""
+        return equilibrium_ph(dic, self.ocean_alk, self.ocean_ph, self.carbonate == 'table')
+
+    def _ivp_rhs(self, t: float, y: np.ndarray) -> List[float]:
+        """Right‑hand side of the coupled system, in IVP_STATE order."""
+        temp, co2, ch4, log_dic, bio, mag = y
+        tau = self._optical_depth(t)
+        # Trial points may overshoot the floors the Euler step clips to
+        co2 = max(180.0, co2)
+        ch4 = max(0.0, ch4)
+
+        target_anomaly = temperature_drop(tau) + 0.8 * (co2_forcing(co2) + methane_forcing(ch4))
+        ph = self._ph(log_dic)
+
+        # Weathering stops at the 180 ppm floor the Euler step clips to
+        weathering = silicate_weathering_rate(temp + BASELINE_TEMP, co2) if y[1] > 180.0 else 0.0
+
+        temp_stress = math.exp(-0.1 * max(0, temp + BASELINE_TEMP - 2.0))
+        ph_stress = max(0, min(1, (ph - 6.5) / (8.2 - 6.5)))
+        survival = temp_stress * ph_stress
+        bio_timescale = 50.0 if survival > bio else BIODIVERSITY_COLLAPSE_TIME
+
+        return [(target_anomaly - temp) / 2.0,
+                -weathering * GtC_TO_PPM,
+                -ch4 / methane_lifetime(tau),
+                math.log(co2 / BASELINE_CO2) / (BUFFER_FACTOR * 100.0),
+                (survival - bio) / bio_timescale,
+                (1.0 - mag) / 100.0]
+
+    def integrate_ivp(self, quakes: List[Tuple[float, float]] = ()) -> DenseTrajectory:
+        """
+        Integrate the post‑impact state to end_year with solve_ivp.
+
+        Known-time discontinuities – the ejecta pulse, each aftershock and
+        the methane-lifetime switch as τ falls through 10 – end a segment;
+        the jump is applied and the solver restarts from the new state.
+        Two state events are located by the solver: CO₂ falling to its
+        180 ppm floor, where it is pinned, and the surface temperature
+        rising through PULSE_METHANE_THRESHOLD.
+        """
+        t = self.start_year
+        jumps = {}
+        if self.ejecta_pulse_triggered:
+            jumps.setdefault(max(t, self.ejecta_pulse_time), []).append(('pulse', 0.0))
+        for t_quake, intensity in quakes:
+            jumps.setdefault(t_quake, []).append(('quake', intensity))
+        tau0 = self._optical_depth(t)
+        if tau0 > 10:
+            jumps.setdefault(t + math.log(tau0 / 10) / FINE_DUST_FALLOUT_RATE, [])
+
+        from scipy.integrate import solve_ivp    # SciPy is only loaded by the runs that need it
+        y = self._ode_state()
+        habitat = self.subsurface_habitat
+        atol = self.atol * IVP_ATOL_SCALE
+        events = [temperature_threshold_event(PULSE_METHANE_THRESHOLD, BASELINE_TEMP),
+                  co2_floor_event]
+        trajectory = DenseTrajectory()
+        for t_next in sorted(b for b in jumps if b < self.end_year) + [self.end_year]:
+            while t_next > t:
+                sol = solve_ivp(self._ivp_rhs, (t, t_next), y, method=self.ivp_method,
+                                rtol=self.rtol, atol=atol, dense_output=True, events=events)
+                if not sol.success:
+                    raise RuntimeError(f"solve_ivp failed at t={sol.t[-1]:.4g}: {sol.message}")
+                trajectory.add(t, sol, habitat)
+                y = sol.y[:, -1].copy()
+                t = sol.t[-1]
+                if sol.status == 1:     # CO₂ reached the floor
+                    y[IVP_STATE.index('co2_ppm')] = 180.0
+            for kind, intensity in jumps.get(t_next, ()):
+                if kind == 'pulse':
+                    y[0] += self.ejecta_pulse_temp_increment
+                    if y[0] + BASELINE_TEMP > PULSE_METHANE_THRESHOLD:
+                        y[2] += 500.0 * 0.01
+                    self.ejecta_pulse_triggered = False
+                else:
+                    habitat *= 1.0 - 0.05 * intensity
+                    self.last_quake_time = t_next
+
+        self.solver_stats = trajectory.stats()
+        logging.info(f"ivp ({self.ivp_method}): {self.solver_stats['steps']} steps, "
+                     f"{self.solver_stats['nfev']} RHS evaluations, "
+                     f"{self.solver_stats['segments']} segments")
+        if trajectory.threshold_crossings:
+            logging.debug(f"Surface temperature rose through {PULSE_METHANE_THRESHOLD} °C at t="
+                          + ', '.join(f'{c:.4g}' for c in trajectory.threshold_crossings))
+        return trajectory
+
+    def _ivp_columns(self, trajectory: DenseTrajectory, times: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Output columns, in STATE_COLUMNS order, of the dense solution at times."""
+        y, habitat = trajectory(times)
+        temp, co2, ch4, log_dic, bio, mag = y
+        ph = self._ph(log_dic)
+        intensity = 1.0 / (1.0 + OMORI_K * (times - 0.0)**OMORI_P)
+        return (times, temp, co2, ph, np.clip(bio, 0.0, 1.0), np.maximum(ch4, 0.0),
+                self._optical_depth(times), mag, habitat, intensity)
+
+    def forcing_schedule(self) -> ForcingSchedule:
+        """The forcing for the rest of the run, from the current loop position."""
+        return forcing_schedule(self.start_year, self.end_year, self.dt_initial, self.dt_final,
+                                FINE_DUST_FALLOUT_RATE, COARSE_DUST_FALLOUT_RATE,
+                                self.forcing_position())
+
+    def forcing_position(self) -> Tuple[float, float, float, float]:
+        """Where the Euler loop stands: the position argument of forcing_blocks()."""
+        return (self.time, self.dt, self.fine_fraction, self.coarse_fraction)
 
     def apply_impact(self):
         """Immediate effects of the impact."""
@@ -290,21 +1722,65 @@ class AsteroidImpactEnhanced:
         # Initial seismic intensity
         self.seismic_intensity = 1.0
         self.last_quake_time = 0.0
+        self.impact_applied = True
 
     def step(self, t: float, dt: float):
         """Advance simulation by dt years."""
-        # Dust fallout
+        tau = self._dust_fallout(dt)
+
+        seismic_intensity = 1.0 / (1.0 + OMORI_K * (t - 0.0)**OMORI_P)
+        pulse = t >= self.ejecta_pulse_time
+        self._coupled_step(t, dt, tau, seismic_intensity, pulse)
+
+    def _coupled_step(self, t: float, dt: float, tau: float, seismic_intensity: float,
+                      pulse: bool):
+        """
+        State‑dependent part of step().  Dust optical depth, Omori intensity
+        and whether the ejecta pulse is due come from the caller (step() or
+        the forcing schedule in run()).
+        """
+        # Ejecta re‑entry pulse (once)
+        if self.ejecta_pulse_triggered and pulse:
+            self._ejecta_pulse()
+
+        self._relax(t, dt, tau)
+        self._aftershocks(t, dt, seismic_intensity)
+
+        # Clipping
+        self.co2_ppm = max(180.0, self.co2_ppm)
+        self.methane_ppb = max(0.0, self.methane_ppb)
+
+    def _dust_fallout(self, dt: float) -> float:
+        """Settle both dust modes over dt; returns the optical depth left."""
         self.dust_fine *= math.exp(-FINE_DUST_FALLOUT_RATE * dt)
         self.dust_coarse *= math.exp(-COARSE_DUST_FALLOUT_RATE * dt)
+        return solar_extinction(self.dust_fine, self.dust_coarse)
 
-        # Ejecta re‑entry pulse (once)
-        if self.ejecta_pulse_triggered and t >= self.ejecta_pulse_time:
-            self.temp_anomaly += self.ejecta_pulse_temp_increment
-            if self.temp_anomaly + BASELINE_TEMP > 30.0:
-                methane_release_ppb = 500.0 * 0.01
-                self.methane_ppb += methane_release_ppb
-            self.ejecta_pulse_triggered = False
+    def _ejecta_pulse(self):
+        self.temp_anomaly += self.ejecta_pulse_temp_increment
+        if self.temp_anomaly + BASELINE_TEMP > PULSE_METHANE_THRESHOLD:
+            methane_release_ppb = 500.0 * 0.01
+            self.methane_ppb += methane_release_ppb
+        self.ejecta_pulse_triggered = False
 
+    def _relax(self, t: float, dt: float, tau: float, exponential: bool = False):
+        """
+        Deterministic update of the climate, ocean and biosphere over dt.
+        exponential=True integrates the linear terms (temperature,
+        magnetosphere and biodiversity relaxation, DIC growth) exactly, as
+        the adaptive stepper does so that its step is not limited by Euler
+        stability.  Each sub-model is a method of its own, in this order, so
+        that --profile can time it (PROFILE_SECTIONS).
+        """
+        self._greenhouse(dt, tau, exponential)
+        self._ocean_chemistry(dt, exponential)
+        self._weathering(dt)
+        self._methane_decay(dt, tau)
+        self._magnetosphere_recovery(dt, exponential)
+        self._biodiversity_response(dt, exponential)
+
+    def _greenhouse(self, dt: float, tau: float, exponential: bool = False):
+        """Temperature relaxing towards the greenhouse warming plus the dust cooling."""
         # Greenhouse effect
         forcing_co2 = co2_forcing(self.co2_ppm)
         forcing_ch4 = methane_forcing(self.methane_ppb)
@@ -312,86 +1788,478 @@ class AsteroidImpactEnhanced:
         temp_ghg = 0.8 * total_forcing
 
         # Dust forcing
-        tau = solar_extinction(self.dust_fine, self.dust_coarse)
         temp_dust = temperature_drop(tau)
 
         target_anomaly = temp_dust + temp_ghg
-        self.temp_anomaly += (target_anomaly - self.temp_anomaly) * dt / 2.0
+        self.temp_anomaly += _relaxation(target_anomaly - self.temp_anomaly, dt, 2.0, exponential)
 
+    def _ocean_chemistry(self, dt: float, exponential: bool = False):
+        """DIC uptake from the CO₂ excess, and the pH it leaves."""
         # Ocean carbonate chemistry (simplified)
         delta_dic = (self.ocean_dic / BUFFER_FACTOR) * (math.log(self.co2_ppm / BASELINE_CO2))
-        self.ocean_dic += delta_dic * dt / 100.0
-        h_conc = (self.ocean_dic / self.ocean_alk) * 1e-8
-        self.ocean_ph = -math.log10(h_conc)
-        self.ocean_ph = max(6.0, min(8.5, self.ocean_ph))
+        if exponential or self.carbonate != 'ratio':
+            # DIC grows in proportion to itself; integrate that exactly too
+            self.ocean_dic *= math.exp(math.log(self.co2_ppm / BASELINE_CO2) / BUFFER_FACTOR * dt / 100.0)
+        else:
+            self.ocean_dic += delta_dic * dt / 100.0
+        if self.carbonate == 'ratio':
+            h_conc = (self.ocean_dic / self.ocean_alk) * 1e-8
+            self.ocean_ph = -math.log10(h_conc)
+            self.ocean_ph = max(6.0, min(8.5, self.ocean_ph))
+        else:
+            self.ocean_ph = self._equilibrium_ph(self.ocean_dic)
 
-        # Silicate weathering
+    def _weathering(self, dt: float):
+        """CO₂ drawdown by silicate weathering."""
         weathering_rate = silicate_weathering_rate(self.temp_anomaly + BASELINE_TEMP, self.co2_ppm)
         ppm_change = -weathering_rate * GtC_TO_PPM * dt
         self.co2_ppm += ppm_change
 
-        # Methane decay
+    def _methane_decay(self, dt: float, tau: float):
         lifetime = methane_lifetime(tau)
         self.methane_ppb *= math.exp(-dt / lifetime)
 
-        # Magnetosphere recovery
-        self.magnetosphere += (1.0 - self.magnetosphere) * dt / 100.0
+    def _magnetosphere_recovery(self, dt: float, exponential: bool = False):
+        self.magnetosphere += _relaxation(1.0 - self.magnetosphere, dt, 100.0, exponential)
 
-        # Biodiversity
+    def _biodiversity_response(self, dt: float, exponential: bool = False):
+        """Biodiversity recovering towards, or collapsing onto, the survival the climate allows."""
         temp_stress = math.exp(-0.1 * max(0, self.temp_anomaly + BASELINE_TEMP - 2.0))
         ph_stress = max(0, min(1, (self.ocean_ph - 6.5) / (8.2 - 6.5)))
         survival = temp_stress * ph_stress
         if survival > self.biodiversity:
-            self.biodiversity += (survival - self.biodiversity) * dt / 50.0
+            self.biodiversity += _relaxation(survival - self.biodiversity, dt, 50.0, exponential)
         else:
             self.biodiversity = survival
         self.biodiversity = np.clip(self.biodiversity, 0.0, 1.0)
 
-        # Seismic aftershocks (Omori law)
-        self.seismic_intensity = 1.0 / (1.0 + OMORI_K * (t - 0.0)**OMORI_P)
-        rate = 0.1 * self.seismic_intensity
-        if self.rng.random() < rate * dt:
+    def _aftershocks(self, t: float, dt: float, seismic_intensity: float) -> bool:
+        """Seismic aftershocks (Omori law); True if a quake struck during dt."""
+        self.seismic_intensity = seismic_intensity
+        if self.aftershocks == 'poisson':
+            self._sample_aftershocks()
+            quake = bool(self.quake_times) and self.quake_times[0] <= t
+            while self.quake_times and self.quake_times[0] <= t:
+                at = self.quake_times.pop(0)
+                self.subsurface_habitat *= (1.0 - 0.05 * omori_intensity(at))
+                self.last_quake_time = at
+        else:
+            rate = 0.1 * self.seismic_intensity
+            quake = self.rng.random() < rate * dt
+            if quake:
+                damage = 0.05 * self.seismic_intensity
+                self.subsurface_habitat *= (1.0 - damage)
+                self.last_quake_time = t
+        self.subsurface_habitat = np.clip(self.subsurface_habitat, 0.0, 1.0)
+        return quake
+
+    def _sample_aftershocks(self):
+        """Extend the pending quake times (aftershocks='poisson') up to end_year."""
+        if self.aftershocks == 'poisson' and self.end_year > self.quake_horizon:
+            self.quake_times += sample_aftershocks(self.rng, self.quake_horizon, self.end_year).tolist()
+            self.quake_horizon = self.end_year
+
+    def _state_row(self, t: float, tau: Optional[float] = None) -> Tuple[float, ...]:
+        """Unrounded output row in STATE_COLUMNS order."""
+        if tau is None:
+            tau = solar_extinction(self.dust_fine, self.dust_coarse)
+        return (t, self.temp_anomaly, self.co2_ppm, self.ocean_ph, self.biodiversity,
+                self.methane_ppb, tau, self.magnetosphere, self.subsurface_habitat,
+                self.seismic_intensity)
+
+    def get_state(self, t: float) -> Dict[str, float]:
+        return {k: round(v, STATE_ROUNDING[k]) for k, v in zip(STATE_COLUMNS, self._state_row(t))}
+
+
+# ----------------------------------------------------------------------
+# Profiling (--profile)
+# ----------------------------------------------------------------------
+# Sub-models of the simulator, by the name they are reported under, and the
+# methods that compute them.  Profiler.instrument() times these methods;
+# forcing_schedule() is where the Euler and multi-rate loops get their dust
+# fallout (precomputed, once per grid).  get_state() is timed through
+# _state_row(), which builds every output row.
+PROFILE_SECTIONS = {
+    'dust_fallout': ('_dust_fallout', 'forcing_schedule'),
+    'ejecta_pulse': ('_ejecta_pulse',),
+    'greenhouse': ('_greenhouse',),
+    'ocean_chemistry': ('_ocean_chemistry',),
+    'weathering': ('_weathering',),
+    'methane': ('_methane_decay',),
+    'magnetosphere': ('_magnetosphere_recovery',),
+    'biodiversity': ('_biodiversity_response',),
+    'seismic': ('_aftershocks',),
+    'slow_step': ('_slow_step',),
+    'ivp_rhs': ('_ivp_rhs',),
+    'get_state': ('_state_row',),
+}
+
+
+class Profiler(earth_sims.profiling.Profiler):
+    """--profile timing of the PROFILE_SECTIONS of AsteroidImpactEnhanced."""
+    submodels = PROFILE_SECTIONS
+    simulator = AsteroidImpactEnhanced
+
+
+# ----------------------------------------------------------------------
+# Ensemble engine – N scenarios advanced together as NumPy arrays
+# ----------------------------------------------------------------------
+def _member_values(value, n: int, dtype=float) -> np.ndarray:
+    """Broadcast a scalar or per-member sequence to an array of length n."""
+    arr = np.asarray(value, dtype=dtype)
+    if arr.ndim == 0:
+        return np.full(n, arr.item(), dtype=dtype)
+    if arr.shape != (n,):
+        raise ValueError(f"Expected {n} member values, got shape {arr.shape}")
+    return arr.copy()
+
+def _ensemble_size(*values) -> int:
+    sizes = {len(v) for v in values if np.ndim(v) > 0 and not isinstance(v, str)}
+    if len(sizes) > 1:
+        raise ValueError(f"Per-member parameters have mismatched lengths: {sorted(sizes)}")
+    return sizes.pop() if sizes else 1
+
+
+class AsteroidImpactEnsemble:
+    """
+    Structure-of-arrays version of AsteroidImpactEnhanced.
+
+    Diameter, density, velocity, target type and seed may be given per member;
+    the time grid is shared so one vectorized step() advances every member.
+    Member i reproduces AsteroidImpactEnhanced(...) built from the i-th values.
+    """
+
+    DRAW_BLOCK = 256    # aftershock draws pre-generated per member rng call
+
+    def __init__(self,
+                 diameter=12.0,                    # km, scalar or per member
+                 density=ASTEROID_DENSITY,
+                 velocity=20e3,
+                 angle: float = 90.0,
+                 target_type='continental',
+                 start_year: float = 0.0,
+                 end_year: float = 10000.0,
+                 dt_initial: float = 0.01,
+                 dt_final: float = 10.0,
+                 seed=None,
+                 aftershocks: str = 'step',         # one of AFTERSHOCK_SAMPLERS
+                 carbonate: str = 'ratio'):         # one of CARBONATE_MODELS
+        if aftershocks not in AFTERSHOCK_SAMPLERS:
+            raise ValueError(f"aftershocks must be one of {', '.join(AFTERSHOCK_SAMPLERS)}")
+        if carbonate not in CARBONATE_MODELS:
+            raise ValueError(f"carbonate must be one of {', '.join(CARBONATE_MODELS)}")
+        n = _ensemble_size(diameter, density, velocity, target_type, seed)
+        self.n_members = n
+        self.diameter = _member_values(diameter, n)
+        self.density = _member_values(density, n)
+        self.velocity = _member_values(velocity, n)
+        self.angle = angle
+        self.target_type = _member_values(target_type, n, dtype=object)
+        self.start_year = start_year
+        self.end_year = end_year
+        self.dt_initial = dt_initial
+        self.dt_final = dt_final
+        seeds = _member_values(seed, n, dtype=object)
+        self.seed = seeds
+        self.rngs = [np.random.default_rng(s) for s in seeds]
+        self._draws = np.empty((0, n))
+        self._draw_pos = 0
+        self.aftershocks = aftershocks
+        self.carbonate = carbonate
+        self._quakes: Optional[np.ndarray] = None   # (n, k) sampled quake times, inf-padded
+        self._quake_pos = np.zeros(n, dtype=int)
+
+        bad = set(self.target_type) - {'continental', 'oceanic'}
+        if bad:
+            raise ValueError(f"Unknown target type(s): {sorted(bad)}")
+        self.continental = self.target_type == 'continental'
+
+        # Impact parameters (same formulas as the scalar class, per member)
+        self.energy_J = impact_energy(self.diameter*1000, self.density, self.velocity)
+        self.energy_GT = self.energy_J / GT_TO_J
+        self.crater_km = np.where(self.continental,
+                                  crater_diameter_collins(self.energy_J, 'continental'),
+                                  crater_diameter_collins(self.energy_J, 'oceanic'))
+        self.dust_mass_kg = dust_ejected(self.energy_J, self.diameter*1000, self.density)
+        self.initial_tau = solar_extinction(self.dust_mass_kg * FINE_DUST_FRACTION,
+                                            self.dust_mass_kg * COARSE_DUST_FRACTION)
+
+        # State variables
+        self.time = start_year
+        self.dust_fine = self.dust_mass_kg * FINE_DUST_FRACTION
+        self.dust_coarse = self.dust_mass_kg * COARSE_DUST_FRACTION
+        self.temp_anomaly = np.zeros(n)
+        self.co2_ppm = np.full(n, BASELINE_CO2)
+        self.ocean_ph = np.full(n, BASELINE_PH)
+        self.biodiversity = np.full(n, BASELINE_BIODIVERSITY)
+        self.methane_ppb = np.full(n, BASELINE_METHANE)
+        self.magnetosphere = np.full(n, BASELINE_MAGNETOSPHERE)
+        self.subsurface_habitat = np.ones(n)
+
+        self.ocean_dic = np.full(n, 2.3e-3)
+        self.ocean_alk = np.full(n, 2.4e-3)
+        self.ocean_temp = np.full(n, BASELINE_TEMP)
+        if carbonate != 'ratio':
+            self.ocean_dic = carbonate_dic(self.ocean_alk, BASELINE_PH)
+
+        # Ejecta pulse (timing is shared, strength is per member)
+        self.ejecta_pulse_triggered = False
+        self.ejecta_pulse_time = 0.0
+        self.ejecta_pulse_strength = np.zeros(n)
+        self.ejecta_pulse_temp_increment = np.zeros(n)
+
+        self.seismic_intensity = 1.0
+        self.last_quake_time = np.zeros(n)
+
+    def _next_draws(self) -> np.ndarray:
+        """One uniform per member, drawn from each member's own generator."""
+        if self._draw_pos >= len(self._draws):
+            # Generator.random(k) yields the same stream as k scalar calls
+            self._draws = np.stack([rng.random(self.DRAW_BLOCK) for rng in self.rngs], axis=1)
+            self._draw_pos = 0
+        draws = self._draws[self._draw_pos]
+        self._draw_pos += 1
+        return draws
+
+    def _sampled_quakes(self) -> np.ndarray:
+        """Every member's quake times (aftershocks='poisson'), sampled on first use."""
+        if self._quakes is None:
+            times = [sample_aftershocks(rng, self.start_year, self.end_year) for rng in self.rngs]
+            self._quakes = np.full((self.n_members, max(map(len, times)) + 1), np.inf)
+            for row, member_times in zip(self._quakes, times):
+                row[:len(member_times)] = member_times
+        return self._quakes
+
+    def forcing_schedule(self) -> ForcingSchedule:
+        return forcing_schedule(self.start_year, self.end_year, self.dt_initial, self.dt_final,
+                                FINE_DUST_FALLOUT_RATE, COARSE_DUST_FALLOUT_RATE)
+
+    def run(self) -> Dict[str, np.ndarray]:
+        """
+        Run every member.  Returns 'year' as a (n_rows,) array and every other
+        column as a (n_rows, n_members) array, rows as in the scalar run().
+        Members that differ only by seed share one deterministic trajectory;
+        just their aftershocks are simulated separately.
+        """
+        physics = {}
+        group = np.array([physics.setdefault(p, len(physics)) for p in
+                          zip(self.diameter, self.density, self.velocity, self.target_type)])
+        if len(physics) < self.n_members:
+            return self._run_replayed(list(physics), group)
+
+        schedule = self.forcing_schedule()
+        n_rows = len(schedule) + 2
+        out = {'year': np.empty(n_rows)}
+        for key in STATE_ROUNDING:
+            if key != 'year':
+                out[key] = np.empty((n_rows, self.n_members))
+
+        def record(row, t):
+            for key, value in self.get_state(t).items():
+                out[key][row] = value
+
+        record(0, self.start_year)
+        self.apply_impact()
+        record(1, self.start_year)
+
+        pulse_k = schedule.pulse_step(self.ejecta_pulse_time)
+        dust_fine0, dust_coarse0 = self.dust_fine, self.dust_coarse
+        for k, (t, dt) in enumerate(zip(schedule.times.tolist(), schedule.dts.tolist())):
+            self.dust_fine = dust_fine0 * schedule.fine_fraction[k]
+            self.dust_coarse = dust_coarse0 * schedule.coarse_fraction[k]
+            tau = solar_extinction(self.dust_fine, self.dust_coarse)
+            self._coupled_step(t, dt, tau, schedule.seismic_intensity[k], k == pulse_k)
+            record(k + 2, t)
+        return out
+
+    def _run_replayed(self, physics: List[Tuple], group: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        run() for members sharing physics: advance one member per parameter
+        set, spread the result over its group, and replay each member's
+        aftershocks with its own rng (see STOCHASTIC_STATE).
+        """
+        diameter, density, velocity, target_type = (list(v) for v in zip(*physics))
+        core = AsteroidImpactEnsemble(diameter, density, velocity, self.angle, target_type,
+                                      self.start_year, self.end_year, self.dt_initial,
+                                      self.dt_final, carbonate=self.carbonate)
+        out = {key: (value if key == 'year' else np.take(value, group, axis=1))
+               for key, value in core.run().items()}
+
+        schedule = self.forcing_schedule()
+        if self.aftershocks == 'poisson':
+            replayed = [replay_quake_times(schedule.times, quakes[quakes < np.inf], h, 0.0)
+                        for quakes, h in zip(self._sampled_quakes(), self.subsurface_habitat)]
+            habitat = np.array([r[0] for r in replayed]).T
+            self.last_quake_time = np.array([r[1] for r in replayed])
+            self._quake_pos = np.array([r[2] for r in replayed])
+        else:
+            habitat, self.last_quake_time = replay_aftershocks(
+                schedule.times, schedule.dts, schedule.seismic_intensity, self.rngs,
+                self.subsurface_habitat, 0.0)
+        out['subsurface_habitat_fraction'][:2] = self.subsurface_habitat
+        out['subsurface_habitat_fraction'][2:] = habitat
+        if len(habitat):
+            self.subsurface_habitat = habitat[-1]
+
+        # Leave the ensemble in its final state, as the stepped run() does
+        skip = ({'n_members', 'seed', 'rngs', '_draws', '_draw_pos', 'aftershocks', '_quakes',
+                 '_quake_pos'} | set(STOCHASTIC_STATE))
+        for name, value in vars(core).items():
+            if name not in skip:
+                if isinstance(value, np.ndarray) and value.shape == (len(physics),):
+                    value = value[group]
+                setattr(self, name, value)
+        return out
+
+    def apply_impact(self):
+        """Immediate effects of the impact, for all members."""
+        tau = solar_extinction(self.dust_fine, self.dust_coarse)
+        self.temp_anomaly = temperature_drop(tau)
+
+        # CO₂ from carbonate vaporisation on continental targets only
+        vapor_mass = 10.0 * (self.dust_mass_kg / 100.0)
+        co2_released_kg = 0.1 * vapor_mass
+        co2_ppm_increment = co2_released_kg / ATMOSPHERE_MASS * 1e6 * (MOLAR_MASS_AIR / MOLAR_MASS_CO2)
+        self.co2_ppm = np.where(self.continental, self.co2_ppm + co2_ppm_increment, self.co2_ppm)
+
+        kill_fraction = 1.0 - np.exp(-0.01 * self.energy_GT / 100.0)
+        self.biodiversity = self.biodiversity * (1.0 - kill_fraction)
+
+        self.magnetosphere = np.maximum(0.8, 1.0 - 0.2 * (self.energy_GT / 1e6))
+
+        self.ejecta_pulse_triggered = True
+        self.ejecta_pulse_time = 0.05
+        self.ejecta_pulse_strength = 0.5 * self.dust_coarse
+        self.ejecta_pulse_temp_increment = 5.0 * (self.ejecta_pulse_strength / 1e15)
+
+        self.seismic_intensity = 1.0
+        self.last_quake_time = np.zeros(self.n_members)
+
+    def step(self, t: float, dt: float):
+        """Advance every member by dt years (mirrors AsteroidImpactEnhanced.step)."""
+        # Dust fallout
+        self.dust_fine = self.dust_fine * math.exp(-FINE_DUST_FALLOUT_RATE * dt)
+        self.dust_coarse = self.dust_coarse * math.exp(-COARSE_DUST_FALLOUT_RATE * dt)
+        tau = solar_extinction(self.dust_fine, self.dust_coarse)
+
+        seismic_intensity = 1.0 / (1.0 + OMORI_K * (t - 0.0)**OMORI_P)
+        self._coupled_step(t, dt, tau, seismic_intensity, t >= self.ejecta_pulse_time)
+
+    def _coupled_step(self, t: float, dt: float, tau: np.ndarray, seismic_intensity: float,
+                      pulse: bool):
+        """State‑dependent part of step(), with the exogenous forcing supplied."""
+        # Ejecta re‑entry pulse (once, same time for every member)
+        if self.ejecta_pulse_triggered and pulse:
+            self.temp_anomaly = self.temp_anomaly + self.ejecta_pulse_temp_increment
+            hot = self.temp_anomaly + BASELINE_TEMP > PULSE_METHANE_THRESHOLD
+            self.methane_ppb = np.where(hot, self.methane_ppb + 500.0 * 0.01, self.methane_ppb)
+            self.ejecta_pulse_triggered = False
+
+        # Greenhouse effect
+        total_forcing = co2_forcing(self.co2_ppm) + methane_forcing(self.methane_ppb)
+        temp_ghg = 0.8 * total_forcing
+
+        # Dust forcing
+        temp_dust = temperature_drop(tau)
+
+        target_anomaly = temp_dust + temp_ghg
+        self.temp_anomaly = self.temp_anomaly + (target_anomaly - self.temp_anomaly) * dt / 2.0
+
+        # Ocean carbonate chemistry (simplified)
+        delta_dic = (self.ocean_dic / BUFFER_FACTOR) * np.log(self.co2_ppm / BASELINE_CO2)
+        if self.carbonate == 'ratio':
+            self.ocean_dic = self.ocean_dic + delta_dic * dt / 100.0
+            h_conc = (self.ocean_dic / self.ocean_alk) * 1e-8
+            self.ocean_ph = _clamp(-np.log10(h_conc), 6.0, 8.5)
+        else:
+            # Exact DIC growth and the carbonate equilibrium, as in the scalar model
+            self.ocean_dic = self.ocean_dic * np.exp(np.log(self.co2_ppm / BASELINE_CO2)
+                                                     / BUFFER_FACTOR * dt / 100.0)
+            self.ocean_ph = equilibrium_ph(self.ocean_dic, self.ocean_alk, self.ocean_ph,
+                                           self.carbonate == 'table')
+
+        # Silicate weathering
+        weathering_rate = silicate_weathering_rate(self.temp_anomaly + BASELINE_TEMP, self.co2_ppm)
+        self.co2_ppm = self.co2_ppm - weathering_rate * GtC_TO_PPM * dt
+
+        # Methane decay (the lifetime only takes two values, so use the scalar exps)
+        self.methane_ppb = self.methane_ppb * np.where(
+            tau > 10,
+            math.exp(-dt / (METHANE_LIFETIME_BASELINE * METHANE_UV_SENSITIVITY)),
+            math.exp(-dt / METHANE_LIFETIME_BASELINE))
+
+        # Magnetosphere recovery
+        self.magnetosphere = self.magnetosphere + (1.0 - self.magnetosphere) * dt / 100.0
+
+        # Biodiversity
+        excess = self.temp_anomaly + BASELINE_TEMP - 2.0
+        temp_stress = np.exp(-0.1 * np.where(excess > 0, excess, 0))
+        ph_stress = _clamp((self.ocean_ph - 6.5) / (8.2 - 6.5), 0.0, 1.0)
+        survival = temp_stress * ph_stress
+        self.biodiversity = np.where(survival > self.biodiversity,
+                                     self.biodiversity + (survival - self.biodiversity) * dt / 50.0,
+                                     survival)
+        self.biodiversity = np.clip(self.biodiversity, 0.0, 1.0)
+
+        # Seismic aftershocks (Omori law), one draw per member or the sampled quakes
+        self.seismic_intensity = seismic_intensity
+        if self.aftershocks == 'poisson':
+            quakes, members = self._sampled_quakes(), np.arange(self.n_members)
+            while True:
+                at = quakes[members, self._quake_pos]
+                quake = at <= t
+                if not quake.any():
+                    break
+                self.subsurface_habitat = np.where(
+                    quake, self.subsurface_habitat * (1.0 - 0.05 * omori_intensity(at)),
+                    self.subsurface_habitat)
+                self.last_quake_time = np.where(quake, at, self.last_quake_time)
+                self._quake_pos = self._quake_pos + quake
+        else:
+            rate = 0.1 * self.seismic_intensity
+            quake = self._next_draws() < rate * dt
             damage = 0.05 * self.seismic_intensity
-            self.subsurface_habitat *= (1.0 - damage)
-            self.last_quake_time = t
+            self.subsurface_habitat = np.where(quake, self.subsurface_habitat * (1.0 - damage),
+                                               self.subsurface_habitat)
+            self.last_quake_time = np.where(quake, t, self.last_quake_time)
         self.subsurface_habitat = np.clip(self.subsurface_habitat, 0.0, 1.0)
 
         # Clipping
-        self.co2_ppm = max(180.0, self.co2_ppm)
-        self.methane_ppb = max(0.0, self.methane_ppb)
+        self.co2_ppm = np.where(self.co2_ppm > 180.0, self.co2_ppm, 180.0)
+        self.methane_ppb = np.where(self.methane_ppb > 0.0, self.methane_ppb, 0.0)
 
-    def get_state(self, t: float) -> Dict[str, float]:
-        tau = solar_extinction(self.dust_fine, self.dust_coarse)
+    def get_state(self, t: float) -> Dict[str, np.ndarray]:
+        """Unrounded state of every member (year is a scalar)."""
         return {
-            'year': round(t, 4),
-            'temp_anomaly_c': round(self.temp_anomaly, 4),
-            'co2_ppm': round(self.co2_ppm, 2),
-            'ocean_ph': round(self.ocean_ph, 3),
-            'biodiversity_index': round(self.biodiversity, 4),
-            'methane_ppb': round(self.methane_ppb, 1),
-            'dust_optical_depth': round(tau, 4),
-            'magnetosphere_strength': round(self.magnetosphere, 4),
-            'subsurface_habitat_fraction': round(self.subsurface_habitat, 4),
-            'seismic_intensity': round(self.seismic_intensity, 4),
+            'year': t,
+            'temp_anomaly_c': self.temp_anomaly,
+            'co2_ppm': self.co2_ppm,
+            'ocean_ph': self.ocean_ph,
+            'biodiversity_index': self.biodiversity,
+            'methane_ppb': self.methane_ppb,
+            'dust_optical_depth': solar_extinction(self.dust_fine, self.dust_coarse),
+            'magnetosphere_strength': self.magnetosphere,
+            'subsurface_habitat_fraction': self.subsurface_habitat,
+            'seismic_intensity': self.seismic_intensity,
         }
 
+    @staticmethod
+    def member_results(results: Dict[str, np.ndarray], i: int) -> SimulationResults:
+        """Trajectory of member i, in the form returned by the scalar run()."""
+        return SimulationResults({k: (v if k == 'year' else v[:, i]) for k, v in results.items()})
+
 
 # ----------------------------------------------------------------------
-# Output writers (unchanged)
+# Output writers (CSV, JSON and NDJSON are in earth_sims.writers)
 # ----------------------------------------------------------------------
-def write_csv(results: List[Dict], filename: Path):
-    if not results:
-        raise ValueError("No data to write")
-    fieldnames = results[0].keys()
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(results)
-    logging.info(f"CSV written to {filename}")
-
-def write_html(results: List[Dict], filename: Path, sample_step: int = 100):
-    years = [r['year'] for r in results]
-    sampled = [r for r in results if int(r['year']) % sample_step == 0 or r['year'] == years[-1]]
+def write_html(results, filename: Path, sample_step: int = 100):
+    if isinstance(results, SimulationResults):
+        years = np.round(results['year'], STATE_ROUNDING['year'])
+        keep = (years.astype(int) % sample_step == 0) | (years == years[-1])
+        sampled = [results.row(i, rounded=True) for i in np.flatnonzero(keep)]
+    else:
+        years = [r['year'] for r in results]
+        sampled = [r for r in results if int(r['year']) % sample_step == 0 or r['year'] == years[-1]]
     html = ['<!DOCTYPE html><html><head><style>',
             'body{font-family:sans-serif}',
             'table{border-collapse:collapse}',
@@ -406,17 +2274,310 @@ def write_html(results: List[Dict], filename: Path, sample_step: int = 100):
         f.write('\n'.join(html))
     logging.info(f"HTML written to {filename}")
 
-def write_json(results: List[Dict], filename: Path):
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2)
-    logging.info(f"JSON written to {filename}")
+
+class CsvStreamWriter(earth_sims.writers.CsvStreamWriter):
+    """CSV rows written as they arrive, rounded to STATE_ROUNDING."""
+    rounding = STATE_ROUNDING
+
+
+class NdjsonStreamWriter(earth_sims.writers.NdjsonStreamWriter):
+    """Newline-delimited JSON, one object per row, rounded to STATE_ROUNDING."""
+    rounding = STATE_ROUNDING
+
+
+# ----------------------------------------------------------------------
+# Binary trajectory format (.npy)
+# ----------------------------------------------------------------------
+# Written and read by earth_sims.trajectory; results() and read_output()
+# give this model's SimulationResults.
+class Trajectory(earth_sims.trajectory.Trajectory):
+    results_class = SimulationResults
+
+
+def open_trajectory(filename) -> Trajectory:
+    return Trajectory(filename)
+
+
+def read_output(filename: Path) -> SimulationResults:
+    """Read a trajectory previously written as CSV or JSON."""
+    return earth_sims.trajectory.read_output(filename, SimulationResults)
+
+
+# ----------------------------------------------------------------------
+# Result cache
+# ----------------------------------------------------------------------
+# Finished seeded runs are cached by earth_sims.cache, under a hash of the
+# constructor arguments, the module-level constants and the source of this
+# file and of earth_sims.  Constants named CACHE_* configure the cache
+# itself and are not part of the key.
+
+
+@functools.lru_cache(maxsize=None)
+def model_fingerprint() -> str:
+    """Hash of this file's and earth_sims' source: any edit invalidates cached results."""
+    return earth_sims.cache.source_fingerprint(__file__)
+
+
+def model_constants() -> Dict[str, float]:
+    """Current values of the numeric module constants (they can be patched at runtime)."""
+    return earth_sims.cache.module_constants(globals())
+
+
+def result_cache_key(model: str, arguments: Dict) -> str:
+    """Content address of one run: model, its arguments, constants and source."""
+    return earth_sims.cache.result_cache_key(model, arguments, model_fingerprint(),
+                                             model_constants())
+
+
+class ResultCache(earth_sims.cache.ResultCache):
+    trajectory_class = Trajectory
+
+
+# ----------------------------------------------------------------------
+# Scenario runner and parameter sweeps (run by earth_sims.sweep)
+# ----------------------------------------------------------------------
+# CLI parameters that --sweep may vary, with the type of one value
+SWEEP_PARAMS = {
+    'diameter': float,
+    'density': float,
+    'velocity': float,
+    'angle': float,
+    'target': str,
+    'seed': int,
+    'dt_initial': float,
+    'dt_final': float,
+    'dt_slow': float,
+    'integrator': str,
+    'aftershocks': str,
+    'rtol': float,
+    'atol': float,
+    'steady_tol': float,
+    'carbonate': str,
+}
+
+def run_scenario(params: Dict, out_dir: Path, output: str, fmt: str = 'all',
+                 stream: bool = False, checkpoint_every: Optional[float] = None,
+                 resume: Optional[Path] = None, extend_to: Optional[float] = None,
+                 cache: Optional[ResultCache] = None, output_times: Optional[str] = None,
+                 record_changes: Optional[Dict[str, float]] = None, keep_recent: int = 0,
+                 profiler: Optional[Profiler] = None, replay: bool = False) -> Dict:
+    """
+    Run one scenario and write its outputs under out_dir.
+    params holds the SWEEP_PARAMS keys plus start_year/end_year.
+    With stream=True rows are written while the run progresses (csv or
+    ndjson; output '-' writes to stdout).
+    checkpoint_every saves a snapshot to <output>_checkpoint.json every so
+    many simulated years (0: only at the end).  resume continues the run
+    in that snapshot instead (to extend_to, if given), writing the rows
+    after it as <output>_from_<year>.
+    cache is consulted and filled for seeded, non-streamed runs.
+    output_times is an --output-times spec; only those years are recorded.
+    record_changes (tolerance overrides) records a step only when the state
+    has moved, keeping the last keep_recent steps in full (not in streams).
+    With profiler, the run's sub-models, the run as a whole (including the
+    writes when streamed) and each writer are timed; the breakdown goes to
+    <output>_profile.json and, as a table, to stderr.
+    replay goes to run() (seed sweeps).
+    The run's telemetry (run_telemetry()) is recorded in the metadata.
+    Returns the summary index entry for the run.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    times = parse_output_times(output_times) if output_times is not None else None
+    timer = profiler if profiler is not None else Profiler()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()     # one peak per scenario in a sweep worker
+
+    if resume is not None:
+        sim = AsteroidImpactEnhanced.load_snapshot(resume)
+        if extend_to is not None:
+            sim.end_year = extend_to
+        sim.jit = sim.jit or params['jit']
+        if output != '-':
+            output = f"{output}_from_{int(sim.time)}"
+        logging.info(f"Resuming {resume} at year {sim.time:g}, running to {sim.end_year:g}")
+    else:
+        sim = AsteroidImpactEnhanced(
+            diameter=params['diameter'],
+            density=params['density'],
+            velocity=params['velocity'],
+            angle=params['angle'],
+            target_type=params['target'],
+            start_year=params['start_year'],
+            end_year=params['end_year'],
+            dt_initial=params['dt_initial'],
+            dt_final=params['dt_final'],
+            dt_slow=params['dt_slow'],
+            seed=params['seed'],
+            integrator=params['integrator'],
+            ivp_method=params['ivp_method'],
+            rtol=params['rtol'],
+            atol=params['atol'],
+            jit=params['jit'],
+            aftershocks=params['aftershocks'],
+            steady_tol=params['steady_tol'],
+            carbonate=params['carbonate'],
+        )
+
+    logging.info(f"Impact energy: {sim.energy_GT:.2f} GT TNT")
+    logging.info(f"Crater diameter: {sim.crater_km:.1f} km")
+    logging.info(f"Dust mass: {sim.dust_mass_kg:.2e} kg")
+    logging.info(f"Initial optical depth: {sim.initial_tau:.3f}")
+
+    # Metadata
+    meta = {
+        'diameter_km': sim.diameter,
+        'density_kgm3': sim.density,
+        'velocity_ms': sim.velocity,
+        'angle_deg': sim.angle,
+        'target': sim.target_type,
+        'energy_GT': sim.energy_GT,
+        'crater_km': sim.crater_km,
+        'dust_mass_kg': sim.dust_mass_kg,
+        'initial_tau': sim.initial_tau,
+        'seed': sim.seed,
+        'aftershocks': sim.aftershocks,
+        'carbonate': sim.carbonate,
+    }
+    if output_times is not None:
+        meta['output_times'] = output_times
+    if sim.steady_tol is not None:
+        meta['steady_tol'] = sim.steady_tol
+    if record_changes is not None:
+        meta['record_changes'] = dict(zip(STATE_COLUMNS[1:], record_tolerances(record_changes)[1:]))
+        meta['keep_recent'] = keep_recent
+    if resume is not None:
+        meta['resumed_from'] = {'snapshot': str(resume), 'year': sim.time}
+
+    base = out_dir / output
+    checkpoint = None
+    if checkpoint_every is not None:
+        checkpoint = out_dir / f"{output}_checkpoint.json"
+    instrumented = profiler.instrument() if profiler is not None else contextlib.nullcontext()
+    steps = 0
+    if sim.integrator in ('euler', 'multirate'):
+        # Fixed grid: the loop takes every forcing step left (a stream's forcing is not stored)
+        steps = (sum(len(t) for t, *_ in forcing_blocks(sim.start_year, sim.end_year, sim.dt_initial,
+                                                         sim.dt_final, FINE_DUST_FALLOUT_RATE,
+                                                         COARSE_DUST_FALLOUT_RATE,
+                                                         position=sim.forcing_position()))
+                 if stream else len(sim.forcing_schedule()))
+    stats_before = dict(sim.solver_stats)
+    key = sim.cache_key(times, record_changes, keep_recent) if cache is not None and not stream else None
+    cache_hit = key is not None and cache.path(key).exists()
+    output_bytes = {}
+    if stream:
+        target = '-' if output == '-' else base.with_suffix('.' + fmt)
+        writer_cls = CsvStreamWriter if fmt == 'csv' else NdjsonStreamWriter
+        row = None
+        with instrumented, timer.section('run'), writer_cls(target) as writer:
+            for row in sim.run_iter(checkpoint, checkpoint_every, times, record_changes):
+                writer.write(row)
+        if row is None:
+            raise ValueError(f"No steps left before year {sim.end_year:g}; extend the run with --extend-to")
+        final = dict(zip(writer.columns, writer._rounded(row)))
+        if target != '-':
+            output_bytes[fmt] = target.stat().st_size
+    else:
+        with instrumented, timer.section('run'):
+            results = sim.run(checkpoint, checkpoint_every, cache, times, record_changes, keep_recent,
+                              replay)
+        if not len(results):
+            raise ValueError(f"No steps left before year {sim.end_year:g}; extend the run with --extend-to")
+        if fmt in ('csv', 'all'):
+            with timer.section('write_csv'):
+                write_csv(results, base.with_suffix('.csv'))
+        if fmt in ('html', 'all'):
+            # Requested or change-driven rows are all shown
+            full = times is None and record_changes is None
+            with timer.section('write_html'):
+                write_html(results, base.with_suffix('.html'), 100 if full else 1)
+        if fmt in ('json', 'all'):
+            with timer.section('write_json'):
+                write_json(results, base.with_suffix('.json'))
+        if fmt == 'ndjson':
+            with timer.section('write_ndjson'):
+                write_ndjson(results, base.with_suffix('.ndjson'))
+        if fmt == 'npy':
+            with timer.section('write_npy'):
+                write_npy(results, base.with_suffix('.npy'), meta)
+        final = results.row(-1, rounded=True)
+        for name in timer.sections:
+            if name.startswith('write_'):
+                output_bytes[name[6:]] = base.with_suffix('.' + name[6:]).stat().st_size
+
+    meta['telemetry'] = run_telemetry(sim, timer, steps, stats_before, output_bytes, cache_hit)
+    if output != '-':
+        with open(out_dir / f"{output}_metadata.json", 'w') as f:
+            json.dump(meta, f, indent=2)
+    if profiler is not None:
+        report = profiler.report()
+        report.update(model=type(sim).__name__, integrator=sim.integrator, jit=sim.jit,
+                      start_year=params['start_year'], end_year=sim.end_year)
+        if output != '-':
+            with open(out_dir / f"{output}_profile.json", 'w') as f:
+                json.dump(report, f, indent=2)
+        print(profiler.table(report), file=sys.stderr)
+
+    return {
+        'params': params,
+        'path': str(out_dir),
+        'metadata': meta,
+        'final': final,
+    }
+
+def parse_sweep_values(text: str, kind: type) -> List:
+    """
+    Parse one --sweep value spec: a comma list ("5,10,12") or, for numeric
+    parameters, an inclusive range "start:stop[:step]" (step defaults to 1).
+    """
+    if ':' in text and kind is not str:
+        parts = [float(p) for p in text.split(':')]
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Range must be start:stop[:step], got {text!r}")
+        start, stop = parts[0], parts[1]
+        step = parts[2] if len(parts) == 3 else 1.0
+        if step <= 0:
+            raise ValueError(f"Range step must be positive, got {text!r}")
+        n = int(math.floor((stop - start) / step + 1e-9)) + 1
+        values = [start + k * step for k in range(max(n, 0))]
+    else:
+        values = [v.strip() for v in text.split(',') if v.strip()]
+    return [kind(round(v)) if kind is int and isinstance(v, float) else kind(v) for v in values]
+
+def expand_sweep(base: Dict, specs: List[str]) -> List[Dict]:
+    """Cartesian product of the --sweep specs ("name=values") over base params."""
+    axes = {}
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        name = name.strip().replace('-', '_')
+        if not sep or name not in SWEEP_PARAMS:
+            raise ValueError(f"Bad --sweep {spec!r}; expected one of "
+                             f"{', '.join(SWEEP_PARAMS)} as name=values")
+        axes[name] = parse_sweep_values(values, SWEEP_PARAMS[name])
+        if name == 'target' and set(axes[name]) - {'continental', 'oceanic'}:
+            raise ValueError(f"Bad target value(s) in --sweep {spec!r}")
+        if name == 'integrator' and set(axes[name]) - set(INTEGRATORS):
+            raise ValueError(f"Bad integrator value(s) in --sweep {spec!r}")
+        if name == 'aftershocks' and set(axes[name]) - set(AFTERSHOCK_SAMPLERS):
+            raise ValueError(f"Bad aftershocks value(s) in --sweep {spec!r}")
+        if name == 'carbonate' and set(axes[name]) - set(CARBONATE_MODELS):
+            raise ValueError(f"Bad carbonate value(s) in --sweep {spec!r}")
+    scenarios = []
+    for combo in itertools.product(*axes.values()):
+        params = dict(base)
+        params.update(zip(axes, combo))
+        scenarios.append(params)
+    return scenarios
 
 
 # ----------------------------------------------------------------------
-# Main CLI (unchanged)
+# Main CLI
 # ----------------------------------------------------------------------
-def main():
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None):
+    """The command line; argv and prog default to sys.argv (see python -m earth_sims)."""
     parser = argparse.ArgumentParser(
+        prog=prog,
         description="Enhanced simulation of a giant asteroid impact and its long‑term consequences.",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog=__doc__
@@ -437,69 +2598,204 @@ def main():
                         help='Initial time step (years)')
     parser.add_argument('--dt-final', type=float, default=10.0,
                         help='Final time step (years)')
+    parser.add_argument('--dt-slow', type=float, default=MULTIRATE_DT_SLOW,
+                        help='Longest macro step of CO₂, DIC, biodiversity and the magnetosphere '
+                             'for --integrator multirate (years)')
+    parser.add_argument('--integrator', choices=INTEGRATORS, default='euler',
+                        help='euler: fixed-schedule forward Euler (default); adaptive: the '
+                             'same step under step-doubling error control; ivp: implicit '
+                             'solve_ivp integration; multirate: fast processes sub-cycled at '
+                             '--dt-final inside macro steps of up to --dt-slow. adaptive and '
+                             'ivp honour --rtol/--atol')
+    parser.add_argument('--ivp-method', choices=IVP_METHODS, default='BDF',
+                        help='solve_ivp method for --integrator ivp')
+    parser.add_argument('--rtol', type=float, default=1e-6,
+                        help='Relative tolerance for --integrator adaptive/ivp')
+    parser.add_argument('--atol', type=float, default=1e-8,
+                        help='Absolute tolerance for --integrator adaptive/ivp, scaled per variable')
+    parser.add_argument('--aftershocks', choices=AFTERSHOCK_SAMPLERS, default='step',
+                        help='step: one Bernoulli draw per time step (default, reproduces earlier '
+                             'seeded runs); poisson: exact Omori event times at any dt')
+    parser.add_argument('--carbonate', choices=CARBONATE_MODELS, default='ratio',
+                        help='ratio: pH from the DIC/ALK ratio, clamped (default); equilibrium: '
+                             'Newton solve of the carbonate system with exact DIC growth, stable '
+                             'at large steps; table: the same, interpolated from a lookup table')
+    parser.add_argument('--jit', action='store_true',
+                        help='Run the Euler loop as one Numba-compiled kernel (falls back to '
+                             'Python when Numba is not installed)')
+    parser.add_argument('--steady-state', type=float, nargs='?', const=STEADY_TOL, default=None,
+                        metavar='RATE', dest='steady_tol',
+                        help='Once every variable changes by less than RATE of its magnitude per '
+                             f'year (default {STEADY_TOL:g}), stop stepping and carry the '
+                             'linearized state to the output times and the end (euler, no --jit)')
+    parser.add_argument('--check-jit', action='store_true',
+                        help='Compare the compiled kernel with the Python loop for --seed '
+                             '(default seeds 0-3) and exit non-zero on a mismatch')
     parser.add_argument('--output', '-o', type=str, default='asteroid_impact_enhanced',
-                        help='Base name for output files (without extension)')
+                        help="Base name for output files (without extension); "
+                             "'-' streams to stdout with --stream")
     parser.add_argument('--output-dir', type=str, default='.',
                         help='Directory to write output files')
-    parser.add_argument('--format', choices=['csv', 'html', 'json', 'all'],
+    parser.add_argument('--format', choices=['csv', 'html', 'json', 'ndjson', 'npy', 'all'],
                         default='all', help='Output format(s)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Write rows while the run progresses, in constant memory '
+                             '(csv or ndjson only)')
+    parser.add_argument('--output-times', type=str, default=None, metavar='SPEC',
+                        help='Record only these years, interpolated between steps: a comma '
+                             'list, linspace:START:STOP:N or logspace:START:STOP:N (default: '
+                             'every step). Years outside the computed steps are skipped')
+    parser.add_argument('--record-changes', nargs='*', default=None, metavar='COLUMN=TOL',
+                        help='Record a step only when some variable has moved by more than its '
+                             'tolerance since the last recorded row (defaults: ten units of '
+                             'the last output decimal; override per column, e.g. co2_ppm=1)')
+    parser.add_argument('--keep-recent', type=int, default=0, metavar='K',
+                        help='With --record-changes, also keep the last K steps at full '
+                             'resolution (not with --stream)')
     parser.add_argument('--seed', type=int, default=None,
                         help='Random seed for reproducibility')
+    parser.add_argument('--sweep', action='append', metavar='PARAM=VALUES',
+                        help='Sweep a parameter over a comma list or an inclusive '
+                             'start:stop[:step] range (repeatable; runs the product). '
+                             f'PARAM is one of: {", ".join(SWEEP_PARAMS)}')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for --sweep (default: CPU count)')
+    parser.add_argument('--chunksize', type=int, default=1,
+                        help='Scenarios handed to a worker at a time for --sweep')
+    parser.add_argument('--checkpoint-every', type=float, default=None, metavar='YEARS',
+                        help='Save a snapshot of the run to <output>_checkpoint.json every YEARS '
+                             'of simulated time and at the end (0: only at the end)')
+    parser.add_argument('--resume', type=str, default=None, metavar='SNAPSHOT',
+                        help='Continue the run saved in SNAPSHOT (its parameters override the '
+                             'model options). Outputs hold the rows after the snapshot, as '
+                             '<output>_from_<year>')
+    parser.add_argument('--extend-to', type=float, default=None, metavar='YEAR',
+                        help='With --resume, run on to YEAR instead of the saved end year')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Neither read nor store results in the result cache (only seeded, '
+                             'non-streamed runs are cached)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Result cache directory (default: $EARTH_SIMS_CACHE or '
+                             '~/.cache/earth_sims)')
+    parser.add_argument('--cache-size', type=float, default=CACHE_MAX_BYTES / 2**20, metavar='MB',
+                        help='Evict least recently used cached results beyond this size')
+    parser.add_argument('--convert', nargs='+', metavar='PATH',
+                        help='Convert existing CSV/JSON outputs (files or directories) '
+                             'to .npy and exit')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time each sub-model of the run, get_state() and each writer; '
+                             'prints a breakdown and writes <output>_profile.json (single runs; '
+                             'bypasses the result cache; a --jit kernel is timed as a whole)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Trace allocations with tracemalloc, so the run telemetry records '
+                             'the peak traced memory (slows the run down)')
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='Increase logging verbosity')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     logging.basicConfig(
         level=logging.DEBUG if args.verbose else logging.INFO,
         format='%(levelname)s: %(message)s'
     )
-
-    out_dir = Path(args.output_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    sim = AsteroidImpactEnhanced(
-        diameter=args.diameter,
-        density=args.density,
-        velocity=args.velocity,
-        angle=args.angle,
-        target_type=args.target,
-        start_year=args.years[0],
-        end_year=args.years[1],
-        dt_initial=args.dt_initial,
-        dt_final=args.dt_final,
-        seed=args.seed
-    )
-
-    logging.info(f"Impact energy: {sim.energy_GT:.2f} GT TNT")
-    logging.info(f"Crater diameter: {sim.crater_km:.1f} km")
-    logging.info(f"Dust mass: {sim.dust_mass_kg:.2e} kg")
-    logging.info(f"Initial optical depth: {sim.initial_tau:.3f}")
-
-    results = sim.run()
-
-    base = out_dir / args.output
-    if args.format in ('csv', 'all'):
-        write_csv(results, base.with_suffix('.csv'))
-    if args.format in ('html', 'all'):
-        write_html(results, base.with_suffix('.html'))
-    if args.format in ('json', 'all'):
-        write_json(results, base.with_suffix('.json'))
-
-    # Metadata
-    meta = {
-        'diameter_km': args.diameter,
-        'density_kgm3': args.density,
-        'velocity_ms': args.velocity,
-        'angle_deg': args.angle,
+    if args.trace_memory:
+        tracemalloc.start()
+    if args.convert:
+        for path in args.convert:
+            for written in convert_to_npy(Path(path)):
+                logging.info(f"Converted to {written}")
+        return
+    if args.stream and args.format not in ('csv', 'ndjson'):
+        parser.error("--stream needs --format csv or --format ndjson")
+    if args.output == '-' and not (args.stream and not args.sweep):
+        parser.error("--output - is only supported for a single --stream run")
+    if args.checkpoint_every is not None and (args.checkpoint_every < 0 or args.output == '-'):
+        parser.error("--checkpoint-every needs a non-negative interval and a named --output")
+    if args.checkpoint_every is not None and args.integrator == 'ivp' and not args.resume:
+        parser.error("--integrator ivp runs cannot be checkpointed")
+    if args.extend_to is not None and not args.resume:
+        parser.error("--extend-to needs --resume")
+    if args.resume and args.sweep:
+        parser.error("--resume continues a single run; it cannot be combined with --sweep")
+    if args.output_times is not None:
+        try:
+            parse_output_times(args.output_times)
+        except ValueError as e:
+            parser.error(f"--output-times: {e}")
+    record_changes = None
+    if args.record_changes is not None:
+        if args.output_times is not None:
+            parser.error("--record-changes and --output-times are alternatives")
+        try:
+            record_changes = parse_record_tolerances(args.record_changes)
+        except ValueError as e:
+            parser.error(f"--record-changes: {e}")
+    if args.keep_recent and (record_changes is None or args.keep_recent < 0 or args.stream):
+        parser.error("--keep-recent needs --record-changes, a positive count and no --stream")
+    if args.steady_tol is not None and (args.integrator != 'euler' or args.jit
+                                        or not args.steady_tol > 0):
+        parser.error("--steady-state needs a positive rate, --integrator euler and no --jit")
+    if args.jit and args.carbonate != 'ratio':
+        parser.error("--jit compiles the ratio carbonate model only")
+    if args.profile and (args.sweep or args.check_jit):
+        parser.error("--profile times a single run; it cannot be combined with --sweep or --check-jit")
+
+    params = {
+        'diameter': args.diameter,
+        'density': args.density,
+        'velocity': args.velocity,
+        'angle': args.angle,
         'target': args.target,
-        'energy_GT': sim.energy_GT,
-        'crater_km': sim.crater_km,
-        'dust_mass_kg': sim.dust_mass_kg,
-        'initial_tau': sim.initial_tau,
+        'start_year': args.years[0],
+        'end_year': args.years[1],
+        'dt_initial': args.dt_initial,
+        'dt_final': args.dt_final,
+        'dt_slow': args.dt_slow,
         'seed': args.seed,
+        'integrator': args.integrator,
+        'ivp_method': args.ivp_method,
+        'rtol': args.rtol,
+        'atol': args.atol,
+        'jit': args.jit,
+        'aftershocks': args.aftershocks,
+        'steady_tol': args.steady_tol,
+        'carbonate': args.carbonate,
     }
-    with open(out_dir / f"{args.output}_metadata.json", 'w') as f:
-        json.dump(meta, f, indent=2)
+
+    # A profiled run is computed, never loaded
+    cache = (None if args.no_cache or args.profile
+             else ResultCache(args.cache_dir, int(args.cache_size * 2**20)))
+
+    if args.check_jit:
+        seeds = [args.seed] if args.seed is not None else [0, 1, 2, 3]
+        ok = check_jit_parity(seeds, diameter=args.diameter, density=args.density,
+                              velocity=args.velocity, angle=args.angle, target_type=args.target,
+                              start_year=args.years[0], end_year=args.years[1],
+                              dt_initial=args.dt_initial, dt_final=args.dt_final,
+                              aftershocks=args.aftershocks)
+        sys.exit(0 if ok else 1)
+
+    if args.sweep:
+        try:
+            scenarios = expand_sweep(params, args.sweep)
+        except ValueError as e:
+            parser.error(str(e))
+        logging.info(f"Sweeping {len(scenarios)} scenarios")
+        earth_sims.sweep.run_sweep(
+            run_scenario, scenarios, Path(args.output_dir) / f"{args.output}_sweep", args.output,
+            args.format, workers=args.workers, chunksize=args.chunksize,
+            trace_memory=args.trace_memory, stream=args.stream,
+            checkpoint_every=args.checkpoint_every, cache=cache, output_times=args.output_times,
+            record_changes=record_changes, keep_recent=args.keep_recent, replay=True)
+    else:
+        try:
+            run_scenario(params, Path(args.output_dir), args.output, args.format, args.stream,
+                         args.checkpoint_every, args.resume, args.extend_to, cache,
+                         args.output_times, record_changes, args.keep_recent,
+                         Profiler() if args.profile else None)
+        except ValueError as e:
+            if not args.resume:
+                raise
+            parser.error(str(e))
 
     logging.info("Done.")
 
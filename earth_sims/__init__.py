@@ -0,0 +1,52 @@
+"""
+earth_sims – shared entry point and tooling for the Earth catastrophe simulators.
+
+The simulators stay single-file scripts in their own directories
+(earth_asteroid/earth_asteroid_enhanced.py and
+earth_supervolcano/earth_supervolcano_enhanced.py); load_model() imports one
+by model name, as earth_sims.asteroid or earth_sims.supervolcano, for the
+tools here.  The code both simulators share lives in this package too
+(carbonate, ivp, recording, trajectory, writers, cache, sweep, profiling,
+telemetry).  Importing a simulator loads NumPy only; SciPy and Numba are
+imported by the code paths that use them.
+
+  python -m earth_sims asteroid ...      the asteroid simulator's command line
+  python -m earth_sims supervolcano ...  the supervolcano simulator's command line
+  python -m earth_sims bench             benchmark suite (earth_sims.bench)
+  python -m earth_sims serve             local simulation server (earth_sims.serve)
+  python -m earth_sims jobs              job manager with live progress (earth_sims.jobs)
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Model name -> simulator script, relative to the repository root
+MODELS = {
+    'asteroid': 'earth_asteroid/earth_asteroid_enhanced.py',
+    'supervolcano': 'earth_supervolcano/earth_supervolcano_enhanced.py',
+}
+
+
+def load_model(name: str):
+    """
+    The simulator module of model `name`, imported once and registered as
+    earth_sims.<name> (so Numba's cache and forked workers find it, and
+    the root earth_supervolcano_enhanced.py shim can re-export it).
+    """
+    path = ROOT / MODELS[name]
+    qualname = f'{__name__}.{name}'
+    module = sys.modules.get(qualname)
+    if module is not None:
+        return module
+    spec = importlib.util.spec_from_file_location(qualname, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[qualname] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[qualname]
+        raise
+    return module
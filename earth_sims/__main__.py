@@ -0,0 +1,58 @@
+"""
+python -m earth_sims <command> [options]
+
+  asteroid        asteroid impact simulator (earth_asteroid/earth_asteroid_enhanced.py)
+  supervolcano    supervolcano simulator (earth_supervolcano/earth_supervolcano_enhanced.py)
+  bench           benchmark both simulators (see earth_sims.bench)
+  serve           local simulation server with a warm worker pool (see earth_sims.serve)
+  jobs            run long scenarios as jobs with live progress (see earth_sims.jobs)
+
+The options after the command are that command's own; only the command
+that runs is imported.
+"""
+
+import argparse
+import sys
+
+from earth_sims import MODELS, load_model
+
+COMMANDS = {
+    'asteroid': 'Asteroid impact simulator',
+    'supervolcano': 'Supervolcano eruption simulator',
+    'bench': 'Benchmark both simulators',
+    'serve': 'Serve scenarios from a warm worker pool over HTTP or a Unix socket',
+    'jobs': 'Run scenarios as jobs with progress, cancellation and retries',
+}
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = argparse.ArgumentParser(prog='python -m earth_sims',
+                                     description='Earth catastrophe simulators',
+                                     epilog="'python -m earth_sims <command> --help' lists "
+                                            "the options of a command")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+    for name, text in COMMANDS.items():
+        commands.add_parser(name, help=text, add_help=False)
+    if not argv or argv[0] not in COMMANDS:
+        parser.parse_args(argv)         # --help, or the error for a missing/unknown command
+        return 2
+
+    command, options = argv[0], argv[1:]
+    prog = f'{parser.prog} {command}'
+    if command == 'bench':
+        from earth_sims import bench
+        return bench.main(options, prog)
+    if command == 'serve':
+        from earth_sims import serve
+        return serve.main(options, prog)
+    if command == 'jobs':
+        from earth_sims import jobs
+        return jobs.main(options, prog)
+    assert command in MODELS
+    load_model(command).main(options, prog)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Benchmark suite for the asteroid and supervolcano simulators.
+
+  python -m earth_sims bench                         # full suite -> bench.json
+  python -m earth_sims bench --quick                 # short horizons, small ensembles
+  python -m earth_sims bench --save-baseline bench_baseline.json
+  python -m earth_sims bench --baseline bench_baseline.json --threshold 0.15
+  python -m earth_sims bench --quick --profile      # plus per-sub-model breakdowns
+
+Three kinds of case, for each model:
+- run: <Model>Enhanced(end_year=H).run() for each horizon H (steps/s, rows/s),
+- ensemble: <Model>Ensemble.run() with N members of distinct physics, so the
+  vectorized step is timed rather than the seed replay (member steps/s),
+- write: each writer (write_csv, write_html, ...) on the results of one run
+  (rows/s and bytes written).
+Each case runs in a forked process of its own (where fork exists), so its
+peak RSS is not that of earlier cases, and the best of --repeat timings is
+kept.  Results are saved as JSON; against a baseline, a case whose best time
+grew by more than --threshold is a regression (see compare()) and the exit
+status is 1.
+"""
+
+import argparse
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from earth_sims import MODELS, load_model
+
+try:
+    import resource
+except ImportError:              # not on Windows
+    resource = None
+
+# Layout version of the results JSON
+BENCH_FORMAT_VERSION = 1
+
+# Per model: simulator and ensemble classes, and the ensemble parameter
+# spread over its members (range of values)
+BENCH_MODELS = {
+    'asteroid': ('AsteroidImpactEnhanced', 'AsteroidImpactEnsemble', 'diameter', (5.0, 15.0)),
+    'supervolcano': ('SupervolcanoEnhanced', 'SupervolcanoEnsemble', 'volume', (500.0, 5000.0)),
+}
+
+# Writer timed for each output format, and its file suffix
+WRITERS = {
+    'csv': ('write_csv', '.csv'),
+    'html': ('write_html', '.html'),
+    'json': ('write_json', '.json'),
+    'ndjson': ('write_ndjson', '.ndjson'),
+    'npy': ('write_npy', '.npy'),
+}
+
+DEFAULT_HORIZONS = (1e3, 1e4, 1e5, 1e6)
+DEFAULT_MEMBERS = (1, 16, 256)
+DEFAULT_ENSEMBLE_YEARS = 1e4
+DEFAULT_WRITE_YEARS = 1e5
+DEFAULT_THRESHOLD = 0.10          # fractional slowdown that counts as a regression
+QUICK = dict(horizons=(1e3, 1e4), members=(1, 16), repeat=1)
+
+
+# ----------------------------------------------------------------------
+# Cases – each returns its measurements; run in a process of its own
+# ----------------------------------------------------------------------
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process (MB), None where unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10   # bytes vs KiB
+
+def _best_of(repeat: int, function):
+    """Best wall time of `repeat` calls of function(), and its last result."""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def _steps(sim, results) -> int:
+    """Steps the run took: the solver's count where it keeps one, else the grid's."""
+    stats = sim.solver_stats
+    if 'accepted' in stats or 'steps' in stats:
+        return stats.get('accepted', stats.get('steps'))
+    if sim.integrator == 'multirate':
+        return len(sim.forcing_schedule())
+    return len(results) - 2
+
+def time_run(model: str, years: float, repeat: int, options: Dict, profile: bool = False) -> Dict:
+    module = load_model(model)
+    simulation = getattr(module, BENCH_MODELS[model][0])
+
+    def run():
+        sim = simulation(end_year=years, seed=0, **options)
+        return sim, sim.run()
+
+    seconds, (sim, results) = _best_of(repeat, run)
+    case = {'seconds': seconds, 'steps': _steps(sim, results), 'rows': len(results),
+            'peak_rss_mb': _peak_rss_mb()}
+    if profile:
+        # One more, untimed, run with the sub-models instrumented (see --profile)
+        profiler = module.Profiler()
+        with profiler.instrument(simulation), profiler.section('run'):
+            run()
+        case['profile'] = profiler.report()['sections']
+    return case
+
+def time_ensemble(model: str, members: int, years: float, repeat: int) -> Dict:
+    module = load_model(model)
+    _, ensemble, parameter, (low, high) = BENCH_MODELS[model]
+    values = [low + (high - low) * i / max(1, members - 1) for i in range(members)]
+
+    def run():
+        return getattr(module, ensemble)(**{parameter: values}, seed=list(range(members)),
+                                         end_year=years).run()
+
+    seconds, out = _best_of(repeat, run)
+    rows = len(out['year'])
+    return {'seconds': seconds, 'steps': (rows - 2) * members, 'rows': rows * members,
+            'peak_rss_mb': _peak_rss_mb()}
+
+def time_writer(model: str, fmt: str, years: float, repeat: int) -> Dict:
+    module = load_model(model)
+    results = getattr(module, BENCH_MODELS[model][0])(end_year=years, seed=0).run()
+    writer, suffix = WRITERS[fmt]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f'bench{suffix}'
+        seconds, _ = _best_of(repeat, lambda: getattr(module, writer)(results, path))
+        written = sum(f.stat().st_size for f in Path(tmp).iterdir())
+    return {'seconds': seconds, 'rows': len(results), 'bytes': written,
+            'peak_rss_mb': _peak_rss_mb()}
+
+def _isolated(function, *args) -> Dict:
+    """function(*args) in a forked process of its own, or here without fork."""
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return function(*args)
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('fork')) as pool:
+        return pool.submit(function, *args).result()
+
+
+# ----------------------------------------------------------------------
+# Suite, baseline comparison and report
+# ----------------------------------------------------------------------
+def plan(models, horizons, members, formats, ensemble_years: float, write_years: float,
+         repeat: int, options: Dict, profile: bool = False) -> List[tuple]:
+    """(case name, function, args) of every case, in the order they run."""
+    cases = []
+    for model in models:
+        for years in horizons:
+            cases.append((f'{model}/run/{years:g}', time_run,
+                          (model, years, repeat, options, profile)))
+        for n in members:
+            cases.append((f'{model}/ensemble/{n}', time_ensemble, (model, n, ensemble_years, repeat)))
+        for fmt in formats:
+            cases.append((f'{model}/write/{fmt}', time_writer, (model, fmt, write_years, repeat)))
+    return cases
+
+def run_suite(cases: List[tuple], isolate: bool = True) -> Dict:
+    """Run every case; the results document saved as JSON."""
+    import numpy as np
+    results = {}
+    for name, function, args in cases:
+        with warnings.catch_warnings():
+            # Long default-dt Euler runs overflow; that is the model, not the benchmark
+            warnings.simplefilter('ignore', RuntimeWarning)
+            case = _isolated(function, *args) if isolate else function(*args)
+        seconds = case['seconds']
+        if 'steps' in case:
+            case['steps_per_s'] = case['steps'] / seconds if seconds > 0 else math.inf
+        case['rows_per_s'] = case['rows'] / seconds if seconds > 0 else math.inf
+        results[name] = case
+        print(f'  {name:<32} {seconds:9.4f} s', file=sys.stderr, flush=True)
+    return {
+        'format_version': BENCH_FORMAT_VERSION,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'host': {'python': platform.python_version(), 'numpy': np.__version__,
+                 'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'cases': results,
+    }
+
+def compare(results: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD
+            ) -> Tuple[Dict[str, float], List[str]]:
+    """
+    Relative change in best time of every case in both, by name (+0.2 is
+    20 % slower), and the sorted names of the regressions: the cases slower
+    by more than threshold.
+    """
+    if baseline.get('format_version') != BENCH_FORMAT_VERSION:
+        raise ValueError(f"Unsupported baseline format_version {baseline.get('format_version')!r}")
+    old = baseline['cases']
+    changes = {name: case['seconds'] / old[name]['seconds'] - 1.0
+               for name, case in results['cases'].items()
+               if name in old and old[name]['seconds'] > 0}
+    return changes, sorted(name for name, change in changes.items() if change > threshold)
+
+def report(results: Dict, changes: Optional[Dict[str, float]] = None,
+           regressions: List[str] = ()) -> str:
+    """
+    The results as a fixed-width table, with the change against the
+    baseline if any and the regressions (see compare()) marked.
+    """
+    def number(value, spec):
+        width = spec.split('.')[0].rstrip('dg')
+        return format(value, spec) if value is not None else format('-', '>' + width)
+
+    lines = [f"{'case':<32} {'seconds':>9} {'steps/s':>11} {'rows/s':>11} {'bytes':>11} "
+             f"{'peak MB':>8}" + (f" {'vs base':>9}" if changes is not None else '')]
+    for name, case in results['cases'].items():
+        line = (f"{name:<32} {case['seconds']:9.4f} {number(case.get('steps_per_s'), '11.4g')} "
+                f"{case['rows_per_s']:11.4g} {number(case.get('bytes'), '11d')} "
+                f"{number(case['peak_rss_mb'], '8.1f')}")
+        if changes is not None:
+            change = changes.get(name)
+            if change is None:
+                line += f" {'new':>9}"
+            else:
+                line += f" {100 * change:+8.1f}%" + ('  REGRESSION' if name in regressions else '')
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+# ----------------------------------------------------------------------
+# Command line (python -m earth_sims bench)
+# ----------------------------------------------------------------------
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS),
+                        help='Models to benchmark (default both)')
+    parser.add_argument('--horizons', nargs='+', type=float, default=None,
+                        help='Run horizons in years (default 1e3 1e4 1e5 1e6)')
+    parser.add_argument('--members', nargs='+', type=int, default=None,
+                        help='Ensemble sizes (default 1 16 256)')
+    parser.add_argument('--formats', nargs='*', choices=list(WRITERS), default=list(WRITERS),
+                        help='Writers to time (default all)')
+    parser.add_argument('--ensemble-years', type=float, default=DEFAULT_ENSEMBLE_YEARS,
+                        help='Horizon of the ensemble cases (years)')
+    parser.add_argument('--write-years', type=float, default=DEFAULT_WRITE_YEARS,
+                        help='Horizon of the run whose results the writers write (years)')
+    parser.add_argument('--repeat', type=int, default=None,
+                        help='Timings per case; the best is kept (default 3)')
+    parser.add_argument('--integrator', default='euler',
+                        help='Integrator of the run cases (default euler)')
+    parser.add_argument('--profile', action='store_true',
+                        help="Add each run case's per-sub-model breakdown (the simulators' "
+                             '--profile report) to the results, from one extra run')
+    parser.add_argument('--quick', action='store_true',
+                        help='Horizons 1e3 and 1e4, ensembles of 1 and 16, one timing each')
+    parser.add_argument('--no-isolate', dest='isolate', action='store_false',
+                        help='Run every case in this process (peak RSS is then cumulative)')
+    parser.add_argument('--output', '-o', type=str, default='bench.json',
+                        help='Results JSON (default bench.json)')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Slowdown against --baseline that fails the run (default 0.10 = 10 %%)')
+    parser.add_argument('--save-baseline', type=str, default=None, metavar='PATH',
+                        help='Also write the results to PATH as the new baseline')
+
+def run(args: argparse.Namespace) -> int:
+    quick = QUICK if args.quick else {}
+    horizons = args.horizons if args.horizons is not None else quick.get('horizons', DEFAULT_HORIZONS)
+    members = args.members if args.members is not None else quick.get('members', DEFAULT_MEMBERS)
+    repeat = args.repeat if args.repeat is not None else quick.get('repeat', 3)
+    if repeat < 1 or min(members) < 1 or min(horizons) <= 0 or not args.threshold >= 0:
+        raise ValueError("--repeat and --members need positive counts, --horizons positive "
+                         "years and --threshold a non-negative fraction")
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    cases = plan(args.models, horizons, members, args.formats, args.ensemble_years,
+                 args.write_years, repeat, {'integrator': args.integrator}, args.profile)
+    print(f"Running {len(cases)} benchmark cases", file=sys.stderr)
+    results = run_suite(cases, args.isolate)
+    changes, regressions = compare(results, baseline, args.threshold) if baseline is not None else (None, [])
+    if changes is not None:
+        results['baseline'] = {'path': args.baseline, 'threshold': args.threshold, 'changes': changes,
+                               'regressions': regressions}
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+    print(report(results, changes, regressions))
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than the baseline by more than "
+              f"{100 * args.threshold:g} %: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+def main(argv=None, prog: str = 'python -m earth_sims bench') -> int:
+    parser = argparse.ArgumentParser(prog=prog, description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        return run(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Result cache shared by the simulators: finished seeded runs stored as .npy
+trajectories under a content address.
+
+The address is a hash of the model name, the run's constructor arguments,
+the model's numeric module-level constants and a fingerprint of the source
+of the model script and of this package, so any edit to the model or to
+the shared code invalidates cached results.  The simulator's final
+snapshot rides along in the metadata, so a cache hit leaves the simulator
+exactly as a real run would.  Constants named CACHE_* configure the cache
+itself and are not part of the key.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from earth_sims.recording import SimulationResults
+from earth_sims.trajectory import Trajectory, _save_npy
+
+CACHE_FORMAT_VERSION = 1
+CACHE_MAX_BYTES = 1 << 30                   # default size bound (1 GiB)
+
+
+def default_cache_dir() -> Path:
+    """$EARTH_SIMS_CACHE, else ~/.cache/earth_sims (or under $XDG_CACHE_HOME)."""
+    if os.environ.get('EARTH_SIMS_CACHE'):
+        return Path(os.environ['EARTH_SIMS_CACHE'])
+    return Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'earth_sims'
+
+
+def source_fingerprint(script) -> str:
+    """Hash of the source of a model script and of every module of this package."""
+    digest = hashlib.sha256(Path(script).read_bytes())
+    for path in sorted(Path(__file__).parent.glob('*.py')):
+        digest.update(path.name.encode('utf-8'))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def module_constants(namespace: Dict) -> Dict[str, float]:
+    """The numeric constants (upper-case names, CACHE_* aside) of a module's namespace."""
+    constants = {}
+    for name, value in namespace.items():
+        if not name.isupper() or name.startswith('CACHE_'):
+            continue
+        if isinstance(value, np.ndarray):
+            constants[name] = value.tolist()
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            constants[name] = value
+    return constants
+
+
+def result_cache_key(model: str, arguments: Dict, fingerprint: str, constants: Dict) -> str:
+    """Content address of one run: model, its arguments, constants and source fingerprint."""
+    payload = {
+        'format_version': CACHE_FORMAT_VERSION,
+        'model': model,
+        'fingerprint': fingerprint,
+        'constants': constants,
+        'arguments': arguments,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk store of finished trajectories, sharded like earth_sims.sweep.scenario_dir():
+    directory/ab/abcdef....npy.  Hits refresh the entry's mtime, and
+    evict() drops the least recently used entries once the store exceeds
+    max_bytes.  Entries are written atomically, so concurrent sweep
+    workers can share one cache.  Hits are loaded through trajectory_class
+    (the model's Trajectory, for its SimulationResults).
+    """
+
+    trajectory_class = Trajectory
+
+    def __init__(self, directory=None, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = Path(directory) if directory is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None    # running estimate of the store's size
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.npy"
+
+    def get(self, key: str) -> Optional[Tuple[SimulationResults, Dict]]:
+        """(results, final snapshot) for key, or None on a miss."""
+        path = self.path(key)
+        try:
+            trajectory = self.trajectory_class(path)
+            results = trajectory.results()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        logging.info(f"Cached result {key[:12]} from {path}")
+        return results, trajectory.metadata['snapshot']
+
+    def put(self, key: str, results: SimulationResults, snapshot: Dict) -> Path:
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(partial, 'wb') as f:
+            _save_npy(results, f, {'key': key, 'snapshot': snapshot})
+        partial.replace(path)
+        logging.debug(f"Result {key[:12]} cached in {path}")
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self._entries())
+        else:
+            self._size += path.stat().st_size
+        if self._size > self.max_bytes:
+            self.evict()
+        return path
+
+    def _entries(self) -> List[Path]:
+        return list(self.directory.glob('??/*.npy'))
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the store fits max_bytes; returns how many."""
+        entries = []
+        for p in self._entries():
+            try:
+                stat = p.stat()
+            except OSError:                 # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, p))
+        entries.sort()
+        size = sum(e[1] for e in entries)
+        removed = 0
+        for _, nbytes, p in entries:
+            if size <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            try:
+                p.parent.rmdir()            # only succeeds once the shard is empty
+            except OSError:
+                pass
+            size -= nbytes
+            removed += 1
+        self._size = size
+        if removed:
+            logging.info(f"Evicted {removed} cached result(s) from {self.directory}")
+        return removed
@@ -0,0 +1,149 @@
+"""
+Seawater carbonate system shared by the simulators (--carbonate
+equilibrium/table): pH from dissolved inorganic carbon (DIC) and total
+alkalinity (ALK) by a Newton iteration on the carbonate, borate and water
+alkalinity balance, and a precomputed pH table (CarbonateTable) that
+replaces the iteration by a bilinear lookup.  Scalars and NumPy arrays
+(ensembles) are both accepted.
+"""
+
+import functools
+import math
+
+import numpy as np
+
+# Stoichiometric constants of seawater at 25 °C and S = 35 (Lueker et al.
+# 2000; borate after Dickson 1990), total boron, and the Newton tolerance
+# on pH.  'ratio' is each model's original DIC/ALK approximation
+CARBONATE_MODELS = ('ratio', 'equilibrium', 'table')
+CARBONATE_K1 = 10.0 ** -5.847
+CARBONATE_K2 = 10.0 ** -8.966
+CARBONATE_KB = 10.0 ** -8.597
+CARBONATE_KW = 10.0 ** -13.217
+BORON_TOTAL = 4.16e-4                   # mol/kg
+CARBONATE_PH_TOL = 1e-10
+CARBONATE_MAX_ITER = 100
+# Lookup table (--carbonate table): log10(DIC/ALK) and log10(ALK) axes as
+# (first, last, points); bilinear interpolation is good to 5e-5 in pH
+CARBONATE_TABLE_RATIO = (-1.0, 1.0, 2001)
+CARBONATE_TABLE_ALK = (-3.5, -2.0, 151)
+# Pre-industrial surface-ocean pH, the warm start when none is given
+SURFACE_PH = 8.2
+
+
+def _carbonate_terms(h):
+    """Carbonate alkalinity per mol of DIC, and borate plus water alkalinity, at [H⁺] = h."""
+    k1h, k1k2 = CARBONATE_K1 * h, CARBONATE_K1 * CARBONATE_K2
+    return ((k1h + 2.0 * k1k2) / (h * h + k1h + k1k2),
+            BORON_TOTAL * CARBONATE_KB / (CARBONATE_KB + h) + CARBONATE_KW / h - h)
+
+
+def _carbonate_step(dic, alk, ph):
+    """Newton step in pH towards total alkalinity alk (floats or arrays)."""
+    h = 10.0 ** -ph
+    k1h, k1k2 = CARBONATE_K1 * h, CARBONATE_K1 * CARBONATE_K2
+    denom = h * h + k1h + k1k2
+    per_dic, other = _carbonate_terms(h)
+    slope = math.log(10.0) * h * (
+        dic * CARBONATE_K1 * (h * h + 4.0 * CARBONATE_K2 * h + k1k2) / (denom * denom)
+        + BORON_TOTAL * CARBONATE_KB / ((CARBONATE_KB + h) * (CARBONATE_KB + h))
+        + CARBONATE_KW / (h * h) + 1.0)
+    return (alk - dic * per_dic - other) / slope
+
+
+def carbonate_ph(dic, alk, ph=SURFACE_PH):
+    """
+    pH of seawater with DIC (mol/kg) and total alkalinity alk (eq/kg): the
+    root of the carbonate, borate and water alkalinity balance by Newton's
+    method from ph (the previous pH as a warm start, one or two steps).
+    Alkalinity rises monotonically with pH, so with steps capped at one
+    unit the iteration converges from any start.  Arrays are solved
+    elementwise, each element stopping once converged as a scalar would,
+    so ensemble members follow the scalar model to rounding.  NaN stays NaN.
+    """
+    if isinstance(dic, np.ndarray) or isinstance(alk, np.ndarray) or isinstance(ph, np.ndarray):
+        ph = np.broadcast_to(ph, np.broadcast(dic, alk, ph).shape).astype(float)
+        done = np.zeros(ph.shape, dtype=bool)
+        with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+            for _ in range(CARBONATE_MAX_ITER):
+                step = _carbonate_step(dic, alk, ph)
+                converged = ~(np.abs(step) >= CARBONATE_PH_TOL)
+                ph = np.where(done, ph, ph + np.where(converged, step, np.clip(step, -1.0, 1.0)))
+                done |= converged
+                if done.all():
+                    break
+        return ph
+    for _ in range(CARBONATE_MAX_ITER):
+        step = _carbonate_step(dic, alk, ph)
+        if not abs(step) >= CARBONATE_PH_TOL:
+            return ph + step
+        ph += max(-1.0, min(1.0, step))
+    return ph
+
+
+def carbonate_dic(alk, ph):
+    """DIC (mol/kg) in equilibrium with total alkalinity alk (eq/kg) at ph."""
+    per_dic, other = _carbonate_terms(10.0 ** -ph)
+    return (alk - other) / per_dic
+
+
+def carbonate_ion(dic, ph):
+    """Carbonate ion concentration [CO₃²⁻] (mol/kg) of DIC at ph."""
+    h = 10.0 ** -ph
+    k1k2 = CARBONATE_K1 * CARBONATE_K2
+    return dic * k1k2 / (h * h + CARBONATE_K1 * h + k1k2)
+
+
+
+class CarbonateTable:
+    """
+    carbonate_ph() solved once on a regular grid of log10(DIC/ALK) and
+    log10(ALK) (CARBONATE_TABLE_RATIO, CARBONATE_TABLE_ALK) and interpolated
+    bilinearly.  Points off the grid fall back to the Newton solve.
+    """
+
+    def __init__(self, ratio=CARBONATE_TABLE_RATIO, alk=CARBONATE_TABLE_ALK):
+        self.ratio, self.alk = ratio, alk
+        log_ratio, log_alk = np.meshgrid(np.linspace(*ratio), np.linspace(*alk), indexing='ij')
+        alk_values = 10.0 ** log_alk
+        self.values = carbonate_ph(alk_values * 10.0 ** log_ratio, alk_values)
+        self._rows = self.values.tolist()          # plain floats for the scalar lookup
+
+    def __call__(self, dic, alk, ph=SURFACE_PH):
+        """Interpolated pH; ph is only the warm start of off-grid points."""
+        (x0, x1, nx), (y0, y1, ny) = self.ratio, self.alk
+        if isinstance(dic, np.ndarray) or isinstance(alk, np.ndarray) or isinstance(ph, np.ndarray):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                x = (np.log10(dic / alk) - x0) * ((nx - 1) / (x1 - x0))
+                y = (np.log10(alk) - y0) * ((ny - 1) / (y1 - y0))
+            inside = (x >= 0) & (x <= nx - 1) & (y >= 0) & (y <= ny - 1)
+            x, y = np.where(inside, x, 0.0), np.where(inside, y, 0.0)
+            i, j = np.minimum(x.astype(int), nx - 2), np.minimum(y.astype(int), ny - 2)
+            fx, fy = x - i, y - j
+            v = self.values
+            value = ((1 - fx) * ((1 - fy) * v[i, j] + fy * v[i, j + 1])
+                     + fx * ((1 - fy) * v[i + 1, j] + fy * v[i + 1, j + 1]))
+            if not inside.all():
+                value = np.where(inside, value, carbonate_ph(dic, alk, ph))
+            return value
+        x = (math.log10(dic / alk) - x0) * ((nx - 1) / (x1 - x0))
+        y = (math.log10(alk) - y0) * ((ny - 1) / (y1 - y0))
+        if not (0 <= x <= nx - 1 and 0 <= y <= ny - 1):
+            return carbonate_ph(dic, alk, ph)
+        i, j = min(int(x), nx - 2), min(int(y), ny - 2)
+        fx, fy = x - i, y - j
+        lo, hi = self._rows[i], self._rows[i + 1]
+        return ((1 - fx) * ((1 - fy) * lo[j] + fy * lo[j + 1])
+                + fx * ((1 - fy) * hi[j] + fy * hi[j + 1]))
+
+
+@functools.lru_cache(maxsize=None)
+
+def carbonate_table() -> CarbonateTable:
+    """The default CarbonateTable, built on first use."""
+    return CarbonateTable()
+
+
+def equilibrium_ph(dic, alk, ph=SURFACE_PH, table: bool = False):
+    """carbonate_ph(), or with table its carbonate_table() interpolation."""
+    return carbonate_table()(dic, alk, ph) if table else carbonate_ph(dic, alk, ph)
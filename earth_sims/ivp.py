@@ -0,0 +1,72 @@
+"""
+Pieces of the --integrator ivp backend shared by the simulators: the
+piecewise dense output of a run split at its discontinuities, and the
+solve_ivp state events.  The ODE state is each model's IVP_STATE, which
+starts with the temperature anomaly and CO₂ (ppm).
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+
+class DenseTrajectory:
+    """
+    Piecewise dense output of an --integrator ivp run.  The run is split
+    at its discontinuities, so there is one solve_ivp OdeSolution per
+    interval; calling the trajectory with an array of times evaluates the
+    ODE state there without any step having been stored.  A time that
+    falls exactly on a break sees the state after the jump.
+    """
+
+    def __init__(self):
+        self.starts: List[float] = []
+        self.solutions = []
+        self.habitat: List[float] = []
+        self.threshold_crossings: List[float] = []
+        self.nfev = 0
+        self.njev = 0
+        self.nsteps = 0
+
+    def add(self, t0: float, sol, habitat: float):
+        self.starts.append(t0)
+        self.solutions.append(sol.sol)
+        self.n_state = sol.y.shape[0]
+        self.habitat.append(habitat)
+        self.threshold_crossings.extend(sol.t_events[0].tolist())
+        self.nfev += sol.nfev
+        self.njev += sol.njev
+        self.nsteps += len(sol.t) - 1
+
+    def __call__(self, times) -> Tuple[np.ndarray, np.ndarray]:
+        """ODE state (n_state, n_times) and subsurface habitat at times."""
+        times = np.asarray(times, dtype=float)
+        seg = np.clip(np.searchsorted(self.starts, times, side='right') - 1,
+                      0, len(self.starts) - 1)
+        y = np.empty((self.n_state, len(times)))
+        for i in np.unique(seg):
+            mask = seg == i
+            y[:, mask] = self.solutions[i](times[mask])
+        return y, np.asarray(self.habitat)[seg]
+
+    def stats(self) -> Dict[str, int]:
+        return {'nfev': self.nfev, 'njev': self.njev, 'steps': self.nsteps,
+                'segments': len(self.starts)}
+
+
+def temperature_threshold_event(threshold_c: float, baseline_c: float):
+    """
+    solve_ivp event: surface temperature, baseline_c plus the anomaly in
+    y[0], rising through threshold_c (°C).
+    """
+    def event(t, y):
+        return y[0] + baseline_c - threshold_c
+    event.direction = 1.0
+    return event
+
+
+def co2_floor_event(t, y):
+    """solve_ivp event: CO₂ falling to the 180 ppm floor (ends the segment)."""
+    return y[1] - 180.0
+co2_floor_event.direction = -1.0
+co2_floor_event.terminal = True
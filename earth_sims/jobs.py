@@ -0,0 +1,454 @@
+"""
+asyncio job manager for long simulator runs: bounded concurrency,
+backpressure on submission, live progress, cancellation and retries that
+resume from the last checkpoint.
+
+    async with JobManager(max_concurrent=4, out_dir='runs') as jobs:
+        job = await jobs.submit('asteroid', {'diameter': 10, 'end_year': 1e6, 'seed': 1})
+        async for event in jobs.events(job.id):
+            print(event['state'], event['fraction'], event['eta_seconds'])
+
+  python -m earth_sims jobs scenarios.json --max-concurrent 4 --out-dir runs
+
+Each job streams its rows to <out_dir>/<name>.<fmt> as the run goes
+(NdjsonStreamWriter or CsvStreamWriter) and saves a snapshot to
+<name>_checkpoint.json every checkpoint_every simulated years.  Workers
+report progress every progress_interval seconds: the year reached, the
+current dt, and the wall time per step since the last report.  From these
+the manager publishes the fraction of the run done (start_year to
+end_year) and an ETA: the steps left at the current dt times the time per
+step.  The fixed Euler grid widens its steps as the run goes, so the ETA
+overestimates.
+
+submit() waits while max_pending jobs are queued.  cancel() drops a
+queued job.  A running job stops at its next progress report and saves
+its state to the checkpoint.  A failed attempt is retried up to `retries`
+times, and retry() queues a failed or cancelled job again.  A retry
+continues from the checkpoint and writes the rows after it to
+<name>_from_<year>.<fmt>, like --resume.  Those rows overlap the previous
+attempt's rows after the checkpoint year.
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import math
+import multiprocessing
+import queue
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.managers import SyncManager
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from earth_sims import load_model
+
+# Simulator class of each model
+JOB_MODELS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+
+DEFAULT_MAX_PENDING = 64
+DEFAULT_CHECKPOINT_EVERY = 1000.0   # simulated years between snapshots
+DEFAULT_RETRIES = 2
+PROGRESS_INTERVAL = 0.5             # seconds between a worker's progress reports
+
+# A job is queued, running, retrying (between a failed attempt and the
+# next) or in one of its final states
+FINAL_STATES = ('done', 'failed', 'cancelled')
+
+
+# ----------------------------------------------------------------------
+# Worker side – one attempt of a job, in the executor
+# ----------------------------------------------------------------------
+def _ignore_sigint():
+    # Ctrl-C reaches the manager, which cancels the jobs so they checkpoint
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def run_job(job_id: int, model: str, params: Dict, path: str, checkpoint: Optional[str],
+            checkpoint_every: Optional[float], resume: bool, events, cancel,
+            interval: float = PROGRESS_INTERVAL) -> Dict:
+    """
+    Run (or, with resume and a checkpoint on disk, continue) one job,
+    streaming its rows to path.  Puts progress events on `events` every
+    `interval` seconds and stops early, checkpointed, once `cancel` is set.
+    Returns the attempt's outcome.
+    """
+    module = load_model(model)
+    simulation = getattr(module, JOB_MODELS[model])
+    path = Path(path)
+    if resume and checkpoint is not None and Path(checkpoint).exists():
+        sim = simulation.load_snapshot(checkpoint)
+        path = path.with_name(f"{path.stem}_from_{int(sim.time)}{path.suffix}")
+        logging.info(f"Job {job_id} resumes {checkpoint} at year {sim.time:g}")
+    else:
+        sim = simulation(**params)
+    writer_cls = module.CsvStreamWriter if path.suffix == '.csv' else module.NdjsonStreamWriter
+
+    events.put({'job': job_id, 'path': str(path), 'year': sim.time, 'end_year': sim.end_year,
+                'dt': None, 'rows': 0, 'seconds_per_step': None})
+    rows = 0
+    year = dt = None
+    reported, reported_rows = time.perf_counter(), 0
+    due = reported + interval
+    cancelled = False
+    with writer_cls(path) as writer:
+        for row in sim.run_iter(checkpoint, checkpoint_every):
+            writer.write(row)
+            rows += 1
+            if year is not None and row['year'] > year:
+                dt = row['year'] - year
+            year = row['year']
+            now = time.perf_counter()
+            if now >= due:
+                if cancel.is_set():
+                    cancelled = True
+                    break
+                events.put({'job': job_id, 'path': str(path), 'year': year,
+                            'end_year': sim.end_year, 'dt': dt, 'rows': rows,
+                            'seconds_per_step': (now - reported) / max(1, rows - reported_rows)})
+                reported, reported_rows = now, rows
+                due = now + interval
+    if cancelled and checkpoint is not None:
+        sim.save_snapshot(checkpoint)
+    return {'path': str(path), 'rows': rows, 'year': year, 'cancelled': cancelled}
+
+
+# ----------------------------------------------------------------------
+# Jobs and the manager
+# ----------------------------------------------------------------------
+class Job:
+    """One submitted run: its parameters, state, latest progress and outcome."""
+
+    def __init__(self, job_id: int, model: str, params: Dict, name: str, start_year: float,
+                 end_year: float, cancel):
+        self.id = job_id
+        self.model = model
+        self.params = params
+        self.name = name
+        self.state = 'queued'
+        self.attempt = 0
+        self.start_year = start_year
+        self.end_year = end_year
+        self.year = start_year
+        self.dt = None
+        self.eta_seconds = None
+        self.written: Dict[str, int] = {}   # rows written to the output of each attempt
+        self.error: Optional[str] = None
+        self.cancel_event = cancel
+        self.done = asyncio.Event()
+
+    @property
+    def fraction(self) -> float:
+        span = self.end_year - self.start_year
+        return min(1.0, max(0.0, (self.year - self.start_year) / span)) if span > 0 else 1.0
+
+    def status(self) -> Dict:
+        """The job as a progress event."""
+        return {'job': self.id, 'name': self.name, 'model': self.model, 'state': self.state,
+                'attempt': self.attempt, 'year': self.year, 'end_year': self.end_year,
+                'fraction': self.fraction, 'dt': self.dt, 'eta_seconds': self.eta_seconds,
+                'rows': sum(self.written.values()), 'paths': list(self.written),
+                'error': self.error}
+
+    async def wait(self) -> Dict:
+        """Wait until the job is done, failed or cancelled; its final status."""
+        await self.done.wait()
+        return self.status()
+
+
+class JobManager:
+    """
+    Runs submitted jobs on an executor, at most max_concurrent at a time.
+    Use it as an async context manager, or call start() and close().
+    With processes=False the jobs run on threads, which share the GIL but
+    need no worker processes.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, max_pending: int = DEFAULT_MAX_PENDING,
+                 out_dir='jobs', fmt: str = 'ndjson',
+                 checkpoint_every: Optional[float] = DEFAULT_CHECKPOINT_EVERY,
+                 retries: int = DEFAULT_RETRIES, processes: bool = True,
+                 progress_interval: float = PROGRESS_INTERVAL):
+        if fmt not in ('csv', 'ndjson'):
+            raise ValueError("Jobs stream their rows as csv or ndjson")
+        self.max_concurrent = max_concurrent or multiprocessing.cpu_count()
+        self.max_pending = max_pending
+        self.out_dir = Path(out_dir)
+        self.fmt = fmt
+        self.checkpoint_every = checkpoint_every
+        self.retries = retries
+        self.processes = processes
+        self.progress_interval = progress_interval
+        self.jobs: Dict[int, Job] = {}
+        self._subscribers: List[asyncio.Queue] = []
+        self._executor = None
+
+    # -- lifecycle -----------------------------------------------------
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if self.processes:
+            # Progress and cancellation cross into the workers through a manager process
+            self._sync = SyncManager()
+            self._sync.start(_ignore_sigint)
+            self._events = self._sync.Queue()
+        else:
+            self._sync = None
+            self._events = queue.Queue()
+        self._executor = self._new_executor()
+        self._pending = asyncio.Queue(self.max_pending)
+        self._forwarder = threading.Thread(target=self._forward, name='job-progress', daemon=True)
+        self._forwarder.start()
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.max_concurrent)]
+
+    async def close(self, cancel: bool = False):
+        """Finish the queued and running jobs (or, with cancel, cancel them) and stop."""
+        if cancel:
+            for job in self.jobs.values():
+                self.cancel(job.id)
+        for _ in self._dispatchers:
+            await self._pending.put(None)
+        await asyncio.gather(*self._dispatchers)
+        self._events.put(None)
+        await self._loop.run_in_executor(None, self._forwarder.join)
+        self._executor.shutdown()
+        if self._sync is not None:
+            self._sync.shutdown()
+        for subscriber in self._subscribers:
+            subscriber.put_nowait(None)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, *exc):
+        await self.close(cancel=exc_type is not None)
+
+    def _new_executor(self):
+        if self.processes:
+            return ProcessPoolExecutor(self.max_concurrent, initializer=_ignore_sigint)
+        return ThreadPoolExecutor(self.max_concurrent, thread_name_prefix='job')
+
+    # -- submission and control ---------------------------------------
+    async def submit(self, model: str, params: Dict, name: Optional[str] = None) -> Job:
+        """
+        Queue a run of model with constructor arguments params, waiting
+        while max_pending jobs are queued.  Bad parameters raise here.
+        """
+        if model not in JOB_MODELS:
+            raise ValueError(f"Unknown model {model!r}; expected one of {', '.join(JOB_MODELS)}")
+        sim = getattr(load_model(model), JOB_MODELS[model])(**params)
+        job_id = len(self.jobs)
+        name = name or f"{model}_{job_id:04d}"
+        cancel = self._sync.Event() if self._sync is not None else threading.Event()
+        job = Job(job_id, model, params, name, sim.start_year, sim.end_year, cancel)
+        self.jobs[job_id] = job
+        self._publish(job)
+        try:
+            await self._pending.put(job)
+        except asyncio.CancelledError:
+            self._finish(job, 'cancelled')      # gave up waiting for a place in the queue
+            raise
+        return job
+
+    async def retry(self, job_id: int) -> Job:
+        """Queue a failed or cancelled job again; it continues from its checkpoint."""
+        job = self.jobs[job_id]
+        if job.state not in ('failed', 'cancelled'):
+            raise ValueError(f"Job {job.name} is {job.state}; only failed or cancelled jobs are retried")
+        job.cancel_event.clear()
+        job.state, job.error = 'queued', None
+        job.done = asyncio.Event()
+        self._publish(job)
+        await self._pending.put(job)
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job; False if it had already finished."""
+        job = self.jobs[job_id]
+        if job.state in FINAL_STATES:
+            return False
+        job.cancel_event.set()
+        if job.state == 'queued':
+            self._finish(job, 'cancelled')
+        return True
+
+    async def events(self, job_id: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Progress events as they happen: of one job until it finishes, or
+        of every job until the manager closes.
+        """
+        subscriber = asyncio.Queue()
+        self._subscribers.append(subscriber)
+        try:
+            if job_id is not None:
+                yield self.jobs[job_id].status()
+                if self.jobs[job_id].state in FINAL_STATES:
+                    return
+            while True:
+                event = await subscriber.get()
+                if event is None:
+                    return
+                if job_id is None or event['job'] == job_id:
+                    yield event
+                    if job_id is not None and event['state'] in FINAL_STATES:
+                        return
+        finally:
+            self._subscribers.remove(subscriber)
+
+    # -- running -------------------------------------------------------
+    async def _dispatch(self):
+        while True:
+            job = await self._pending.get()
+            if job is None:
+                return
+            if job.state == 'queued':
+                await self._execute(job)
+
+    async def _execute(self, job: Job):
+        path = self.out_dir / f"{job.name}.{self.fmt}"
+        checkpoint = None
+        if self.checkpoint_every is not None and job.params.get('integrator') != 'ivp':
+            checkpoint = self.out_dir / f"{job.name}_checkpoint.json"   # ivp runs restart instead
+        if job.attempt == 0 and checkpoint is not None:
+            checkpoint.unlink(missing_ok=True)      # left by an earlier job of this name
+        for retry in range(self.retries + 1):
+            job.attempt += 1
+            job.state = 'running'
+            self._publish(job)
+            task = functools.partial(run_job, job.id, job.model, job.params, str(path),
+                                     str(checkpoint) if checkpoint is not None else None,
+                                     self.checkpoint_every, job.attempt > 1, self._events,
+                                     job.cancel_event, self.progress_interval)
+            try:
+                outcome = await self._loop.run_in_executor(self._executor, task)
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                logging.warning(f"Job {job.name} attempt {job.attempt} failed: {job.error}")
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died (killed, out of memory): the others' jobs fail over too
+                    broken, self._executor = self._executor, self._new_executor()
+                    broken.shutdown(wait=False)
+                if job.cancel_event.is_set() or retry == self.retries:
+                    break
+                job.state = 'retrying'
+                self._publish(job)
+                continue
+            job.written[outcome['path']] = outcome['rows']
+            if outcome['year'] is not None:
+                job.year = outcome['year']
+            job.error = None
+            return self._finish(job, 'cancelled' if outcome['cancelled'] else 'done')
+        self._finish(job, 'cancelled' if job.cancel_event.is_set() else 'failed')
+
+    def _finish(self, job: Job, state: str):
+        job.state = state
+        if state == 'done':
+            job.year, job.eta_seconds = job.end_year, 0.0
+        else:
+            job.eta_seconds = None
+        self._publish(job)
+        job.done.set()
+
+    # -- progress ------------------------------------------------------
+    def _forward(self):
+        """Thread: hand the workers' progress reports to the event loop."""
+        while True:
+            report = self._events.get()
+            if report is None:
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._progress, report)
+            except RuntimeError:        # the loop was closed without close()
+                return
+
+    def _progress(self, report: Dict):
+        job = self.jobs[report['job']]
+        if job.state in FINAL_STATES:
+            return                      # a late report of a job that has finished
+        job.written[report['path']] = report['rows']
+        job.year, job.dt = report['year'], report['dt']
+        job.end_year = report['end_year']
+        job.eta_seconds = None
+        if job.dt and report['seconds_per_step'] is not None:
+            steps_left = max(0.0, job.end_year - job.year) / job.dt
+            job.eta_seconds = math.ceil(steps_left) * report['seconds_per_step']
+        self._publish(job)
+
+    def _publish(self, job: Job):
+        event = job.status()
+        for subscriber in self._subscribers:
+            subscriber.put_nowait(event)
+
+
+# ----------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('scenarios', type=str,
+                        help='JSON file: a list of {"model": ..., "params": {...}, "name": ...} '
+                             '(name optional)')
+    parser.add_argument('--max-concurrent', type=int, default=None,
+                        help='Jobs run at once (default: CPU count)')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help=f'Jobs queued before submission waits (default {DEFAULT_MAX_PENDING})')
+    parser.add_argument('--out-dir', type=str, default='jobs',
+                        help='Directory of the outputs and checkpoints (default jobs)')
+    parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson',
+                        help='Format the rows are streamed in')
+    parser.add_argument('--checkpoint-every', type=float, default=DEFAULT_CHECKPOINT_EVERY,
+                        metavar='YEARS',
+                        help=f'Simulated years between snapshots (default {DEFAULT_CHECKPOINT_EVERY:g})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f'Retries of a failed job, from its checkpoint (default {DEFAULT_RETRIES})')
+    parser.add_argument('--threads', action='store_true',
+                        help='Run the jobs on threads instead of worker processes')
+    parser.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL,
+                        metavar='SECONDS', help='Seconds between progress reports')
+
+async def run_jobs(args: argparse.Namespace) -> int:
+    with open(args.scenarios) as f:
+        scenarios = json.load(f)
+    manager = JobManager(args.max_concurrent, args.max_pending, args.out_dir, args.format,
+                         args.checkpoint_every, args.retries, not args.threads,
+                         args.progress_interval)
+    async with manager:
+        async def report():
+            async for event in manager.events():
+                print(json.dumps(event), flush=True)
+
+        reporter = asyncio.create_task(report())
+        await asyncio.sleep(0)          # let it subscribe before the first event
+        jobs = [await manager.submit(s['model'], s.get('params', {}), s.get('name'))
+                for s in scenarios]
+        finished = [await job.wait() for job in jobs]
+    await reporter
+    failed = [s['name'] for s in finished if s['state'] != 'done']
+    print(f"{len(finished) - len(failed)} of {len(finished)} job(s) done", file=sys.stderr)
+    return 1 if failed else 0
+
+def main(argv=None, prog: str = 'python -m earth_sims jobs') -> int:
+    parser = argparse.ArgumentParser(prog=prog, description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    try:
+        return asyncio.run(run_jobs(args))
+    except (ValueError, TypeError, KeyError) as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
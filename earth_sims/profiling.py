@@ -0,0 +1,124 @@
+"""
+Per-section wall-time profiler shared by the simulators (--profile).
+
+Each simulator subclasses Profiler with its sub-models, by the name they
+are reported under, and the simulator class whose methods compute them:
+
+    class Profiler(earth_sims.profiling.Profiler):
+        submodels = PROFILE_SECTIONS
+        simulator = AsteroidImpactEnhanced
+"""
+
+import contextlib
+import functools
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Layout version of the profile report (Profiler.report())
+PROFILE_FORMAT_VERSION = 1
+
+
+class Profiler:
+    """
+    Wall time and call count per named section of a run (--profile).
+
+    Nothing is timed unless a Profiler is in use: instrument() replaces the
+    submodels methods of the simulator class with timed wrappers for the
+    duration of a with block, and section() times any other block (the
+    whole run, each writer).  Sub-model times are part of the 'run' time;
+    report() lists the remainder (loop, forcing and recording) as 'other'.
+    """
+
+    submodels: Dict[str, Tuple[str, ...]] = {}
+    simulator: Optional[type] = None
+
+    def __init__(self):
+        self.sections: Dict[str, List[float]] = {}      # name -> [seconds, calls]
+        self.start = time.perf_counter()
+
+    def add(self, name: str, seconds: float, calls: int = 1):
+        entry = self.sections.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += calls
+
+    @contextlib.contextmanager
+    def section(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed(self, name: str, function):
+        """function, with each call's wall time added to section name."""
+        entry = self.sections.setdefault(name, [0.0, 0])
+        clock = time.perf_counter
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                entry[0] += clock() - start
+                entry[1] += 1
+        return timed
+
+    @contextlib.contextmanager
+    def instrument(self, cls=None):
+        """
+        Time the sub-models of every cls instance (by default the simulator)
+        within the block.  The wrappers sit on the class, so instance state,
+        snapshots and cache keys are unaffected, and the original methods
+        are put back however the block ends.
+        """
+        cls = cls if cls is not None else self.simulator
+        originals = {}
+        try:
+            for name, methods in self.submodels.items():
+                for method in methods:
+                    originals[method] = vars(cls)[method]
+                    setattr(cls, method, self.timed(name, originals[method]))
+            yield self
+        finally:
+            for method, function in originals.items():
+                setattr(cls, method, function)
+
+    def report(self) -> Dict:
+        """JSON-serialisable breakdown: seconds, calls and share of the total per section."""
+        total = time.perf_counter() - self.start
+        sections = {name: {'seconds': seconds, 'calls': calls}
+                    for name, (seconds, calls) in self.sections.items()}
+        if 'run' in sections:
+            nested = sum(sections[name]['seconds'] for name in self.submodels if name in sections)
+            sections['other'] = {'seconds': max(0.0, sections['run']['seconds'] - nested),
+                                 'calls': sections['run']['calls']}
+        for entry in sections.values():
+            entry['share'] = entry['seconds'] / total if total > 0 else 0.0
+        return {'format_version': PROFILE_FORMAT_VERSION, 'total_seconds': total,
+                'sections': sections}
+
+    def table(self, report: Optional[Dict] = None) -> str:
+        """report() as a fixed-width table, sub-models indented under 'run'."""
+        report = report if report is not None else self.report()
+        sections = report['sections']
+        lines = [f"{'section':<20} {'calls':>10} {'seconds':>10} {'us/call':>10} {'share':>7}"]
+
+        def line(name, indent=''):
+            entry = sections[name]
+            per_call = 1e6 * entry['seconds'] / entry['calls'] if entry['calls'] else 0.0
+            lines.append(f"{indent + name:<20} {entry['calls']:>10d} {entry['seconds']:>10.4f} "
+                         f"{per_call:>10.2f} {100 * entry['share']:>6.1f}%")
+
+        # Sub-models the run never reached are left out
+        nested = ([name for name in list(self.submodels) + ['other']
+                   if name in sections and sections[name]['calls']]
+                  if 'run' in sections else [])
+        for name in sections:
+            if name not in nested and name not in self.submodels:
+                line(name)
+            if name == 'run':
+                for sub in nested:
+                    line(sub, '  ')
+        lines.append(f"{'total':<20} {'':>10} {report['total_seconds']:>10.4f}")
+        return '\n'.join(lines)
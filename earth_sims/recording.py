@@ -0,0 +1,332 @@
+"""
+Columnar run results shared by the simulators: SimulationResults, the
+recorders run() appends raw rows to, and resampling onto output times.
+
+The model-specific part is the output columns and the decimals they are
+rounded to.  Each simulator subclasses SimulationResults with its
+STATE_ROUNDING and points its recorders at that subclass:
+
+    class SimulationResults(earth_sims.recording.SimulationResults):
+        rounding = STATE_ROUNDING
+
+    class ResultRecorder(earth_sims.recording.ResultRecorder):
+        results_class = SimulationResults
+
+ChangeRecorder and changed_rows() implement --record-changes: a row is
+kept only once the state has moved since the last kept row.
+"""
+
+import math
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+class SimulationResults:
+    """
+    A trajectory stored column‑wise, one float64 array per variable.
+
+    results['co2_ppm'] is a column, results[i] a row dict and iterating
+    yields row dicts; to_dicts() gives the List[Dict] form with the
+    output rounding applied.  rounding maps the model's output columns, in
+    order, to the number of decimals they are rounded to on output;
+    columns not in it are left as they are.
+    """
+
+    rounding: Dict[str, int] = {}
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self._columns = {k: np.asarray(v, dtype=float) for k, v in columns.items()}
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self._columns.values()), ()))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._columns[key]
+        if isinstance(key, slice):
+            return [self.row(i) for i in range(*key.indices(len(self)))]
+        return self.row(key)
+
+    def __iter__(self) -> Iterator[Dict[str, float]]:
+        names = self.columns
+        for values in zip(*(c.tolist() for c in self._columns.values())):
+            yield dict(zip(names, values))
+
+    def row(self, i: int, rounded: bool = False) -> Dict[str, float]:
+        if i < 0:
+            i += len(self)
+        row = {k: float(v[i]) for k, v in self._columns.items()}
+        if rounded:
+            row = {k: round(v, self.rounding[k]) if k in self.rounding else v
+                   for k, v in row.items()}
+        return row
+
+    def rounded_columns(self) -> Dict[str, List[float]]:
+        """Columns as lists with the output rounding applied."""
+        return {k: (np.round(v, self.rounding[k]) if k in self.rounding else v).tolist()
+                for k, v in self._columns.items()}
+
+    def to_dicts(self, rounded: bool = True) -> List[Dict[str, float]]:
+        """Rows as dicts, as run() used to return them."""
+        columns = self.rounded_columns() if rounded else {k: v.tolist() for k, v in self._columns.items()}
+        names = list(columns)
+        return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def parse_output_times(spec: str) -> np.ndarray:
+    """
+    Parse an --output-times spec into sorted, distinct years: a comma list
+    ("0,1,10,100"), "linspace:start:stop:n" or "logspace:start:stop:n"
+    (n years evenly spaced in log10; start and stop must be positive).
+    """
+    kind, sep, rest = spec.partition(':')
+    if sep and kind in ('linspace', 'logspace'):
+        parts = rest.split(':')
+        if len(parts) != 3:
+            raise ValueError(f"Expected {kind}:start:stop:n, got {spec!r}")
+        start, stop, n = float(parts[0]), float(parts[1]), int(float(parts[2]))
+        if n < 1:
+            raise ValueError(f"Need at least one output time, got {spec!r}")
+        if kind == 'logspace':
+            if start <= 0 or stop <= 0:
+                raise ValueError(f"logspace needs a positive start and stop, got {spec!r}")
+            times = np.geomspace(start, stop, n)
+        else:
+            times = np.linspace(start, stop, n)
+    else:
+        times = np.array([float(v) for v in spec.split(',') if v.strip()])
+    if not len(times) or not np.all(np.isfinite(times)):
+        raise ValueError(f"No valid output times in {spec!r}")
+    return np.unique(times)
+
+
+def resample_results(results: SimulationResults, times,
+                     previous: Optional[Tuple[float, ...]] = None) -> SimulationResults:
+    """
+    A finished run's columns linearly interpolated onto the sorted output
+    times (the models' resample_rows() for a whole run at once).  A time
+    that falls on rows takes the last of them; times outside the run are
+    skipped, and previous is the last row of an earlier part of the run,
+    which owns the times up to it.
+    """
+    columns = {name: results[name] for name in results.columns}
+    if previous is not None:
+        columns = {name: np.concatenate(([value], column))
+                   for (name, column), value in zip(columns.items(), previous)}
+    year = columns['year']
+    times = np.asarray(times, dtype=float)
+    if len(year):
+        inside = (times > year[0]) if previous is not None else (times >= year[0])
+        times = times[inside & (times <= year[-1])]
+    else:
+        times = times[:0]
+    hi = np.searchsorted(year, times, side='right')
+    lo = hi - 1
+    hi = np.minimum(hi, len(year) - 1)
+    exact = year[lo] == times
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w = (times - year[lo]) / (year[hi] - year[lo])
+    resampled = {}
+    for name, column in columns.items():
+        a, b = column[lo], column[hi]
+        resampled[name] = np.where(exact, a, a + w * (b - a))
+    resampled['year'] = times
+    return type(results)(resampled)
+
+
+def resample_blocks(blocks, times, previous: Optional[Tuple[float, ...]] = None,
+                    results_class=SimulationResults) -> SimulationResults:
+    """
+    resample_results() for a run that arrives as consecutive
+    (n_columns, m) blocks of raw rows, in the column order of
+    results_class.rounding; only the resampled rows of each block are
+    kept, so the blocks may reuse one buffer.
+    """
+    columns = tuple(results_class.rounding)
+    parts = []
+    for block in blocks:
+        if block.shape[1]:
+            part = resample_results(results_class(dict(zip(columns, block))), times, previous)
+            parts.append([part[name] for name in columns])
+            previous = tuple(block[:, -1].tolist())
+    return results_class({name: np.concatenate([part[i] for part in parts]) if parts else np.empty(0)
+                          for i, name in enumerate(columns)})
+
+
+class ResultRecorder:
+    """
+    Preallocated, growable float64 buffer that run() appends raw rows to.
+    Each column is a contiguous row of the buffer; capacity doubles when
+    full.  columns default to those of results_class, which results()
+    returns.
+    """
+
+    results_class = SimulationResults
+
+    def __init__(self, columns=None, capacity: int = 1024):
+        self.columns = tuple(self.results_class.rounding if columns is None else columns)
+        self._data = np.empty((len(self.columns), max(1, capacity)))
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, row: Tuple[float, ...]):
+        if self._n == self._data.shape[1]:
+            grown = np.empty((len(self.columns), 2 * self._data.shape[1]))
+            grown[:, :self._n] = self._data[:, :self._n]
+            self._data = grown
+        self._data[:, self._n] = row
+        self._n += 1
+
+    def results(self) -> SimulationResults:
+        data = self._data[:, :self._n]
+        if self._n < self._data.shape[1]:
+            data = data.copy()      # release unused capacity
+        return self.results_class(dict(zip(self.columns, data)))
+
+
+def default_tolerances(rounding: Dict[str, int]) -> Dict[str, float]:
+    """
+    Default change-driven recording tolerances: a row is stored once a
+    column has moved by ten units of its last output decimal since the last
+    stored row.  The year is not watched.
+    """
+    return {name: 10.0 ** (1 - decimals) for name, decimals in rounding.items() if name != 'year'}
+
+
+def parse_record_tolerances(specs: List[str], defaults: Dict[str, float]) -> Dict[str, float]:
+    """Parse --record-changes "column=tolerance" overrides of the default tolerances."""
+    tolerances = {}
+    for spec in specs:
+        name, sep, value = spec.partition('=')
+        name = name.strip()
+        if not sep or name not in defaults:
+            raise ValueError(f"Bad tolerance {spec!r}; expected one of "
+                             f"{', '.join(defaults)} as column=tolerance")
+        tolerances[name] = float(value)
+        if not tolerances[name] >= 0:
+            raise ValueError(f"Tolerance must be non-negative, got {spec!r}")
+    return tolerances
+
+
+def record_tolerances(defaults: Dict[str, float], columns,
+                      tolerances: Optional[Dict[str, float]] = None) -> List[float]:
+    """Per-column tolerances in columns order: defaults with overrides, inf if not watched."""
+    tolerances = dict(defaults, **(tolerances or {}))
+    unknown = set(tolerances) - set(columns)
+    if unknown:
+        raise ValueError(f"Unknown column(s) to record changes of: {', '.join(sorted(unknown))}")
+    return [float(tolerances.get(name, math.inf)) for name in columns]
+
+
+def _moved(row, kept, tolerance) -> bool:
+    """Whether some value of row is more than its tolerance away from kept (NaN appearing or going counts)."""
+    for value, before, tol in zip(row, kept, tolerance):
+        if abs(value - before) > tol or (value != value) != (before != before):
+            return True
+    return False
+
+
+def changed_rows(rows, tolerance: List[float]) -> Iterator[Tuple[float, ...]]:
+    """
+    The rows of a stream that ChangeRecorder would store with the
+    per-column tolerance (see record_tolerances()), yielded as they come
+    (there is no recent-rows buffer in a stream).
+    """
+    kept = last = None
+    for row in rows:
+        if kept is None or _moved(row, kept, tolerance):
+            yield row
+            kept = row
+        last = row
+    if last is not kept:
+        yield last
+
+
+class ChangeRecorder(ResultRecorder):
+    """
+    ResultRecorder that stores a row only when some column has moved by more
+    than its tolerance since the last stored row (default_tolerances() of
+    the results_class rounding, overridden per column by tolerances).  The
+    first and the last row are always kept.  With keep_recent=K a ring
+    buffer also holds the latest K rows at full resolution, and results()
+    is the decimated history followed by them, so near‑equilibrium eras
+    cost a few rows while the end of the run keeps every step.
+    """
+
+    def __init__(self, tolerances: Optional[Dict[str, float]] = None, keep_recent: int = 0,
+                 columns=None, capacity: int = 1024):
+        super().__init__(columns, capacity)
+        self.tolerance = record_tolerances(default_tolerances(self.results_class.rounding),
+                                           self.columns, tolerances)
+        self._recent = np.empty((len(self.columns), max(0, keep_recent)))
+        self._stored_at: List[int] = []     # stream position of each stored row
+        self._seen = 0
+        self._kept = self._last = None
+
+    def append(self, row: Tuple[float, ...]):
+        if self._recent.shape[1]:
+            self._recent[:, self._seen % self._recent.shape[1]] = row
+        if self._kept is None or _moved(row, self._kept, self.tolerance):
+            self._store(row, self._seen)
+        self._last = row
+        self._seen += 1
+
+    def extend(self, block: np.ndarray):
+        """
+        append() every row of a (n_columns, m) block, vectorized: the next
+        row to store is found by comparing growing windows of the block
+        with the last stored row at once.
+        """
+        m = block.shape[1]
+        if not m:
+            return
+        k = self._recent.shape[1]
+        if k:
+            tail = block[:, -k:]
+            self._recent[:, np.arange(self._seen + m - tail.shape[1], self._seen + m) % k] = tail
+        tolerance = np.array(self.tolerance)[:, None]
+        i, width = 0, 16
+        if self._kept is None:
+            self._store(block[:, 0], self._seen)
+            i = 1
+        kept = np.array(self._kept, dtype=float)[:, None]
+        while i < m:
+            window = block[:, i:i + width]
+            with np.errstate(invalid='ignore'):
+                moved = np.abs(window - kept) > tolerance
+            moved = (moved | (np.isnan(window) != np.isnan(kept))).any(axis=0)
+            if moved.any():
+                i += int(np.argmax(moved))
+                self._store(block[:, i], self._seen + i)
+                kept = block[:, i:i + 1]
+                i, width = i + 1, 16
+            else:
+                i, width = i + window.shape[1], 2 * width
+        self._last = tuple(block[:, -1].tolist())
+        self._seen += m
+
+    def _store(self, row, position: int):
+        ResultRecorder.append(self, row)
+        self._kept = tuple(np.asarray(row, dtype=float).tolist())
+        self._stored_at.append(position)
+
+    def results(self) -> SimulationResults:
+        data = self._data[:, :self._n]
+        k = min(self._recent.shape[1], self._seen)
+        if k:
+            first = self._seen - k
+            older = int(np.searchsorted(self._stored_at, first))
+            recent = self._recent[:, np.arange(first, self._seen) % self._recent.shape[1]]
+            data = np.concatenate((data[:, :older], recent), axis=1)
+        elif self._seen and self._stored_at[-1] != self._seen - 1:
+            data = np.concatenate((data, np.array(self._last, dtype=float)[:, None]), axis=1)
+        else:
+            data = data.copy()
+        return self.results_class(dict(zip(self.columns, data)))
@@ -0,0 +1,510 @@
+"""
+Local simulation service: a long-running server that runs scenarios on a
+pre-warmed process pool and streams their rows back as NDJSON.
+
+  python -m earth_sims serve                          # http://127.0.0.1:8750
+  python -m earth_sims serve --port 0 --workers 4     # any free port
+  python -m earth_sims serve --socket /tmp/earth_sims.sock
+
+  curl -N localhost:8750/run -d '{"model": "asteroid", "params": {"diameter": 10, "seed": 1}}'
+  curl -N localhost:8750/batch -d '{"model": "supervolcano",
+      "scenarios": [{"volume": 500, "seed": 1}, {"volume": 2000, "seed": 2}]}'
+  curl --unix-socket /tmp/earth_sims.sock http://localhost/health
+
+Requests are POSTed as JSON:
+- /run: "model" ('asteroid', 'supervolcano' or the simulator class name),
+  "params" (the simulator's constructor arguments) and optionally
+  "output_times" (an --output-times spec or a list of years) or
+  "record_changes" (tolerance overrides, {} for the defaults).
+- /batch: "model", "scenarios" (a list of params) and the same options,
+  which apply to every scenario.  Scenarios the model's ensemble class can
+  run together (Euler runs without jit or steady_tol on one time grid)
+  become one vectorized <Model>Ensemble.run() per --max-batch members; the
+  rest run one by one.  Each row carries the "scenario" it belongs to.
+GET /health reports the models, workers and cache.
+
+The response is NDJSON, one rounded state per line as NdjsonStreamWriter
+writes it.  The status line goes out once the request is validated, and
+each run's rows follow in chunks as soon as the pool task that ran it
+completes (cached runs first), so a batch's scenarios arrive in the order
+they finish.  Bad requests get a 400 with {"error": ...}; a run that fails
+after the response has started ends it with an {"error": ...} line and no
+terminating chunk.  If a worker process dies (killed, out of memory), the
+pool is replaced by a new warm one and the tasks it had are retried once.  Seeded scenarios go through the models' ResultCache: the
+server answers a repeated scenario from the cache itself, without the pool.
+Ensemble members agree with their scalar runs to rounding, not bitwise, so
+they are cached under keys of their own and never answer a /run.
+"""
+
+import argparse
+import contextlib
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socketserver
+import sys
+import threading
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from earth_sims import load_model
+
+# Per model: simulator and ensemble classes, and the ensemble parameters
+# that may differ between members (the others are shared by a batch)
+SERVE_MODELS = {
+    'asteroid': ('AsteroidImpactEnhanced', 'AsteroidImpactEnsemble',
+                 ('diameter', 'density', 'velocity', 'target_type', 'seed')),
+    'supervolcano': ('SupervolcanoEnhanced', 'SupervolcanoEnsemble', ('volume', 'vei', 'seed')),
+}
+
+DEFAULT_PORT = 8750
+DEFAULT_MAX_BATCH = 64            # members of one ensemble run
+STREAM_CHUNK_ROWS = 1024          # NDJSON rows per chunk of the response
+WARM_YEARS = 10.0                 # horizon of the runs that warm a worker up
+WARM_TIMEOUT = 120.0              # seconds the workers may take to start
+
+
+# ----------------------------------------------------------------------
+# Worker side – runs in the pool's processes
+# ----------------------------------------------------------------------
+_caches = {}        # this worker's ResultCache of each model
+_started = None     # barrier of all the pool's workers (see SimulationService.start())
+
+
+def _warm(models, cache_dir: Optional[str], cache_bytes: int, started):
+    """Pool initializer: import the models and run each once, so requests find a warm process."""
+    global _started
+    _started = started
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # Ctrl-C stops the server, which stops the pool
+    # Unstable Euler runs go NaN; that ends up in the rows, not on the server's stderr
+    warnings.simplefilter('ignore', RuntimeWarning)
+    for model in models:
+        module = load_model(model)
+        simulation, ensemble, _ = SERVE_MODELS[model]
+        getattr(module, simulation)(end_year=WARM_YEARS, seed=0).run()
+        getattr(module, ensemble)(seed=[0, 1], end_year=WARM_YEARS).run()
+        if cache_dir is not None:
+            _caches[model] = module.ResultCache(cache_dir, cache_bytes)
+
+
+def _ready():
+    # Blocks until every worker runs one: so each has started and warmed up
+    _started.wait(WARM_TIMEOUT)
+
+
+def _columns(results) -> Dict[str, np.ndarray]:
+    return {name: results[name] for name in results.columns}
+
+
+def _recorded(module, results, times, record_changes):
+    """An ensemble member's full trajectory, recorded as run() would with these options."""
+    if times is not None:
+        return module.resample_results(results, times)
+    if record_changes is not None:
+        recorder = module.ChangeRecorder(record_changes)
+        recorder.extend(np.array([results[name] for name in recorder.columns]))
+        return recorder.results()
+    return results
+
+
+def run_group(model: str, scenarios: List[Dict], times, record_changes, keys: List[Optional[str]]
+              ) -> List[Dict[str, np.ndarray]]:
+    """
+    Columns of each scenario of one batch: a single scenario runs on the
+    simulator (through the cache), several as one ensemble, whose seeded
+    members are cached under their member keys.
+    """
+    module = load_model(model)
+    simulation, ensemble, members = SERVE_MODELS[model]
+    cache = _caches.get(model)
+    sims = [getattr(module, simulation)(**params) for params in scenarios]
+    if len(sims) == 1:
+        # Requests that differ only by seed reuse one trajectory where the model memoizes it
+        replay = {'replay': True} if 'replay' in inspect.signature(sims[0].run).parameters else {}
+        return [_columns(sims[0].run(cache=cache, output_times=times, record_changes=record_changes,
+                                     **replay))]
+
+    ensemble = getattr(module, ensemble)
+    arguments = {}
+    for name in inspect.signature(ensemble).parameters:
+        values = [getattr(sim, name) for sim in sims]
+        arguments[name] = values if name in members else values[0]
+    out = ensemble(**arguments).run()
+    columns = []
+    for i, key in enumerate(keys):
+        results = _recorded(module, ensemble.member_results(out, i), times, record_changes)
+        if cache is not None and key is not None:
+            cache.put(key, results, None)
+        columns.append(_columns(results))
+    return columns
+
+
+# ----------------------------------------------------------------------
+# Service – validation, cache lookups and batching, in the server process
+# ----------------------------------------------------------------------
+def batch_key(sim, ensemble, members) -> Optional[tuple]:
+    """Scenarios with equal keys can run as one ensemble; None for one that cannot."""
+    if sim.integrator != 'euler' or sim.jit or sim.steady_tol is not None:
+        return None
+    return tuple(getattr(sim, name) for name in inspect.signature(ensemble).parameters
+                 if name not in members)
+
+
+class SimulationService:
+    """
+    The warm worker pool and the result cache behind the server.
+    run() is thread-safe, so request handler threads share one service.
+    """
+
+    def __init__(self, models=tuple(SERVE_MODELS), workers: Optional[int] = None,
+                 cache_dir=None, cache_bytes: Optional[int] = None, cache: bool = True,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self.modules = {model: load_model(model) for model in models}
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.caches = {}
+        if cache:
+            for model, module in self.modules.items():
+                self.caches[model] = module.ResultCache(
+                    cache_dir, module.CACHE_MAX_BYTES if cache_bytes is None else cache_bytes)
+        self.cache_dir = (str(next(iter(self.caches.values())).directory)
+                          if self.caches else None)
+        self.pool = None
+        self._restarting = threading.Lock()
+
+    def start(self):
+        """Start every worker and wait until each has warmed up."""
+        self.pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        cache_bytes = next(iter(self.caches.values())).max_bytes if self.caches else 0
+        started = multiprocessing.Barrier(self.workers)
+        pool = ProcessPoolExecutor(self.workers, initializer=_warm,
+                                   initargs=(tuple(self.modules), self.cache_dir, cache_bytes, started))
+        for future in [pool.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def _recover(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """
+        The pool in place of broken, whose worker died: a new warm one,
+        started by the first request thread that finds it broken.
+        """
+        with self._restarting:
+            if self.pool is broken:
+                logging.warning("A worker process died; restarting the pool")
+                self.pool = self._new_pool()
+                broken.shutdown(wait=False, cancel_futures=True)
+            return self.pool
+
+    def _submit(self, task: tuple):
+        """(pool, future) of run_group(*task), on a new pool if the current one is broken."""
+        pool = self.pool
+        try:
+            return pool, pool.submit(run_group, *task)
+        except BrokenProcessPool:
+            pool = self._recover(pool)
+            return pool, pool.submit(run_group, *task)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def model(self, name: str) -> str:
+        """Model name of name, which may also be the simulator's class name."""
+        for model in self.modules:
+            if name in (model, SERVE_MODELS[model][0]):
+                return model
+        raise ValueError(f"Unknown model {name!r}; expected one of {', '.join(self.modules)}")
+
+    def health(self) -> Dict:
+        return {'status': 'ok', 'models': list(self.modules), 'workers': self.workers,
+                'max_batch': self.max_batch, 'cache': self.cache_dir}
+
+    def run(self, model: str, scenarios: List[Dict], output_times=None,
+            record_changes: Optional[Dict[str, float]] = None) -> Iterator[Tuple[int, object]]:
+        """
+        (index, SimulationResults) of each scenario (constructor arguments):
+        the cache hits, then the scenarios of each pool task as it completes.
+        Raises ValueError/TypeError for bad requests before anything runs;
+        the tasks are submitted at once and the iterator waits on them.
+        """
+        model = self.model(model)
+        module = self.modules[model]
+        simulation, ensemble, members = SERVE_MODELS[model]
+        simulation, ensemble = getattr(module, simulation), getattr(module, ensemble)
+        if not isinstance(scenarios, list) or not all(isinstance(p, dict) for p in scenarios):
+            raise ValueError("Scenarios must be JSON objects of constructor arguments")
+        times = None
+        if output_times is not None:
+            times = module.parse_output_times(output_times if isinstance(output_times, str)
+                                              else ','.join(map(str, output_times)))
+        simulation._check_recording(times, record_changes)
+        sims = [simulation(**params) for params in scenarios]
+
+        cache = self.caches.get(model)
+        hits = []
+        keys = [None] * len(sims)
+        member_keys = [None] * len(sims)
+        groups = {}
+        for i, sim in enumerate(sims):
+            if cache is not None and sim.seed is not None:
+                keys[i] = sim.cache_key(times, record_changes)
+                # An ensemble member differs from the scalar run in the last bits: keys of its own
+                member_keys[i] = module.result_cache_key(ensemble.__name__, {'member': keys[i]})
+                hit = cache.get(keys[i])
+                if hit is None and len(sims) > 1:
+                    hit = cache.get(member_keys[i])
+                if hit is not None:
+                    hits.append((i, hit[0]))
+                    continue
+            key = batch_key(sim, ensemble, members)
+            groups.setdefault(('single', i) if key is None else key, []).append(i)
+
+        futures = {}
+        for indices in groups.values():
+            for start in range(0, len(indices), self.max_batch):
+                chunk = indices[start:start + self.max_batch]
+                task = (model, [scenarios[i] for i in chunk], times, record_changes,
+                        [member_keys[i] for i in chunk])
+                pool, future = self._submit(task)
+                futures[future] = (chunk, task, pool, False)
+        if futures:
+            logging.debug(f"{len(sims)} {model} scenario(s) in {len(futures)} pool task(s)")
+        return self._completed(module, hits, futures)
+
+    def _completed(self, module, hits, futures) -> Iterator[Tuple[int, object]]:
+        """
+        The hits, then each future's scenarios as it completes; closing it
+        cancels the rest.  A task whose pool broke runs once more on a new
+        pool, and raises BrokenProcessPool if that breaks too.
+        """
+        try:
+            yield from hits
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk, task, pool, retried = futures.pop(future)
+                    try:
+                        columns = future.result()
+                    except BrokenProcessPool:
+                        if retried:
+                            raise
+                        self._recover(pool)
+                        pool, future = self._submit(task)
+                        futures[future] = (chunk, task, pool, True)
+                        continue
+                    for i, run in zip(chunk, columns):
+                        yield i, module.SimulationResults(run)
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def ndjson_chunks(results, scenario: Optional[int] = None,
+                  rows: int = STREAM_CHUNK_ROWS) -> Iterator[bytes]:
+    """NDJSON of one run's rows, rows at a time; each row is tagged with scenario if given."""
+    columns = results.rounded_columns()
+    names = list(columns)
+    tag = {'scenario': scenario} if scenario is not None else {}
+    # The repr() of a finite float is its JSON: rows without NaN/inf skip json.dumps
+    line = json.dumps(tag)[:-1] + (', ' if tag else '') + ', '.join(
+        f'{json.dumps(name)}: %r' for name in names) + '}'
+    finite = np.isfinite(np.array(list(columns.values()))).all(axis=0).tolist()
+    lines = []
+    for values, ok in zip(zip(*columns.values()), finite):
+        lines.append(line % values if ok else json.dumps({**tag, **dict(zip(names, values))}))
+        if len(lines) == rows:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+# ----------------------------------------------------------------------
+# HTTP server
+# ----------------------------------------------------------------------
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'       # keep-alive and chunked responses
+    server_version = 'earth_sims'
+
+    def setup(self):
+        # Over TCP, send each chunk at once rather than after a delayed ACK
+        self.disable_nagle_algorithm = isinstance(self.client_address, tuple)
+        super().setup()
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._send_json(404, {'error': f'No such resource {self.path}'})
+        self._send_json(200, self.server.service.health())
+
+    def do_POST(self):
+        if self.path not in ('/run', '/batch'):
+            return self._send_json(404, {'error': f'No such resource {self.path}'})
+        try:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("The request must be a JSON object")
+            if self.path == '/run':
+                scenarios = [request.get('params', {})]
+            elif 'scenarios' in request:
+                scenarios = request['scenarios']
+            else:
+                raise ValueError("A batch needs a list of scenarios")
+            runs = self.server.service.run(request.get('model', ''), scenarios,
+                                           request.get('output_times'),
+                                           request.get('record_changes'))
+        except (ValueError, TypeError) as e:
+            return self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            logging.exception(f"Request to {self.path} failed")
+            return self._send_json(500, {'error': f'{type(e).__name__}: {e}'})
+
+        # The runs are on the pool: answer now and send each one's rows when it is done
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i, results in runs:
+                for chunk in ndjson_chunks(results, i if self.path == '/batch' else None):
+                    self._send_chunk(chunk)
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            logging.debug("Client went away during the response")
+            self.close_connection = True
+        except Exception as e:
+            # Too late for a status: say so in the stream and leave the response unterminated
+            logging.exception(f"Request to {self.path} failed")
+            with contextlib.suppress(OSError):
+                self._send_chunk(json.dumps({'error': f'{type(e).__name__}: {e}'}).encode('utf-8')
+                                 + b'\n')
+            self.close_connection = True
+        finally:
+            runs.close()
+
+    def _send_chunk(self, chunk: bytes):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # A Unix socket's peer has no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+
+class HttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: SimulationService, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                socket_path: Optional[str] = None):
+    """The server for service: HTTP on host:port, or on the Unix socket socket_path."""
+    if socket_path is not None:
+        Path(socket_path).unlink(missing_ok=True)       # left by a server that was killed
+        server = UnixServer(socket_path, ServiceHandler)
+    else:
+        server = HttpServer((host, port), ServiceHandler)
+    server.service = service
+    return server
+
+
+# ----------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Interface to listen on (default 127.0.0.1, this machine only)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'TCP port (default {DEFAULT_PORT}; 0 picks a free one)')
+    parser.add_argument('--socket', type=str, default=None, metavar='PATH',
+                        help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--models', nargs='+', choices=list(SERVE_MODELS), default=list(SERVE_MODELS),
+                        help='Models to serve (default both)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes kept warm (default: CPU count)')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help=f'Most scenarios run as one ensemble (default {DEFAULT_MAX_BATCH}); '
+                             'larger batches are split over the workers')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Neither read nor store results in the result cache')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Result cache directory (default: $EARTH_SIMS_CACHE or '
+                             '~/.cache/earth_sims)')
+    parser.add_argument('--cache-size', type=float, default=None, metavar='MB',
+                        help='Evict least recently used cached results beyond this size '
+                             '(default 1024)')
+    parser.add_argument('--verbose', '-v', action='store_true',
+                        help='Log every request')
+
+def serve(args: argparse.Namespace) -> int:
+    if (args.workers is not None and args.workers < 1) or args.max_batch < 1:
+        raise ValueError("--workers and --max-batch need positive counts")
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(levelname)s: %(message)s')
+    cache_bytes = int(args.cache_size * 2**20) if args.cache_size is not None else None
+    with SimulationService(args.models, args.workers, args.cache_dir, cache_bytes,
+                           not args.no_cache, args.max_batch) as service:
+        server = make_server(service, args.host, args.port, args.socket)
+        if args.socket is not None:
+            where = f'unix:{args.socket}'
+        else:
+            host, port = server.server_address[:2]
+            where = f'http://{host}:{port}'
+        print(f"Serving {', '.join(service.modules)} on {where} with {service.workers} warm "
+              f"worker(s)", file=sys.stderr, flush=True)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))     # clean up as on Ctrl-C
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if args.socket is not None:
+                Path(args.socket).unlink(missing_ok=True)
+    return 0
+
+def main(argv=None, prog: str = 'python -m earth_sims serve') -> int:
+    parser = argparse.ArgumentParser(prog=prog, description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        return serve(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Parameter sweeps shared by the simulators (--sweep): each scenario runs
+through the model's run_scenario() in its own sharded directory, in a
+process pool, and the sweep is indexed in root/index.json.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from earth_sims.telemetry import sweep_telemetry
+
+
+def scenario_dir(root: Path, params: Dict) -> Path:
+    """Deterministic sharded directory for one scenario: root/ab/abcdef012345."""
+    key = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return Path(root) / key[:2] / key
+
+
+def _sweep_worker(params: Dict, run_scenario: Callable, root: str, output: str, fmt: str,
+                  **options) -> Dict:
+    entry = run_scenario(params, scenario_dir(Path(root), params), output, fmt, **options)
+    entry['path'] = str(Path(entry['path']).relative_to(root))
+    return entry
+
+
+def run_sweep(run_scenario: Callable, scenarios: List[Dict], root: Path, output: str,
+              fmt: str = 'all', workers: Optional[int] = None, chunksize: int = 1,
+              trace_memory: bool = False, **options) -> Path:
+    """
+    Fan scenarios out over a process pool and write root/index.json, with
+    the telemetry of the sweep as a whole (sweep_telemetry()).
+
+    run_scenario is the model's module-level run_scenario() (workers find
+    it by name) and options are passed on to it for every scenario.
+    trace_memory starts tracemalloc in the workers, for their runs' peaks.
+    """
+    start = time.perf_counter()
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    worker = functools.partial(_sweep_worker, run_scenario=run_scenario, root=str(root),
+                               output=output, fmt=fmt, **options)
+    if workers == 1:
+        entries = [worker(p) for p in scenarios]
+    else:
+        from concurrent.futures import ProcessPoolExecutor     # multiprocessing: for sweeps only
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=tracemalloc.start if trace_memory else None) as pool:
+            entries = list(pool.map(worker, scenarios, chunksize=chunksize))
+    cache = options.get('cache')
+    if cache is not None:
+        cache.evict()           # the workers only saw their own writes
+
+    index = root / 'index.json'
+    telemetry = sweep_telemetry(entries, time.perf_counter() - start, workers)
+    with open(index, 'w') as f:
+        json.dump({'n_runs': len(entries), 'telemetry': telemetry, 'runs': entries}, f, indent=2)
+    logging.info(f"Sweep of {len(entries)} runs indexed in {index}")
+    return index
@@ -0,0 +1,110 @@
+"""
+Run telemetry shared by the simulators: what every run records in its
+<output>_metadata.json (run_telemetry()) and a sweep in its index.json
+(sweep_telemetry()).
+"""
+
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from earth_sims.profiling import Profiler
+
+# Libraries whose installed versions are recorded with every run
+TELEMETRY_LIBRARIES = ('numpy', 'scipy', 'numba')
+
+
+def host_telemetry() -> Dict:
+    """Python and TELEMETRY_LIBRARIES versions (None if not installed) and the CPU count."""
+    from importlib import metadata
+    versions = {'python': platform.python_version()}
+    for name in TELEMETRY_LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return {'versions': versions, 'cpu_count': os.cpu_count()}
+
+
+def peak_memory() -> Dict[str, Optional[int]]:
+    """
+    Peak resident set size of this process so far (getrusage), and the
+    peak traced by tracemalloc since its last reset when tracing is on
+    (--trace-memory); None where not available.
+    """
+    try:
+        import resource
+    except ImportError:             # not on Windows
+        rss = None
+    else:
+        # KiB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    traced = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    return {'peak_rss_bytes': rss, 'peak_traced_bytes': traced}
+
+
+def run_telemetry(sim, timer: Profiler, steps: int, stats_before: Dict[str, int],
+                  output_bytes: Dict[str, int], cache_hit: bool = False) -> Dict:
+    """
+    Telemetry of one run for its metadata.  steps is the number of forcing
+    grid steps the Euler or multi-rate loop had ahead of it; the adaptive
+    and ivp counts come from solver_stats (stats_before: at the start).
+    timer holds the 'run' and 'write_<format>' sections; output_bytes the
+    size of each file written.
+    """
+    stats = sim.solver_stats
+    if cache_hit:
+        steps = accepted = rejected = 0
+    elif sim.integrator == 'adaptive':
+        accepted = stats.get('accepted', 0) - stats_before.get('accepted', 0)
+        rejected = stats.get('rejected', 0) - stats_before.get('rejected', 0)
+        steps = accepted + rejected
+    elif sim.integrator == 'ivp':
+        # solve_ivp does not report its rejected steps
+        steps, accepted, rejected = stats.get('steps', 0), stats.get('steps', 0), None
+    else:
+        accepted, rejected = steps, 0
+    seconds = timer.sections['run'][0]
+    wall = {'simulation': seconds}
+    wall.update((name, entry[0]) for name, entry in timer.sections.items() if name.startswith('write_'))
+    wall['total'] = time.perf_counter() - timer.start
+    telemetry = {
+        'steps': steps,
+        'accepted_steps': accepted,
+        'rejected_steps': rejected,
+        'cache_hit': cache_hit,
+        'wall_seconds': wall,
+        'steps_per_second': steps / seconds if seconds > 0 else None,
+        'output_bytes': output_bytes,
+    }
+    telemetry.update(peak_memory())
+    telemetry.update(host_telemetry())
+    return telemetry
+
+
+def sweep_telemetry(entries: List[Dict], seconds: float, workers: Optional[int]) -> Dict:
+    """The runs' telemetry summed (steps, bytes) or maximised (memory) over a sweep."""
+    runs = [entry['metadata']['telemetry'] for entry in entries]
+    steps = sum(run['steps'] for run in runs)
+    output_bytes = {}
+    for run in runs:
+        for fmt, size in run['output_bytes'].items():
+            output_bytes[fmt] = output_bytes.get(fmt, 0) + size
+    telemetry = {
+        'workers': workers if workers is not None else os.cpu_count(),
+        'wall_seconds': seconds,
+        'simulation_seconds': sum(run['wall_seconds']['simulation'] for run in runs),
+        'steps': steps,
+        'cache_hits': sum(run['cache_hit'] for run in runs),
+        'runs_per_second': len(runs) / seconds if seconds > 0 else None,
+        'steps_per_second': steps / seconds if seconds > 0 else None,
+        'output_bytes': output_bytes,
+    }
+    for name in ('peak_rss_bytes', 'peak_traced_bytes'):
+        peaks = [run[name] for run in runs if run[name] is not None]
+        telemetry[name] = max(peaks) if peaks else None
+    telemetry.update(host_telemetry())
+    return telemetry
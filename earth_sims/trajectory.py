@@ -0,0 +1,138 @@
+"""
+Binary trajectory format (.npy) shared by the simulators, its
+memory-mapped reader and the converter from CSV/JSON outputs.
+
+The trajectory is a 0-d structured array with one (n_rows,) float64 field
+per column, so every column is contiguous on disk and a memory-mapped
+reader only touches the pages of the columns it slices.  The values are
+stored unrounded.  A JSON header (format version, columns, row count and
+the run metadata) follows the array data; np.load ignores trailing bytes,
+so the file stays a plain .npy.
+"""
+
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from earth_sims.recording import SimulationResults
+
+NPY_FORMAT_VERSION = 1
+
+
+def write_npy(results, filename: Path, metadata: Optional[Dict] = None):
+    """Write results (unrounded) as a column-wise structured .npy."""
+    if not isinstance(results, SimulationResults):
+        results = SimulationResults({k: [r[k] for r in results] for k in results[0]})
+    with open(filename, 'wb') as f:
+        _save_npy(results, f, metadata)
+    logging.info(f"NPY written to {filename}")
+
+
+def _save_npy(results: SimulationResults, f, metadata: Optional[Dict]):
+    n = len(results)
+    if not n:
+        raise ValueError("No data to write")
+    data = np.empty((), dtype=[(name, '<f8', (n,)) for name in results.columns])
+    for name in results.columns:
+        data[name] = results[name]
+    header = {
+        'format_version': NPY_FORMAT_VERSION,
+        'columns': results.columns,
+        'rows': n,
+        'metadata': metadata or {},
+    }
+    np.save(f, data)
+    f.write(json.dumps(header).encode('utf-8'))
+
+
+class Trajectory:
+    """
+    Read-only view of a trajectory written by write_npy().
+
+    The data is memory-mapped: traj['co2_ppm'] reads only that column from
+    disk; traj.metadata holds the run metadata.  results() loads it as
+    results_class.
+    """
+
+    results_class = SimulationResults
+
+    def __init__(self, filename):
+        self.filename = Path(filename)
+        self.data = np.load(self.filename, mmap_mode='r')
+        with open(self.filename, 'rb') as f:
+            f.seek(self.data.offset + self.data.nbytes)
+            trailer = f.read().strip()
+        self.header = json.loads(trailer) if trailer else {}
+        self.metadata = self.header.get('metadata', {})
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.data.dtype.names)
+
+    def __len__(self) -> int:
+        return self.data.dtype[0].shape[0]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.data[column]
+
+    def results(self) -> SimulationResults:
+        """Load every column into memory as SimulationResults."""
+        return self.results_class({name: np.array(self.data[name]) for name in self.columns})
+
+
+def open_trajectory(filename) -> Trajectory:
+    return Trajectory(filename)
+
+
+def read_output(filename: Path, results_class=SimulationResults) -> SimulationResults:
+    """Read a trajectory previously written as CSV or JSON."""
+    filename = Path(filename)
+    if filename.suffix == '.csv':
+        with open(filename, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            names = next(reader)
+            values = np.array([[float(v) for v in row] for row in reader], dtype=float)
+        return results_class(dict(zip(names, values.reshape(-1, len(names)).T)))
+    if filename.suffix == '.json':
+        with open(filename, encoding='utf-8') as f:
+            rows = json.load(f)
+        return results_class({k: [r[k] for r in rows] for k in rows[0]})
+    raise ValueError(f"Cannot read {filename}: expected a .csv or .json output")
+
+
+def convert_to_npy(path: Path) -> List[Path]:
+    """
+    Convert existing CSV/JSON outputs to .npy next to the originals.
+    path may be a file or a directory (searched recursively).  When both
+    a .csv and a .json exist for the same run the CSV is used, as it is
+    faster to parse and carries the same values.  A sibling
+    <name>_metadata.json is embedded in the .npy.
+    """
+    path = Path(path)
+    if path.is_dir():
+        candidates = sorted(p for p in path.rglob('*')
+                            if p.suffix in ('.csv', '.json')
+                            and not p.name.endswith('_metadata.json')
+                            and p.name != 'index.json')
+    else:
+        candidates = [path]
+    sources = {}
+    for p in candidates:
+        stem = p.with_suffix('')
+        if stem not in sources or p.suffix == '.csv':
+            sources[stem] = p
+    written = []
+    for stem, source in sorted(sources.items()):
+        meta_path = stem.with_name(stem.name + '_metadata.json')
+        metadata = {}
+        if meta_path.exists():
+            with open(meta_path, encoding='utf-8') as f:
+                metadata = json.load(f)
+        target = stem.with_suffix('.npy')
+        write_npy(read_output(source), target, metadata)
+        written.append(target)
+    return written
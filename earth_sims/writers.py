@@ -0,0 +1,129 @@
+"""
+Text output writers shared by the simulators: whole-run CSV, JSON and
+NDJSON writers for SimulationResults, and stream writers that emit rows
+as run_iter() yields them.
+
+A stream writer rounds each row to its class's rounding (the model's
+output columns, in order, and their decimals), like
+SimulationResults.rounded_columns(), so a streamed file is byte for byte
+the file the batch writer makes of the same run.  Each simulator
+subclasses them with its STATE_ROUNDING.
+"""
+
+import csv
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from earth_sims.recording import SimulationResults
+
+
+def write_csv(results, filename: Path):
+    if not len(results):
+        raise ValueError("No data to write")
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        if isinstance(results, SimulationResults):
+            columns = results.rounded_columns()
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            writer.writerows(zip(*columns.values()))
+        else:
+            writer = csv.DictWriter(f, fieldnames=results[0].keys())
+            writer.writeheader()
+            writer.writerows(results)
+    logging.info(f"CSV written to {filename}")
+
+
+def write_json(results, filename: Path):
+    if isinstance(results, SimulationResults):
+        results = results.to_dicts()
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    logging.info(f"JSON written to {filename}")
+
+
+def write_ndjson(results, filename: Path):
+    """One JSON object per line (newline-delimited JSON)."""
+    if isinstance(results, SimulationResults):
+        columns, rounding = results.columns, results.rounding
+    else:
+        columns, rounding = results[0].keys(), {}
+    with NdjsonStreamWriter(filename, columns, rounding=rounding) as writer:
+        for row in results:
+            writer.write(row)
+
+
+class _StreamWriter:
+    """
+    Base for writers that emit rows as they arrive.  filename '-' writes
+    to stdout and flushes every row so the output can be piped live.
+    columns default to those of rounding (the class's, unless given).
+    """
+
+    rounding: Dict[str, int] = {}
+
+    def __init__(self, filename, columns=None, flush_every: Optional[int] = None,
+                 rounding: Optional[Dict[str, int]] = None):
+        if rounding is not None:
+            self.rounding = rounding
+        self.filename = filename
+        self.columns = tuple(self.rounding if columns is None else columns)
+        if str(filename) == '-':
+            self._file = sys.stdout
+            self.flush_every = 1 if flush_every is None else flush_every
+        else:
+            self._file = open(filename, 'w', newline='', encoding='utf-8')
+            self.flush_every = flush_every or 0
+        self.rows = 0
+
+    def _rounded(self, row: Dict[str, float]) -> List[float]:
+        # np.round, as in SimulationResults.rounded_columns(), so streamed and
+        # batch outputs are identical
+        return [float(np.round(row[k], self.rounding[k])) if k in self.rounding else row[k]
+                for k in self.columns]
+
+    def write(self, row: Dict[str, float]):
+        self._write(self._rounded(row))
+        self.rows += 1
+        if self.flush_every and self.rows % self.flush_every == 0:
+            self._file.flush()
+
+    def _write(self, values: List[float]):
+        raise NotImplementedError
+
+    def close(self):
+        if self._file is sys.stdout:
+            self._file.flush()
+        else:
+            self._file.close()
+            logging.info(f"{self.rows} rows streamed to {self.filename}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvStreamWriter(_StreamWriter):
+    """CSV rows written as they arrive."""
+
+    def __init__(self, filename, columns=None, flush_every: Optional[int] = None,
+                 rounding: Optional[Dict[str, int]] = None):
+        super().__init__(filename, columns, flush_every, rounding)
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(self.columns)
+
+    def _write(self, values: List[float]):
+        self._csv.writerow(values)
+
+
+class NdjsonStreamWriter(_StreamWriter):
+    """Newline-delimited JSON, one object per row."""
+
+    def _write(self, values: List[float]):
+        self._file.write(json.dumps(dict(zip(self.columns, values))) + '\n')
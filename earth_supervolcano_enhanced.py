@@ -1,466 +1,20 @@
 #!/usr/bin/env python3
 """
-earth_supervolcano_enhanced.py – Simulation of a supervolcano eruption on Earth, with oceanic fallout focus.
+earth_supervolcano_enhanced.py – compatibility entry point.
 
-This version models catastrophic volcanic events like Yellowstone or Toba:
-- Realistic caldera scaling (based on Self et al. for VEI 7–8).
-- Reduced ash lofting for wet plumes, shorter volcanic winter.
-- Methane release from permafrost thaw post-eruption.
-- Enhanced ocean mixing/acidification from ash fallout dissolution.
-- Silicate weathering for CO₂ drawdown (slower with ash blanket).
-- Ocean carbonate chemistry for pH recovery, ash spike.
-- Greenhouse feedback from CO₂/CH4/SO₂, steam from phreatomagmatic if oceanic-influenced.
-- Size-resolved ash (fine/coarse) differential settling, reduced fine in humid.
-- Omori-law aftershocks/swarm quakes triggering methane.
-- Variable time stepping for high-res early dynamics.
-- Ejecta/ash re-entry heating from ballistic fallout.
-- Biodiversity model recovering if conditions improve, marine focus (plankton rebound).
-Fixes:
-- Logarithmic saturation in temperature_drop().
-- Realistic caldera scaling (500 km at VEI 8).
-- All enhancements (ash resolution, weathering, greenhouse, Omori) kept.
-- Overflow clamped in weathering_rate().
-- Math domain error fixed in pH calc with robust H⁺ approx.
-- Added ash scale factor for physical values.
+The supervolcano simulator is earth_supervolcano/earth_supervolcano_enhanced.py.
+This file used to be an older, diverging copy of it (without GT_TO_J or the
+output writers its main() called); it now runs and re-exports that script,
+so existing commands and imports keep working:
 
-Usage examples:
-  python earth_supervolcano_enhanced.py --volume 1000 --output volcano_enhanced
-  python earth_supervolcano_enhanced.py --volume 500 --vei 7 --years 0 10000
+  python earth_supervolcano_enhanced.py --volume 1000
+  python -m earth_sims supervolcano --volume 1000      # the same
 """
 
-import argparse
-import csv
-import json
-import logging
-import math
-import sys
-from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from earth_sims import load_model
 
-import numpy as np
-from scipy.integrate import solve_ivp
-from scipy.optimize import fsolve
-
-# ----------------------------------------------------------------------
-# Physical constants
-# ----------------------------------------------------------------------
-YEAR_SECONDS = 365.25 * 24 * 3600
-SECONDS_PER_YEAR = YEAR_SECONDS
-GtC_TO_PPM = 1.0 / 2.12            # 1 GtC ≈ 0.471 ppm CO₂ (IPCC)
-
-# Earth parameters (same)
-EARTH_MASS = 5.97e24               # kg
-EARTH_RADIUS = 6.371e6             # m
-OCEAN_AREA = 3.61e14               # m²
-OCEAN_VOLUME = 1.332e9             # km³ (approx)
-OCEAN_MASS = 1.4e21                # kg
-ATMOSPHERE_MASS = 5.15e18          # kg
-MOLAR_MASS_AIR = 28.97e-3          # kg/mol
-MOLAR_MASS_CO2 = 44.01e-3          # kg/mol
-MOLAR_MASS_CH4 = 16.04e-3          # kg/mol
-
-# Volcano parameters
-VOLCANO_DENSITY = 2500.0           # kg/m³ ash/magma
-SO2_PER_KM3 = 5e6                  # Tg SO₂ per km³ erupted (typical supervolcano)
-ASH_PER_KM3 = 1e12                 # kg ash per km³ (dense rock equivalent)
-CLATHRATE_RELEASE_FACTOR_VOLC = 0.1 # fraction of warming triggering thaw (GtC)
-
-# Ash optical properties (similar to dust, but sulfate-heavy)
-EXTINCTION_CROSS_SECTION = 8.0     # m²/kg (for sulfate aerosols)
-FINE_ASH_FRACTION = 0.4            # higher fine for volcanic (plume lofting)
-COARSE_ASH_FRACTION = 1 - FINE_ASH_FRACTION
-FINE_ASH_FALLOUT_RATE = 0.4        # per year (lifetime ~2.5 years)
-COARSE_ASH_FALLOUT_RATE = 6.0      # per year (lifetime ~0.17 years)
-
-# Weathering parameters (slowed by ash blanket)
-WEATHERING_AC = 0.03
-REF_TEMP = 288.0
-WEATHERING_BASELINE = 5e-5
-WEATHERING_ACTIVATION = 0.015
-WEATHERING_CO2_HALF_SAT = 500.0
-
-# Ocean chemistry (ash dissolution adds acidity)
-BUFFER_FACTOR = 10.0
-PIC_POC_RAIN_RATIO = 0.1
-OCEAN_MIXING_RATE_VOLC = 0.3       # lower than impact
-MIXING_SCALE = 1e-3
-
-# Methane (thaw release)
-METHANE_LIFETIME_BASELINE = 10.0
-METHANE_UV_SENSITIVITY = 0.5
-
-# Seismic (eruption swarms)
-OMORI_K = 0.12
-OMORI_P = 1.05
-OMORI_C = 0.015
-
-# Baseline
-BASELINE_TEMP = 15.0
-BASELINE_CO2 = 280.0
-BASELINE_PH = 8.2
-BASELINE_BIODIVERSITY = 1.0
-BASELINE_METHANE = 700.0
-BASELINE_MAGNETOSPHERE = 1.0
-
-# ----------------------------------------------------------------------
-# Helper functions – ADAPTED FOR SUPERVOLCANO
-# ----------------------------------------------------------------------
-def eruption_energy(volume: float, density: float) -> float:
-    """Compute eruption 'energy' equivalent in Joules (magma kinetic/thermal)."""
-    mass = volume * 1e9 * density  # km³ to m³
-    # Approximate energy (thermal + explosive)
-    return 1e12 * mass  # rough scaling to GT-like
-
-def caldera_diameter(volume: float, vei: int) -> float:
-    """Realistic caldera diameter (km) based on Self et al. scaling for VEI 7–8."""
-    D = 20.0 * (volume / 100.0)**0.4  # calibrated for Toba ~100 km at 2800 km³
-    if vei >= 8:
-        D *= 1.5  # larger for super-eruptions
-    return D
-
-def ash_ejected(volume: float) -> float:
-    """Mass of ash injected (kg)."""
-    return ASH_PER_KM3 * volume
-
-def so2_released(volume: float) -> float:
-    """SO₂ mass (Tg)."""
-    return SO2_PER_KM3 * volume
-
-def solar_extinction(ash_fine: float, ash_coarse: float) -> float:
-    """Optical depth from fine ash/sulfate."""
-    tau = EXTINCTION_CROSS_SECTION * ash_fine / (2 * math.pi * EARTH_RADIUS**2)
-    return tau
-
-def temperature_drop(tau: float) -> float:
-    return -8.0 * math.log(1.0 + tau)
-
-def methane_lifetime(tau: float) -> float:
-    if tau > 10:
-        return METHANE_LIFETIME_BASELINE * METHANE_UV_SENSITIVITY
-    else:
-        return METHANE_LIFETIME_BASELINE
-
-def co2_forcing(co2_ppm: float) -> float:
-    return 5.35 * math.log(co2_ppm / BASELINE_CO2)
-
-def methane_forcing(ch4_ppb: float) -> float:
-    return 0.036 * (math.sqrt(ch4_ppb) - math.sqrt(BASELINE_METHANE))
-
-def silicate_weathering_rate(temp: float, co2: float) -> float:
-    arg = WEATHERING_AC * (temp - REF_TEMP)
-    MAX_ARG = 50.0
-    if arg > MAX_ARG:
-        temp_factor = math.exp(MAX_ARG)
-    else:
-        temp_factor = math.exp(arg)
-    co2_factor = co2 / (co2 + WEATHERING_CO2_HALF_SAT)
-    return WEATHERING_BASELINE * temp_factor * co2_factor
-
-
-# ----------------------------------------------------------------------
-# Main simulation class – RE-CREATED FOR SUPERVOLCANO
-# ----------------------------------------------------------------------
-class SupervolcanoEnhanced:
-    """
-    Simulation of supervolcano eruption, with oceanic fallout focus.
-    """
-
-    def __init__(self,
-                 volume: float = 1000.0,          # km³ erupted
-                 vei: int = 8,                    # Volcanic Explosivity Index
-                 start_year: float = 0.0,
-                 end_year: float = 10000.0,
-                 dt_initial: float = 0.01,
-                 dt_final: float = 10.0,
-                 seed: Optional[int] = None):
-        self.volume = volume
-        self.vei = vei
-        self.start_year = start_year
-        self.end_year = end_year
-        self.dt_initial = dt_initial
-        self.dt_final = dt_final
-        self.rng = np.random.default_rng(seed)
-
-        # Compute parameters
-        self.energy_J = eruption_energy(volume, VOLCANO_DENSITY)
-        self.caldera_km = caldera_diameter(volume, vei)
-        self.ash_mass_kg = ash_ejected(volume)
-        self.so2_tg = so2_released(volume)
-        self.initial_tau = solar_extinction(self.ash_mass_kg * FINE_ASH_FRACTION,
-                                            self.ash_mass_kg * COARSE_ASH_FRACTION)
-
-        # State
-        self.time = start_year
-        self.ash_fine = self.ash_mass_kg * FINE_ASH_FRACTION
-        self.ash_coarse = self.ash_mass_kg * COARSE_ASH_FRACTION
-        self.temp_anomaly = 0.0
-        self.co2_ppm = BASELINE_CO2
-        self.ocean_ph = BASELINE_PH
-        self.biodiversity = BASELINE_BIODIVERSITY
-        self.methane_ppb = BASELINE_METHANE
-        self.magnetosphere = BASELINE_MAGNETOSPHERE
-        self.subsurface_habitat = 1.0
-
-        # Ocean chemistry
-        self.ocean_dic = 2.3e-3
-        self.ocean_alk = 2.4e-3
-        self.ocean_temp = BASELINE_TEMP
-
-        # Ejecta/ash pulse
-        self.ash_pulse_triggered = False
-        self.ash_pulse_time = 0.0
-        self.ash_pulse_strength = 0.0
-        self.ash_pulse_temp_increment = 0.0
-
-        # Seismic
-        self.seismic_intensity = 1.0
-        self.last_quake_time = 0.0
-
-        # Thaw methane pool (GtC)
-        self.thaw_pool = 500.0  # permafrost/carbon release potential
-
-    def run(self) -> List[Dict[str, float]]:
-        results = []
-        t = self.start_year
-        dt = self.dt_initial
-
-        results.append(self.get_state(t))
-
-        self.apply_eruption()
-        results.append(self.get_state(t))
-
-        t += dt
-        while t <= self.end_year:
-            if t > 100:
-                dt = min(self.dt_final, dt * 1.1)
-            elif t > 10:
-                dt = min(1.0, dt * 1.2)
-
-            self.step(t, dt)
-            results.append(self.get_state(t))
-            t += dt
-
-        return results
-
-    def apply_eruption(self):
-        tau = solar_extinction(self.ash_fine, self.ash_coarse)
-        self.temp_anomaly = temperature_drop(tau)
-
-        # CO₂/SO₂/ash release
-        co2_released_gt = 0.05 * self.volume  # GtC from mantle degassing
-        co2_ppm_increment = co2_released_gt * GtC_TO_PPM
-        self.co2_ppm += co2_ppm_increment
-
-        # Methane from initial thaw
-        methane_released_gt = CLATHRATE_RELEASE_FACTOR_VOLC * (self.volume / 1000.0)
-        methane_released_ppb = methane_released_gt * 1e12 / (ATMOSPHERE_MASS * MOLAR_MASS_CH4 / MOLAR_MASS_AIR)
-        self.methane_ppb += methane_released_ppb
-        self.thaw_pool -= methane_released_gt
-
-        # Ocean ash fallout mixing
-        mixing_perturbation = OCEAN_MIXING_RATE_VOLC * (self.volume / 1000.0) * MIXING_SCALE
-        self.ocean_dic += mixing_perturbation * 0.1
-        self.ocean_alk -= mixing_perturbation * 0.05
-
-        # Biodiversity loss from ash/toxicity
-        kill_fraction = 1.0 - math.exp(-0.005 * self.volume / 1000.0)
-        self.biodiversity *= (1.0 - kill_fraction)
-
-        # Magnetosphere (minor from ionization)
-        self.magnetosphere = max(0.95, 1.0 - 0.05 * (self.volume / 1000.0))
-
-        # Ash re-entry pulse (ballistic fallout heat)
-        self.ash_pulse_triggered = True
-        self.ash_pulse_time = 0.1  # longer for volcanic plumes
-        self.ash_pulse_strength = 0.3 * self.ash_coarse
-        self.ash_pulse_temp_increment = 3.0 * (self.ash_pulse_strength / 1e15)
-
-        # Initial seismic
-        self.seismic_intensity = 1.0
-        self.last_quake_time = 0.0
-
-    def step(self, t: float, dt: float):
-        # Ash fallout
-        self.ash_fine *= math.exp(-FINE_ASH_FALLOUT_RATE * dt)
-        self.ash_coarse *= math.exp(-COARSE_ASH_FALLOUT_RATE * dt)
-
-        # Ash pulse
-        if self.ash_pulse_triggered and t >= self.ash_pulse_time:
-            self.temp_anomaly += self.ash_pulse_temp_increment
-            if self.temp_anomaly + BASELINE_TEMP > 25.0:
-                methane_release_ppb = 300.0 * 0.01 * (self.thaw_pool / 500.0)
-                self.methane_ppb += methane_release_ppb
-                self.thaw_pool -= methane_release_ppb / (1e12 / (ATMOSPHERE_MASS * MOLAR_MASS_CH4 / MOLAR_MASS_AIR))
-            self.ash_pulse_triggered = False
-
-        # Greenhouse
-        forcing_co2 = co2_forcing(self.co2_ppm)
-        forcing_ch4 = methane_forcing(self.methane_ppb)
-        total_forcing = forcing_co2 + forcing_ch4
-        temp_ghg = 0.8 * total_forcing
-
-        # Ash forcing
-        tau = solar_extinction(self.ash_fine, self.ash_coarse)
-        temp_ash = temperature_drop(tau)
-
-        target_anomaly = temp_ash + temp_ghg
-        self.temp_anomaly += (target_anomaly - self.temp_anomaly) * dt / 2.0
-
-        # Ocean chemistry
-        delta_dic = (self.ocean_dic / BUFFER_FACTOR) * math.log(max(1e-6, self.co2_ppm / BASELINE_CO2))
-        self.ocean_dic += delta_dic * dt / 100.0
-
-        if t < 1.0:
-            self.ocean_dic += OCEAN_MIXING_RATE_VOLC * dt * MIXING_SCALE
-
-        self.ocean_alk = max(1e-6, self.ocean_alk)
-        self.ocean_dic = max(1e-6, self.ocean_dic)
-
-        alk_safe = max(1e-6, self.ocean_alk)
-        dic_alk_ratio = self.ocean_dic / alk_safe
-        dic_alk_ratio = max(0.8, min(1.2, dic_alk_ratio))
-
-        h_conc_approx = (dic_alk_ratio - 1.0) * 1e-8 + 1e-8
-        h_conc = max(1e-10, h_conc_approx)
-
-        self.ocean_ph = -math.log10(h_conc)
-        self.ocean_ph = max(6.0, min(8.5, self.ocean_ph))
-
-        # Weathering
-        weathering_rate = silicate_weathering_rate(self.temp_anomaly + BASELINE_TEMP, self.co2_ppm)
-        ppm_change = -weathering_rate * GtC_TO_PPM * dt
-        self.co2_ppm += ppm_change
-
-        # Methane decay
-        lifetime = methane_lifetime(tau)
-        self.methane_ppb *= math.exp(-dt / lifetime)
-
-        # Magnetosphere recovery
-        self.magnetosphere += (1.0 - self.magnetosphere) * dt / 200.0  # slower for volcanic
-
-        # Biodiversity (with ash toxicity stress)
-        temp_stress = math.exp(-0.1 * max(0, self.temp_anomaly + BASELINE_TEMP - 2.0))
-        ph_stress = max(0, min(1, (self.ocean_ph - 6.5) / (8.2 - 6.5)))
-        ash_stress = math.exp(-0.05 * tau)
-        survival = temp_stress * ph_stress * ash_stress
-        recovery_rate = 40.0  # adjusted for volcanic ash effects
-        if survival > self.biodiversity:
-            self.biodiversity += (survival - self.biodiversity) * dt / recovery_rate
-        else:
-            self.biodiversity = survival
-        self.biodiversity = np.clip(self.biodiversity, 0.0, 1.0)
-
-        # Seismic aftershocks
-        self.seismic_intensity = 1.0 / (1.0 + OMORI_K * (t - 0.0)**OMORI_P)
-        rate = 0.1 * self.seismic_intensity
-        if self.rng.random() < rate * dt:
-            damage = 0.05 * self.seismic_intensity
-            self.subsurface_habitat *= (1.0 - damage)
-            quake_methane_ppb = 100.0 * self.seismic_intensity * (self.thaw_pool / 500.0)
-            self.methane_ppb += quake_methane_ppb
-            self.thaw_pool -= quake_methane_ppb / (1e12 / (ATMOSPHERE_MASS * MOLAR_MASS_CH4 / MOLAR_MASS_AIR))
-            self.last_quake_time = t
-        self.subsurface_habitat = np.clip(self.subsurface_habitat, 0.0, 1.0)
-
-        # Clipping
-        self.co2_ppm = max(180.0, self.co2_ppm)
-        self.methane_ppb = max(0.0, self.methane_ppb)
-        self.thaw_pool = max(0.0, self.thaw_pool)
-
-    def get_state(self, t: float) -> Dict[str, float]:
-        tau = solar_extinction(self.ash_fine, self.ash_coarse)
-        return {
-            'year': round(t, 4),
-            'temp_anomaly_c': round(self.temp_anomaly, 4),
-            'co2_ppm': round(self.co2_ppm, 2),
-            'ocean_ph': round(self.ocean_ph, 3),
-            'biodiversity_index': round(self.biodiversity, 4),
-            'methane_ppb': round(self.methane_ppb, 1),
-            'ash_optical_depth': round(tau, 4),
-            'magnetosphere_strength': round(self.magnetosphere, 4),
-            'subsurface_habitat_fraction': round(self.subsurface_habitat, 4),
-            'seismic_intensity': round(self.seismic_intensity, 4),
-        }
-
-
-# ----------------------------------------------------------------------
-# Main CLI – ADAPTED FOR SUPERVOLCANO
-# ----------------------------------------------------------------------
-def main():
-    parser = argparse.ArgumentParser(
-        description="Simulation of a supervolcano eruption and its long‑term consequences.",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog=__doc__
-    )
-    parser.add_argument('--volume', type=float, default=1000.0,
-                        help='Erupted volume (km³)')
-    parser.add_argument('--vei', type=int, default=8,
-                        help='Volcanic Explosivity Index (7-8)')
-    parser.add_argument('--years', type=float, nargs=2, default=[0, 10000],
-                        help='Start and end year (relative to eruption)')
-    parser.add_argument('--dt-initial', type=float, default=0.01,
-                        help='Initial time step (years)')
-    parser.add_argument('--dt-final', type=float, default=10.0,
-                        help='Final time step (years)')
-    parser.add_argument('--output', '-o', type=str, default='supervolcano_enhanced',
-                        help='Base name for output files (without extension)')
-    parser.add_argument('--output-dir', type=str, default='.',
-                        help='Directory to write output files')
-    parser.add_argument('--format', choices=['csv', 'html', 'json', 'all'],
-                        default='all', help='Output format(s)')
-    parser.add_argument('--seed', type=int, default=None,
-                        help='Random seed for reproducibility')
-    parser.add_argument('--verbose', '-v', action='store_true',
-                        help='Increase logging verbosity')
-    args = parser.parse_args()
-
-    logging.basicConfig(
-        level=logging.DEBUG if args.verbose else logging.INFO,
-        format='%(levelname)s: %(message)s'
-    )
-
-    out_dir = Path(args.output_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    sim = SupervolcanoEnhanced(
-        volume=args.volume,
-        vei=args.vei,
-        start_year=args.years[0],
-        end_year=args.years[1],
-        dt_initial=args.dt_initial,
-        dt_final=args.dt_final,
-        seed=args.seed
-    )
-
-    logging.info(f"Eruption 'energy': {sim.energy_J / GT_TO_J:.2f} GT equivalent")
-    logging.info(f"Caldera diameter: {sim.caldera_km:.1f} km")
-    logging.info(f"Ash mass: {sim.ash_mass_kg:.2e} kg")
-    logging.info(f"Initial optical depth: {sim.initial_tau:.3f}")
-
-    results = sim.run()
-
-    base = out_dir / args.output
-    if args.format in ('csv', 'all'):
-        write_csv(results, base.with_suffix('.csv'))
-    if args.format in ('html', 'all'):
-        write_html(results, base.with_suffix('.html'))
-    if args.format in ('json', 'all'):
-        write_json(results, base.with_suffix('.json'))
-
-    # Metadata
-    meta = {
-        'volume_km3': args.volume,
-        'vei': args.vei,
-        'energy_GT_equiv': sim.energy_J / GT_TO_J,
-        'caldera_km': sim.caldera_km,
-        'ash_mass_kg': sim.ash_mass_kg,
-        'initial_tau': sim.initial_tau,
-        'seed': args.seed,
-    }
-    with open(out_dir / f"{args.output}_metadata.json", 'w') as f:
-        json.dump(meta, f, indent=2)
-
-    logging.info("Done.")
+load_model('supervolcano')       # registers earth_sims.supervolcano
+from earth_sims.supervolcano import *  # noqa: E402,F401,F403
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,131 @@
+"""
+--integrator adaptive (both models): the step-doubling controller must
+reject and retry steps, take about ten times the steps for a hundredth of
+the tolerance (first-order steps) with a correspondingly smaller error,
+stretch its steps to millennia once the run is quiet, and agree with a
+tight implicit solve.
+
+  python -m pytest tests/test_adaptive.py
+"""
+
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+
+from earth_sims import load_model
+
+try:
+    import scipy  # noqa: F401
+except ImportError:
+    scipy = None
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+LOOSE = {'rtol': 1e-4, 'atol': 1e-6}
+REFERENCE = {'integrator': 'ivp', 'ivp_method': 'Radau', 'rtol': 1e-11, 'atol': 1e-13}
+
+
+class NoQuakes:
+    """An rng that never draws a quake, so every backend sees the same (quiet) run."""
+
+    def random(self, size=None):
+        return 1.0 if size is None else np.ones(size)
+
+
+class AdaptiveTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def quiet(self, simulation, **kwargs):
+        sim = simulation(seed=0, **kwargs)
+        sim.rng = NoQuakes()
+        return sim
+
+    def test_rejects_and_retries(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                sim = simulation(seed=0, end_year=10.0, integrator='adaptive')
+                results = sim.run()
+                stats = sim.solver_stats
+                self.assertGreater(stats['rejected'], 0)
+                # Two rows for the initial state and the event, then one per accepted step
+                self.assertEqual(stats['accepted'], len(results) - 2)
+                self.assertEqual(results['year'][-1], 10.0)
+                # A rejection retries the step with a smaller dt
+                trial = simulation._trial_step
+                calls = []
+
+                def record(self, t, dt):
+                    calls.append((t, dt))
+                    return trial(self, t, dt)
+
+                with mock.patch.object(simulation, '_trial_step', record):
+                    simulation(seed=0, end_year=10.0, integrator='adaptive').run()
+                # Each attempt is one full step and two half steps; a retry starts where
+                # the attempt before it did
+                full_steps = calls[::3]
+                retried = [(a, b) for a, b in zip(full_steps, full_steps[1:])
+                           if abs((b[0] - b[1]) - (a[0] - a[1])) < 1e-9]
+                self.assertEqual(len(retried), stats['rejected'])
+                for (_, dt), (_, retry) in retried:
+                    self.assertLess(retry, dt)
+                    self.assertGreaterEqual(retry, module.ADAPTIVE_MIN_SHRINK * dt)
+
+    def test_quiet_periods_take_long_steps(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                results = simulation(seed=0, end_year=1e5, integrator='adaptive').run()
+                years = np.asarray(results['year'])
+                steps = np.diff(years)
+                self.assertEqual(years[-1], 1e5)
+                self.assertLess(len(results), 10000)
+                # Sub-year steps through the disruptive first decade, millennia at the end
+                self.assertLess(steps[years[1:] <= 10.0].max(), 1.0)
+                self.assertGreater(np.median(steps[-4:-1]), 2e3)
+
+    @unittest.skipIf(scipy is None, "SciPy is not installed")
+    def test_tolerance_scaling(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                reference = self.quiet(simulation, end_year=20.0, **REFERENCE).run(output_times=[10.0])
+                steps, errors = [], []
+                for tolerances in (LOOSE, {'rtol': LOOSE['rtol'] / 100, 'atol': LOOSE['atol'] / 100}):
+                    sim = self.quiet(simulation, end_year=10.0, integrator='adaptive', **tolerances)
+                    results = sim.run()
+                    steps.append(sim.solver_stats['accepted'])
+                    errors.append(abs(results['temp_anomaly_c'][-1] - reference['temp_anomaly_c'][0]))
+                self.assertTrue(5.0 < steps[1] / steps[0] < 20.0, steps)
+                self.assertLess(errors[1], errors[0] / 5.0)
+                self.assertLess(errors[1], 1e-2)
+
+    @unittest.skipIf(scipy is None, "SciPy is not installed")
+    def test_agrees_with_reference(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                results = self.quiet(simulation, end_year=2000.0, integrator='adaptive').run()
+                # The last step before 1990 (the reference's grid ends just short of 2000)
+                i = int(np.searchsorted(results['year'], 1990.0)) - 1
+                reference = self.quiet(simulation, end_year=2000.0, **REFERENCE).run(
+                    output_times=[results['year'][i]])
+                self.assertAlmostEqual(results['temp_anomaly_c'][i], reference['temp_anomaly_c'][0],
+                                       delta=1e-8)
+                self.assertAlmostEqual(results['co2_ppm'][i] / reference['co2_ppm'][0], 1.0, delta=1e-9)
+                self.assertAlmostEqual(results['biodiversity_index'][i],
+                                       reference['biodiversity_index'][0], delta=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Poisson aftershocks (aftershocks='poisson', both models): sample_aftershocks()
+must draw the non-homogeneous Poisson process with rate
+0.1·omori_intensity(t), and a run must apply exactly the quakes it drew,
+whatever the integrator and step size.
+
+The statistical checks are for fixed seeds, so they cannot flake; their
+bounds (4 standard errors, the KS 0.1% critical value) leave room for any
+sampler that is right.
+
+  python -m pytest tests/test_aftershocks.py
+"""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from earth_sims import load_model
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+HORIZON = 1e4
+DRAWS = 4000
+
+
+def expected_counts(module, times):
+    """Mean number of quakes in (0, t] for each t: the integrated rate."""
+    grid = np.concatenate([[0.0], np.geomspace(1e-6, max(times), 200001)])
+    rate = 0.1 * module.omori_intensity(grid)
+    cumulative = np.concatenate([[0.0], np.cumsum(0.5 * (rate[1:] + rate[:-1]) * np.diff(grid))])
+    return np.interp(times, grid, cumulative)
+
+
+class AftershockTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def test_counts_and_times(self):
+        for model, module, _ in self.models():
+            with self.subTest(model=model):
+                draws = [module.sample_aftershocks(np.random.default_rng(seed), 0.0, HORIZON)
+                         for seed in range(DRAWS)]
+                counts = np.array([len(times) for times in draws])
+                mean = expected_counts(module, [HORIZON])[0]
+                self.assertLess(abs(counts.mean() - mean), 4 * np.sqrt(mean / DRAWS))
+                self.assertAlmostEqual(counts.var() / counts.mean(), 1.0, delta=0.1)
+                # Given their number, the times are distributed as the normalised rate
+                u = np.sort(expected_counts(module, np.concatenate(draws)) / mean)
+                n = len(u)
+                ks = max(np.max(np.arange(1, n + 1) / n - u), np.max(u - np.arange(n) / n))
+                self.assertLess(ks, 1.95 / np.sqrt(n))
+
+    def test_interval(self):
+        for model, module, _ in self.models():
+            with self.subTest(model=model):
+                start, end = 100.0, 1000.0
+                draws = [module.sample_aftershocks(np.random.default_rng(seed), start, end)
+                         for seed in range(DRAWS)]
+                for times in draws:
+                    self.assertTrue(np.all((times > start) & (times <= end)))
+                    self.assertTrue(np.all(np.diff(times) >= 0))
+                low, high = expected_counts(module, [start, end])
+                counts = np.array([len(times) for times in draws])
+                self.assertLess(abs(counts.mean() - (high - low)), 4 * np.sqrt((high - low) / DRAWS))
+                rng = np.random.default_rng(0)
+                self.assertEqual(len(module.sample_aftershocks(rng, end, start)), 0)
+                self.assertEqual(len(module.sample_aftershocks(rng, end, end)), 0)
+
+    def test_runs_apply_the_drawn_quakes(self):
+        # The quakes are drawn first, from the run's own rng, up to end_year
+        for model, module, simulation in self.models():
+            quakes = module.sample_aftershocks(np.random.default_rng(7), 0.0, HORIZON)
+            for integrator in ('euler', 'multirate', 'adaptive'):
+                with self.subTest(model=model, integrator=integrator):
+                    sim = simulation(seed=7, end_year=HORIZON, aftershocks='poisson',
+                                     integrator=integrator)
+                    results = sim.run()
+                    struck = quakes[quakes <= results['year'][-1]]
+                    habitat = np.prod(1.0 - 0.05 * module.omori_intensity(struck))
+                    self.assertAlmostEqual(results['subsurface_habitat_fraction'][-1], habitat,
+                                           delta=1e-12)
+                    self.assertEqual(sim.last_quake_time, struck[-1])
+                    self.assertEqual(sim.quake_times, quakes[len(struck):].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Baseline comparison of the benchmark suite (earth_sims.bench): compare()
+alone decides which cases regressed, and report() and the exit status
+follow it.
+
+  python -m pytest tests/test_bench.py
+"""
+
+import unittest
+
+from earth_sims import bench
+
+
+def results(**seconds):
+    return {'format_version': bench.BENCH_FORMAT_VERSION,
+            'cases': {name: {'seconds': value, 'rows_per_s': 1.0, 'peak_rss_mb': None}
+                      for name, value in seconds.items()}}
+
+
+class CompareTest(unittest.TestCase):
+
+    def test_changes_and_regressions(self):
+        changes, regressions = bench.compare(results(a=1.2, b=1.05, c=0.5, new=1.0),
+                                             results(a=1.0, b=1.0, c=1.0), threshold=0.1)
+        self.assertEqual(sorted(changes), ['a', 'b', 'c'])
+        self.assertAlmostEqual(changes['a'], 0.2)
+        self.assertAlmostEqual(changes['c'], -0.5)
+        self.assertEqual(regressions, ['a'])
+        self.assertEqual(bench.compare(results(a=1.2), results(a=1.0), threshold=0.25)[1], [])
+
+    def test_report_marks_only_regressions(self):
+        current = results(a=1.2, b=1.05, new=1.0)
+        changes, regressions = bench.compare(current, results(a=1.0, b=1.0), threshold=0.1)
+        lines = {line.split()[0]: line for line in bench.report(current, changes, regressions).splitlines()}
+        self.assertTrue(lines['a'].endswith('REGRESSION'))
+        self.assertNotIn('REGRESSION', lines['b'])
+        self.assertTrue(lines['new'].endswith('new'))
+        self.assertNotIn('vs base', bench.report(current))
+
+    def test_unsupported_baseline(self):
+        with self.assertRaises(ValueError):
+            bench.compare(results(a=1.0), {'format_version': None, 'cases': {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+Result cache (both models): cache_key() must tell apart every run that can
+produce different rows and nothing else, and ResultCache must hand back a
+finished run (rows and final state) without integrating it again, drop
+entries once the model changes, and evict the least recently used entries
+beyond max_bytes.
+
+  python -m pytest tests/test_cache.py
+"""
+
+import os
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+import earth_sims.cache
+from earth_sims import load_model
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+END_YEAR = 500.0
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def simulators(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def assert_same_results(self, a, b):
+        self.assertEqual(a.columns, b.columns)
+        for name in b.columns:
+            np.testing.assert_array_equal(a[name], b[name], err_msg=name)
+
+    def test_cache_key(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                key = simulation(seed=0).cache_key()
+                self.assertIsNone(simulation().cache_key())
+                self.assertEqual(simulation(seed=0).cache_key(), key)
+                self.assertEqual(simulation(seed=0, end_year=10000).cache_key(), key)
+                others = [
+                    simulation(seed=1).cache_key(),
+                    simulation(seed=0, end_year=END_YEAR).cache_key(),
+                    simulation(seed=0, aftershocks='poisson').cache_key(),
+                    simulation(seed=0).cache_key(output_times=[10.0, 100.0]),
+                    simulation(seed=0).cache_key(record_changes={}),
+                    simulation(seed=0).cache_key(record_changes={}, keep_recent=10),
+                    simulation(seed=0).cache_key(record_changes={'co2_ppm': 1.0}),
+                ]
+                self.assertEqual(len({key, *others}), len(others) + 1)
+
+    def test_cache_key_follows_the_model(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                key = simulation(seed=0).cache_key()
+                with mock.patch.object(module, 'OCEAN_VOLUME', module.OCEAN_VOLUME * 2):
+                    self.assertNotEqual(simulation(seed=0).cache_key(), key)
+                with mock.patch.object(module, 'model_fingerprint', lambda: 'edited'):
+                    self.assertNotEqual(simulation(seed=0).cache_key(), key)
+                self.assertEqual(simulation(seed=0).cache_key(), key)
+
+    def test_fingerprint_covers_the_shared_code(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                fingerprint = earth_sims.cache.source_fingerprint(module.__file__)
+                self.assertEqual(module.model_fingerprint(), fingerprint)
+                read_bytes = Path.read_bytes
+
+                def edited(path):       # an edit to earth_sims/cache.py only
+                    source = read_bytes(path)
+                    return source + b'# edited' if path.name == 'cache.py' else source
+
+                with mock.patch.object(Path, 'read_bytes', edited):
+                    self.assertNotEqual(earth_sims.cache.source_fingerprint(module.__file__),
+                                        fingerprint)
+                self.assertEqual(earth_sims.cache.source_fingerprint(module.__file__), fingerprint)
+
+    def test_hit_restores_the_run(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                cache = module.ResultCache(self.tmp / model)
+                computed = simulation(seed=2, end_year=END_YEAR)
+                expected = computed.run(cache=cache)
+                self.assertTrue(cache.path(simulation(seed=2, end_year=END_YEAR).cache_key()).exists())
+                restored = simulation(seed=2, end_year=END_YEAR)
+                with mock.patch.object(simulation, '_run', side_effect=AssertionError("cache miss")):
+                    self.assert_same_results(restored.run(cache=cache), expected)
+                self.assertEqual(restored.snapshot(), computed.snapshot())
+                # The restored simulator continues like the computed one
+                computed.end_year = restored.end_year = 2 * END_YEAR
+                self.assert_same_results(restored.run(), computed.run())
+
+    def test_invalidation(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                cache = module.ResultCache(self.tmp / model)
+                simulation(seed=3, end_year=END_YEAR).run(cache=cache)
+                with mock.patch.object(module, 'OCEAN_VOLUME', module.OCEAN_VOLUME * 2):
+                    sim = simulation(seed=3, end_year=END_YEAR)
+                    self.assertIsNone(cache.get(sim.cache_key()))
+                # A damaged entry is a miss too
+                key = simulation(seed=3, end_year=END_YEAR).cache_key()
+                cache.path(key).write_bytes(b'not a trajectory')
+                self.assertIsNone(cache.get(key))
+
+    def test_eviction(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                cache = module.ResultCache(self.tmp / model)
+                sims = [simulation(seed=seed, end_year=END_YEAR) for seed in range(3)]
+                keys = [sim.cache_key() for sim in sims]
+                for age, sim in enumerate(sims):
+                    sim.run(cache=cache)
+                    os.utime(cache.path(keys[age]), (age, age))
+                entry = cache.path(keys[0]).stat().st_size
+                self.assertIsNotNone(cache.get(keys[0]))     # a hit makes it the newest
+                cache.max_bytes = 2 * entry + entry // 2
+                self.assertEqual(cache.evict(), 1)
+                self.assertEqual([cache.path(key).exists() for key in keys], [True, False, True])
+                cache.max_bytes = 0
+                simulation(seed=9, end_year=END_YEAR).run(cache=cache)
+                self.assertEqual(list(cache.directory.glob('??/*.npy')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
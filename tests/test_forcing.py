@@ -0,0 +1,142 @@
+"""
+Forcing schedule (both models): forcing_schedule() must reproduce the time
+grid, fallout fractions and swarm intensity of the original step-by-step
+run() loop, the runs must step on its times, and its lru_cache must key on
+the fallout rates as well as the grid, so a changed rate is never served a
+stale schedule.
+
+  python -m pytest tests/test_forcing.py
+"""
+
+import math
+import unittest
+import warnings
+
+import numpy as np
+
+from earth_sims import load_model
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+# Fine and coarse fallout rates of each model's aerosol
+RATES = {
+    'asteroid': ('FINE_DUST_FALLOUT_RATE', 'COARSE_DUST_FALLOUT_RATE'),
+    'supervolcano': ('FINE_ASH_FALLOUT_RATE', 'COARSE_ASH_FALLOUT_RATE'),
+}
+# (start_year, end_year, dt_initial, dt_final)
+GRIDS = [(0.0, 500.0, 0.01, 10.0), (0.0, 2000.0, 0.001, 1.0), (0.0, 50.0, 0.1, 10.0)]
+
+
+def step_by_step(module, start_year, end_year, dt_initial, dt_final, fine_rate, coarse_rate):
+    """The forcing as the original run() loop produced it, one step at a time."""
+    rows = []
+    fine = coarse = 1.0
+    t, dt = start_year, dt_initial
+    t += dt
+    while t <= end_year:
+        if t > 100:
+            dt = min(dt_final, dt * 1.1)
+        elif t > 10:
+            dt = min(1.0, dt * 1.2)
+        fine *= math.exp(-fine_rate * dt)
+        coarse *= math.exp(-coarse_rate * dt)
+        rows.append((t, dt, fine, coarse, 1.0 / (1.0 + module.OMORI_K * t**module.OMORI_P)))
+        t += dt
+    return [np.array(column) for column in zip(*rows)]
+
+
+class ForcingScheduleTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            rates = tuple(getattr(module, rate) for rate in RATES[model])
+            yield model, module, getattr(module, name), rates
+
+    def test_reproduces_the_step_by_step_loop(self):
+        for model, module, simulation, rates in self.models():
+            for grid in GRIDS:
+                with self.subTest(model=model, grid=grid):
+                    schedule = module.forcing_schedule(*grid, *rates)
+                    times, dts, fine, coarse, intensity = step_by_step(module, *grid, *rates)
+                    # The grid is the same float arithmetic, so it matches exactly
+                    np.testing.assert_array_equal(schedule.times, times)
+                    np.testing.assert_array_equal(schedule.dts, dts)
+                    np.testing.assert_allclose(schedule.fine_fraction, fine, rtol=1e-12, atol=0.0)
+                    np.testing.assert_allclose(schedule.coarse_fraction, coarse, rtol=1e-12, atol=1e-300)
+                    np.testing.assert_allclose(schedule.seismic_intensity, intensity, rtol=1e-14)
+                    # The blocks agree with the concatenated arrays, and both with the generator
+                    for blocks in (schedule.blocks(block=100),
+                                   module.forcing_blocks(*grid, *rates, block=100)):
+                        columns = [np.concatenate(c) for c in zip(*blocks)]
+                        for column, stored in zip(columns, (schedule.times, schedule.dts,
+                                                            schedule.fine_fraction,
+                                                            schedule.coarse_fraction,
+                                                            schedule.seismic_intensity)):
+                            np.testing.assert_array_equal(column, stored)
+                    self.assertFalse(schedule.times.flags.writeable)
+                    self.assertFalse(schedule.fine_fraction.flags.writeable)
+
+    def test_continues_from_a_position(self):
+        for model, module, simulation, rates in self.models():
+            with self.subTest(model=model):
+                grid = GRIDS[0]
+                full = module.forcing_schedule(*grid, *rates)
+                k = len(full) // 3
+                position = (full.times[k], full.dts[k], full.fine_fraction[k], full.coarse_fraction[k])
+                rest = module.forcing_schedule(*grid, *rates, position)
+                np.testing.assert_array_equal(rest.times, full.times[k + 1:])
+                np.testing.assert_array_equal(rest.dts, full.dts[k + 1:])
+                np.testing.assert_array_equal(rest.fine_fraction, full.fine_fraction[k + 1:])
+                np.testing.assert_array_equal(rest.coarse_fraction, full.coarse_fraction[k + 1:])
+
+    def test_runs_step_on_the_schedule(self):
+        for model, module, simulation, rates in self.models():
+            with self.subTest(model=model):
+                sim = simulation(seed=0, end_year=500.0)
+                results = sim.run()
+                times, dts, *_ = step_by_step(module, sim.start_year, 500.0, sim.dt_initial,
+                                              sim.dt_final, *rates)
+                # The initial state and the event come first
+                np.testing.assert_array_equal(results['year'][2:], times)
+
+    def test_cache_key_includes_the_fallout_rates(self):
+        for model, module, simulation, (fine_rate, coarse_rate) in self.models():
+            with self.subTest(model=model):
+                grid = GRIDS[0]
+                schedule = module.forcing_schedule(*grid, fine_rate, coarse_rate)
+                hits = module.forcing_schedule.cache_info().hits
+                self.assertIs(module.forcing_schedule(*grid, fine_rate, coarse_rate), schedule)
+                self.assertEqual(module.forcing_schedule.cache_info().hits, hits + 1)
+                for rates in ((2.0 * fine_rate, coarse_rate), (fine_rate, 2.0 * coarse_rate)):
+                    other = module.forcing_schedule(*grid, *rates)
+                    self.assertIsNot(other, schedule)
+                    np.testing.assert_array_equal(other.times, schedule.times)
+                    self.assertFalse(np.array_equal(other.fine_fraction, schedule.fine_fraction)
+                                     and np.array_equal(other.coarse_fraction,
+                                                        schedule.coarse_fraction))
+                # A simulator picks up a changed module rate instead of the cached schedule
+                sim = simulation(seed=0, end_year=500.0)
+                cached = sim.forcing_schedule()
+                self.assertIs(sim.forcing_schedule(), cached)
+                name = RATES[model][0]
+                setattr(module, name, 2.0 * fine_rate)
+                self.addCleanup(setattr, module, name, fine_rate)
+                changed = sim.forcing_schedule()
+                self.assertIsNot(changed, cached)
+                np.testing.assert_array_equal(changed.times, cached.times)
+                np.testing.assert_allclose(changed.fine_fraction, step_by_step(
+                    module, sim.start_year, 500.0, sim.dt_initial, sim.dt_final,
+                    2.0 * fine_rate, coarse_rate)[2], rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
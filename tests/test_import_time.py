@@ -0,0 +1,84 @@
+"""
+Start-up cost of the simulators.  Pipelines launch thousands of short
+runs, so importing a simulator must stay cheap: beyond NumPy, it loads only
+the standard library and earth_sims, and nothing heavy until a code path
+needs it (SciPy for --integrator ivp and --steady-state, Numba for --jit,
+the process pool for --sweep).  Wall time depends on the machine, so the
+time budget is only checked when EARTH_SIMS_IMPORT_BUDGET (seconds) is set.
+
+  python -m pytest tests/test_import_time.py
+  EARTH_SIMS_IMPORT_BUDGET=0.5 python -m unittest tests.test_import_time
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Seconds allowed to import one simulator once NumPy is loaded (best of
+# REPEAT), if set
+IMPORT_BUDGET = os.environ.get('EARTH_SIMS_IMPORT_BUDGET')
+REPEAT = 3
+
+# Modules a plain import must not load
+DEFERRED = ('scipy', 'numba', 'concurrent.futures')
+
+PROBE = """
+import sys
+import time
+import numpy
+before = set(sys.modules)
+start = time.perf_counter()
+from earth_sims import load_model
+load_model(sys.argv[1])
+print(time.perf_counter() - start)
+print(' '.join(sorted(set(sys.modules) - before)))
+"""
+
+
+def probe(model: str):
+    """(seconds to import model in a fresh interpreter, modules the import added)"""
+    out = subprocess.run([sys.executable, '-c', PROBE, model], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout.splitlines()
+    return float(out[0]), set(out[1].split()) if len(out) > 1 else set()
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    def test_heavy_imports_are_deferred(self):
+        for model in ('asteroid', 'supervolcano'):
+            with self.subTest(model=model):
+                added = probe(model)[1]
+                self.assertIn(f'earth_sims.{model}', added)
+                self.assertEqual(sorted(name for name in added if name.startswith(DEFERRED)), [])
+                # Only the standard library and earth_sims itself besides NumPy
+                others = {name.split('.')[0] for name in added} - set(sys.stdlib_module_names)
+                self.assertLessEqual(others, {'earth_sims', 'numpy'})
+
+    @unittest.skipIf(IMPORT_BUDGET is None, "EARTH_SIMS_IMPORT_BUDGET is not set")
+    def test_import_budget(self):
+        budget = float(IMPORT_BUDGET)
+        for model in ('asteroid', 'supervolcano'):
+            with self.subTest(model=model):
+                best = min(probe(model)[0] for _ in range(REPEAT))
+                self.assertLess(best, budget,
+                                f"importing {model} took {best:.3f} s (budget {budget:g} s)")
+
+    def test_shim_is_the_maintained_script(self):
+        out = subprocess.run([sys.executable, '-c', 'import earth_supervolcano_enhanced as m, sys; '
+                              'model = sys.modules["earth_sims.supervolcano"]; '
+                              'print(model.__file__); print(m.GT_TO_J == model.GT_TO_J, '
+                              'm.SupervolcanoEnhanced is model.SupervolcanoEnhanced, m.main is model.main)'],
+                             cwd=ROOT, check=True, capture_output=True, text=True).stdout.split()
+        self.assertEqual(Path(out[0]), ROOT / 'earth_supervolcano' / 'earth_supervolcano_enhanced.py')
+        self.assertEqual(out[1:], ['True'] * 3)
+        usage = subprocess.run([sys.executable, 'earth_supervolcano_enhanced.py', '--help'],
+                               cwd=ROOT, check=True, capture_output=True, text=True).stdout
+        self.assertIn('--volume', usage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+--integrator ivp (both models, earth_sims.ivp): the solve_ivp backend must
+agree with a tight Radau solve and a small-dt Euler run, break at the
+ejecta/ash pulse and locate the methane threshold crossing, and its
+DenseTrajectory must evaluate the state between the solver's steps.
+
+  python -m pytest tests/test_ivp.py
+"""
+
+import math
+import unittest
+import warnings
+
+import numpy as np
+
+from earth_sims import load_model
+from earth_sims.ivp import DenseTrajectory, co2_floor_event, temperature_threshold_event
+
+try:
+    from scipy.integrate import solve_ivp
+except ImportError:
+    solve_ivp = None
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+# Method that applies the initial event, and the attribute prefix of its pulse
+EVENTS = {
+    'asteroid': ('apply_impact', 'ejecta_pulse', 'dust_mass_kg'),
+    'supervolcano': ('apply_eruption', 'ash_pulse', 'ash_mass_kg'),
+}
+END_YEAR = 2000.0
+
+
+@unittest.skipIf(solve_ivp is None, "SciPy is not installed")
+class IvpTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def test_agrees_with_references(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                # Compared near END_YEAR, at a row of the small-dt Euler run
+                euler = simulation(seed=0, end_year=END_YEAR, dt_final=0.05).run()
+                i = int(np.searchsorted(euler['year'], END_YEAR - 10.0))
+                times = [euler['year'][i]]
+                ivp = simulation(seed=0, end_year=END_YEAR, integrator='ivp').run(output_times=times)
+                radau = simulation(seed=0, end_year=END_YEAR, integrator='ivp', ivp_method='Radau',
+                                   rtol=1e-10, atol=1e-12).run(output_times=times)
+                self.assertEqual(list(ivp['year']), times)
+                self.assertAlmostEqual(ivp['temp_anomaly_c'][0], radau['temp_anomaly_c'][0], delta=1e-9)
+                self.assertAlmostEqual(ivp['co2_ppm'][0] / radau['co2_ppm'][0], 1.0, delta=1e-9)
+                self.assertAlmostEqual(euler['temp_anomaly_c'][i], radau['temp_anomaly_c'][0], delta=5e-9)
+                self.assertAlmostEqual(euler['co2_ppm'][i] / radau['co2_ppm'][0], 1.0, delta=1e-9)
+
+    def test_pulse_breaks_the_solve(self):
+        for model, module, simulation in self.models():
+            apply, pulse, _ = EVENTS[model]
+            with self.subTest(model=model):
+                sim = simulation(seed=0, end_year=END_YEAR, integrator='ivp')
+                getattr(sim, apply)()
+                at = getattr(sim, f'{pulse}_time')
+                increment = getattr(sim, f'{pulse}_temp_increment')
+                trajectory = sim.integrate_ivp()
+                self.assertIn(at, trajectory.starts)
+                self.assertFalse(getattr(sim, f'{pulse}_triggered'))
+                (temp_before, temp_after), _, (ch4_before, ch4_after) = trajectory([at - 1e-9, at])[0][:3]
+                self.assertAlmostEqual(temp_after - temp_before, increment, delta=1e-6)
+                if temp_after + module.BASELINE_TEMP > module.PULSE_METHANE_THRESHOLD:
+                    self.assertGreater(ch4_after, ch4_before)
+                else:
+                    self.assertAlmostEqual(ch4_after, ch4_before, delta=1e-6)
+
+    def test_methane_threshold_event(self):
+        for model, module, simulation in self.models():
+            _, _, aerosol = EVENTS[model]
+            with self.subTest(model=model):
+                # No aerosol and a CO₂ level that warms the surface through the threshold
+                sim = simulation(seed=0, end_year=50.0, integrator='ivp')
+                setattr(sim, aerosol, 0.0)
+                sim.co2_ppm, sim.temp_anomaly = 20000.0, 0.0
+                trajectory = sim.integrate_ivp()
+                threshold = module.PULSE_METHANE_THRESHOLD - module.BASELINE_TEMP
+                self.assertEqual(len(trajectory.threshold_crossings), 1)
+                crossing = trajectory.threshold_crossings[0]
+                temp = trajectory([crossing - 1e-3, crossing, crossing + 1e-3])[0][0]
+                self.assertAlmostEqual(temp[1], threshold, delta=1e-6)
+                self.assertLess(temp[0], threshold)
+                self.assertGreater(temp[2], threshold)
+                grid = np.linspace(0.0, 50.0, 5001)
+                first = grid[np.argmax(trajectory(grid)[0][0] > threshold)]
+                self.assertTrue(first - 0.01 < crossing <= first)
+
+    def test_output_times_on_the_dense_solution(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                full = simulation(seed=0, end_year=END_YEAR, integrator='ivp')
+                rows = full.run()
+                on_grid = [rows['year'][i] for i in (500, 900, 1200)]
+                sim = simulation(seed=0, end_year=END_YEAR, integrator='ivp')
+                sampled = sim.run(output_times=on_grid + [1234.5])
+                self.assertEqual(list(sampled['year']), on_grid + [1234.5])
+                for name in rows.columns:
+                    np.testing.assert_array_equal(sampled[name][:3], rows[name][[500, 900, 1200]],
+                                                  err_msg=name)
+                # The simulator ends where the full run does
+                self.assertEqual(sim.snapshot(), full.snapshot())
+
+
+@unittest.skipIf(solve_ivp is None, "SciPy is not installed")
+class DenseTrajectoryTest(unittest.TestCase):
+
+    def decay(self):
+        """y' = -y from 1 over [0, 1), halved at t=1, on to 3: two segments."""
+        trajectory = DenseTrajectory()
+        first = solve_ivp(lambda t, y: -y, (0.0, 1.0), [1.0, 2.0], rtol=1e-10, atol=1e-12,
+                          dense_output=True, events=[temperature_threshold_event(1.0, 0.0)])
+        trajectory.add(0.0, first, 1.0)
+        second = solve_ivp(lambda t, y: -y, (1.0, 3.0), first.y[:, -1] / 2.0, rtol=1e-10, atol=1e-12,
+                           dense_output=True, events=[temperature_threshold_event(1.0, 0.0)])
+        trajectory.add(1.0, second, 0.5)
+        return trajectory, first, second
+
+    def test_interpolates_between_steps(self):
+        trajectory, first, second = self.decay()
+        steps = np.concatenate([first.t, second.t[1:]])
+        between = (steps[:-1] + steps[1:]) / 2.0
+        y, habitat = trajectory(between)
+        expected = np.exp(-between) * np.where(between < 1.0, 1.0, 0.5)
+        np.testing.assert_allclose(y[0], expected, rtol=1e-8)
+        np.testing.assert_allclose(y[1], 2.0 * expected, rtol=1e-8)
+        np.testing.assert_array_equal(habitat, np.where(between < 1.0, 1.0, 0.5))
+
+    def test_breaks_and_stats(self):
+        trajectory, first, second = self.decay()
+        # A time on the break sees the state after the jump
+        y, habitat = trajectory([1.0])
+        self.assertAlmostEqual(y[0, 0], math.exp(-1.0) / 2.0, delta=1e-9)
+        self.assertEqual(habitat[0], 0.5)
+        # Times before the first segment or past the last are extrapolated from the ends
+        self.assertEqual(trajectory([-0.5, 3.0])[1].tolist(), [1.0, 0.5])
+        self.assertEqual(trajectory.stats(), {
+            'nfev': first.nfev + second.nfev,
+            'njev': first.njev + second.njev,
+            'steps': len(first.t) + len(second.t) - 2,
+            'segments': 2,
+        })
+        self.assertEqual(trajectory.threshold_crossings, [])
+
+    def test_events(self):
+        event = temperature_threshold_event(30.0, 15.0)
+        self.assertEqual((event(0.0, [15.0, 400.0]), event.direction), (0.0, 1.0))
+        self.assertEqual(co2_floor_event(0.0, [0.0, 200.0]), 20.0)
+        self.assertTrue(co2_floor_event.terminal)
+        self.assertEqual(co2_floor_event.direction, -1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
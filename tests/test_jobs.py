@@ -0,0 +1,163 @@
+"""
+The asyncio job manager (earth_sims.jobs): a job must stream exactly the
+rows of its run, publish its progress, stop at a cancel with a checkpoint
+that a retry continues from, be retried after a failed attempt, and hold
+submit() back once max_pending jobs are queued.
+
+Most tests run the jobs on threads (processes=False); one goes through the
+worker processes and the manager process that carry progress and
+cancellation.
+
+  python -m pytest tests/test_jobs.py
+"""
+
+import asyncio
+import json
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from earth_sims import jobs, load_model
+
+END_YEAR = 1000.0
+LONG_YEAR = 5e4         # long enough to be cancelled part way
+run_job = jobs.run_job
+
+
+def read_ndjson(path) -> dict:
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    return {name: np.array([row[name] for row in rows]) for name in rows[0]}
+
+
+class JobManagerTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.module = load_model('asteroid')
+
+    def manager(self, **options) -> jobs.JobManager:
+        options = {'max_concurrent': 1, 'out_dir': self.tmp, 'processes': False,
+                   'progress_interval': 0.02, **options}
+        return jobs.JobManager(**options)
+
+    def expected(self, params) -> dict:
+        results = self.module.AsteroidImpactEnhanced(**params).run()
+        return {name: np.array(values) for name, values in results.rounded_columns().items()}
+
+    def assert_rows(self, actual, expected):
+        for name, values in expected.items():
+            np.testing.assert_array_equal(actual[name], values, err_msg=name)
+
+    async def test_run_and_progress(self):
+        params = {'seed': 0, 'end_year': END_YEAR}
+        async with self.manager() as manager:
+            job = await manager.submit('asteroid', params)
+            events = [event async for event in manager.events(job.id)]
+            status = await job.wait()
+        self.assertEqual([events[0]['state'], events[-1]['state']], ['queued', 'done'])
+        self.assertIn('running', [event['state'] for event in events])
+        fractions = [event['fraction'] for event in events]
+        self.assertEqual(fractions, sorted(fractions))
+        self.assertEqual((status['fraction'], status['eta_seconds']), (1.0, 0.0))
+        path, = status['paths']
+        self.assert_rows(read_ndjson(path), self.expected(params))
+        self.assertEqual(status['rows'], len(self.expected(params)['year']))
+
+    async def test_bad_submissions(self):
+        async with self.manager() as manager:
+            with self.assertRaises(ValueError):
+                await manager.submit('meteor', {})
+            with self.assertRaises(TypeError):
+                await manager.submit('asteroid', {'colour': 'red'})
+            self.assertEqual(manager.jobs, {})
+
+    async def test_cancel_and_retry(self):
+        params = {'seed': 1, 'end_year': LONG_YEAR}
+        async with self.manager(checkpoint_every=1000.0) as manager:
+            job = await manager.submit('asteroid', params)
+            async for event in manager.events(job.id):
+                if event['state'] == 'running' and event['year'] > 1000.0:
+                    self.assertTrue(manager.cancel(job.id))
+            self.assertEqual(job.state, 'cancelled')
+            self.assertFalse(manager.cancel(job.id))
+            self.assertLess(job.year, LONG_YEAR)
+            first, = job.written
+            checkpoint = self.module.AsteroidImpactEnhanced.load_snapshot(
+                self.tmp / f"{job.name}_checkpoint.json")
+            await manager.retry(job.id)
+            status = await job.wait()
+        self.assertEqual((status['state'], status['attempt']), ('done', 2))
+        second = next(path for path in status['paths'] if path != first)
+        self.assertTrue(second.endswith(f"_from_{int(checkpoint.time)}.ndjson"))
+        # The retry continues at the checkpoint; its rows follow those before it
+        before, after = read_ndjson(first), read_ndjson(second)
+        kept = before['year'] <= checkpoint.time
+        self.assert_rows({name: np.concatenate([before[name][kept], after[name]]) for name in after},
+                         self.expected(params))
+
+    async def test_retry_after_failure(self):
+        params = {'seed': 2, 'end_year': END_YEAR}
+        attempts = [RuntimeError("worker lost"), run_job]
+
+        def flaky_run_job(*args):
+            attempt = attempts.pop(0)
+            if isinstance(attempt, Exception):
+                raise attempt
+            return attempt(*args)
+
+        with mock.patch.object(jobs, 'run_job', flaky_run_job):
+            async with self.manager() as manager:
+                job = await manager.submit('asteroid', params)
+                states = [event['state'] async for event in manager.events(job.id)]
+                status = await job.wait()
+            self.assertIn('retrying', states)
+            self.assertEqual((status['state'], status['attempt'], status['error']), ('done', 2, None))
+            self.assert_rows(read_ndjson(status['paths'][0]), self.expected(params))
+
+            attempts[:] = [RuntimeError("worker lost")]
+            async with self.manager(retries=0) as manager:
+                job = await manager.submit('asteroid', params, name='failing')
+                status = await job.wait()
+                self.assertEqual(status['state'], 'failed')
+                self.assertEqual(status['error'], "RuntimeError: worker lost")
+                attempts[:] = [run_job]
+                await manager.retry(job.id)
+                self.assertEqual((await job.wait())['state'], 'done')
+                with self.assertRaises(ValueError):
+                    await manager.retry(job.id)
+
+    async def test_backpressure(self):
+        async with self.manager(max_pending=1) as manager:
+            running = await manager.submit('asteroid', {'seed': 3, 'end_year': LONG_YEAR})
+            queued = await manager.submit('asteroid', {'seed': 4, 'end_year': END_YEAR})
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(manager.submit('asteroid', {'seed': 5}), 0.2)
+            waited = manager.jobs[2]
+            self.assertEqual(waited.state, 'cancelled')
+            self.assertTrue(manager.cancel(queued.id))
+            self.assertTrue(manager.cancel(running.id))
+            self.assertEqual((await running.wait())['state'], 'cancelled')
+        self.assertEqual(queued.attempt, 0)
+
+    async def test_worker_processes(self):
+        params = {'seed': 6, 'end_year': END_YEAR}
+        async with self.manager(processes=True) as manager:
+            job = await manager.submit('asteroid', params)
+            status = await job.wait()
+        self.assertEqual(status['state'], 'done')
+        self.assert_rows(read_ndjson(status['paths'][0]), self.expected(params))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+--integrator multirate (both models): runs whose slow variables take
+macro steps (_slow_step()) over sub-cycled fast processes must match the
+single-rate Euler run on the same grid once the transient has passed, and
+no macro step may span more than dt_slow, or MULTIRATE_SLOW_FRACTION of
+the time since the start, plus one fast step.  A macro step integrates
+its relaxations exactly, so splitting it changes nothing.
+
+  python -m pytest tests/test_multirate.py
+"""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from earth_sims import load_model
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+END_YEAR = 1e4
+DT_FINAL = 1.0
+# Largest difference from the single-rate run after the first millennium
+# (ocean pH: DIC grows exactly in the macro step, Euler steps it linearly)
+TOLERANCES = {
+    'temp_anomaly_c': 1e-7,
+    'co2_ppm': 1e-7,
+    'ocean_ph': 2e-3,
+    'biodiversity_index': 2e-4,
+    'methane_ppb': 1e-12,
+}
+
+
+class MultirateTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def test_matches_single_rate(self):
+        for model, module, simulation in self.models():
+            single = simulation(seed=0, end_year=END_YEAR, dt_final=DT_FINAL).run()
+            for dt_slow in (module.MULTIRATE_DT_SLOW, 200.0):
+                with self.subTest(model=model, dt_slow=dt_slow):
+                    multi = simulation(seed=0, end_year=END_YEAR, dt_final=DT_FINAL,
+                                       integrator='multirate', dt_slow=dt_slow).run()
+                    self.assertLess(len(multi), len(single) // 50)
+                    # Every macro step ends on a row of the single-rate grid
+                    years = np.asarray(multi['year'])[2:]
+                    rows = np.searchsorted(single['year'], years)
+                    np.testing.assert_array_equal(single['year'][rows], years)
+                    late = years > 1000.0
+                    for name, tolerance in TOLERANCES.items():
+                        np.testing.assert_allclose(multi[name][2:][late], single[name][rows][late],
+                                                   rtol=0.0, atol=tolerance, err_msg=name)
+                    self.assertEqual(multi['year'][-1], single['year'][-1])
+
+    def test_macro_step_bound(self):
+        for model, module, simulation in self.models():
+            for dt_slow in (module.MULTIRATE_DT_SLOW, 200.0, 50.0):
+                with self.subTest(model=model, dt_slow=dt_slow):
+                    sim = simulation(seed=0, end_year=END_YEAR, dt_final=DT_FINAL,
+                                     integrator='multirate', dt_slow=dt_slow)
+                    years = np.asarray(sim.run()['year'])[1:]
+                    spans = np.diff(years)
+                    # A macro step ends on the first fast step reaching its bound
+                    bound = np.minimum(dt_slow, module.MULTIRATE_SLOW_FRACTION * years[1:])
+                    self.assertTrue(np.all(spans < bound + DT_FINAL))
+                    self.assertLessEqual(spans.max(), dt_slow + DT_FINAL)
+                    if module.MULTIRATE_SLOW_FRACTION * END_YEAR > 2 * dt_slow:
+                        self.assertGreaterEqual(spans.max(), dt_slow)
+
+    def test_slow_step_is_exact_in_span(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                whole, halves = (simulation(seed=0, carbonate='equilibrium') for _ in range(2))
+                for sim in (whole, halves):
+                    sim.co2_ppm = 1000.0
+                    sim.temp_anomaly = 0.0
+                # The supervolcano's macro step also takes the mixing and optical depth
+                extra = () if model == 'asteroid' else (0.0, 0.0)
+                whole._slow_step(400.0, 0.0, *extra)
+                halves._slow_step(200.0, 0.0, *extra)
+                halves._slow_step(200.0, 0.0, *extra)
+                for name in ('ocean_dic', 'ocean_ph', 'magnetosphere', 'biodiversity'):
+                    self.assertAlmostEqual(getattr(halves, name), getattr(whole, name), delta=1e-12,
+                                           msg=name)
+                # The drawdown integrated over the sub-cycle comes off CO₂ in one go
+                whole._slow_step(0.0, 10.0, *extra)
+                self.assertAlmostEqual(whole.co2_ppm, 1000.0 - 10.0 * module.GtC_TO_PPM, delta=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
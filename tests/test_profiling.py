@@ -0,0 +1,98 @@
+"""
+--profile (earth_sims.profiling, both models): Profiler.instrument() must
+put the simulator's own methods back after the block, also when the run
+raises, and a profiled run must give exactly the rows of an unprofiled one.
+
+  python -m pytest tests/test_profiling.py
+"""
+
+import unittest
+import warnings
+from unittest import mock
+
+import numpy as np
+
+from earth_sims import load_model
+
+try:
+    import scipy  # noqa: F401
+except ImportError:
+    scipy = None
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+END_YEAR = 1000.0
+INTEGRATORS = ('euler', 'multirate', 'adaptive') + (('ivp',) if scipy is not None else ())
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def methods(self, module, simulation):
+        return {method: vars(simulation)[method]
+                for methods in module.PROFILE_SECTIONS.values() for method in methods}
+
+    def test_same_results(self):
+        for model, module, simulation in self.models():
+            for integrator in INTEGRATORS:
+                with self.subTest(model=model, integrator=integrator):
+                    end_year = 20.0 if integrator == 'adaptive' else END_YEAR
+                    expected = simulation(seed=0, end_year=end_year, integrator=integrator).run()
+                    profiler = module.Profiler()
+                    sim = simulation(seed=0, end_year=end_year, integrator=integrator)
+                    with profiler.instrument(), profiler.section('run'):
+                        results = sim.run()
+                    for name in expected.columns:
+                        np.testing.assert_array_equal(results[name], expected[name], err_msg=name)
+                    sections = profiler.report()['sections']
+                    self.assertGreater(sections['run']['seconds'], 0.0)
+                    self.assertIn('other', sections)
+                    self.assertGreater(sections['get_state']['calls'], 0)
+                    self.assertIn('get_state', profiler.table())
+
+    def test_restores_the_methods(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                before = self.methods(module, simulation)
+                profiler = module.Profiler()
+                self.assertIs(profiler.simulator, simulation)
+                with profiler.instrument():
+                    for method, function in before.items():
+                        self.assertIsNot(vars(simulation)[method], function, method)
+                    simulation(seed=0, end_year=END_YEAR).run()
+                self.assertEqual(self.methods(module, simulation), before)
+
+    def test_restores_the_methods_when_the_run_raises(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                with mock.patch.object(simulation, '_greenhouse', side_effect=RuntimeError('boom')):
+                    before = self.methods(module, simulation)
+                    profiler = module.Profiler()
+                    with self.assertRaisesRegex(RuntimeError, 'boom'):
+                        with profiler.instrument():
+                            simulation(seed=0, end_year=END_YEAR).run()
+                    self.assertEqual(self.methods(module, simulation), before)
+                    self.assertEqual(profiler.sections['greenhouse'][1], 1)
+                # An unknown method leaves the ones already wrapped restored
+                profiler = module.Profiler()
+                profiler.submodels = {**module.PROFILE_SECTIONS, 'missing': ('_no_such_method',)}
+                before = self.methods(module, simulation)
+                with self.assertRaises(KeyError), profiler.instrument():
+                    pass
+                self.assertEqual(self.methods(module, simulation), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
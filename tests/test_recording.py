@@ -0,0 +1,138 @@
+"""
+Recording policies of run(), which reduce the trajectory while it is
+produced and must give what reducing the full trajectory gives, on every
+integrator path and across continuations: --output-times resamples it, and
+--record-changes keeps a row only when the state has moved (ChangeRecorder),
+plus the last --keep-recent rows in full.
+
+  python -m pytest tests/test_recording.py
+"""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from earth_sims import load_model
+
+try:
+    import numba  # noqa: F401
+except ImportError:
+    numba = None
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+END_YEAR = 3000.0
+# Requested years: the start (the state after the event), steps and
+# points between steps, the end of the run and years past it
+TIMES = np.unique(np.concatenate([[0.0, 0.005, 1.0, 1.0001, 37.5], np.linspace(0.0, 4000.0, 81)]))
+
+
+class RecordingTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def assert_same(self, a, b):
+        self.assertEqual(a.columns, b.columns)
+        self.assertEqual(len(a), len(b))
+        for name in a.columns:
+            np.testing.assert_array_equal(b[name], a[name], err_msg=name)
+
+    def assert_output_times(self, model: str, **kwargs):
+        module = load_model(model)
+        simulation = getattr(module, SIMULATORS[model])
+        full = simulation(seed=3, end_year=END_YEAR, **kwargs).run()
+        sampled = simulation(seed=3, end_year=END_YEAR, **kwargs).run(output_times=TIMES)
+        self.assert_same(module.resample_results(full, TIMES), sampled)
+        self.assertEqual(sampled['year'].tolist(), [t for t in TIMES.tolist() if t <= full['year'][-1]])
+
+    def test_output_times(self):
+        for model in SIMULATORS:
+            for options in ({}, {'aftershocks': 'poisson'}, {'integrator': 'multirate'}):
+                with self.subTest(model=model, **options):
+                    self.assert_output_times(model, **options)
+
+    @unittest.skipIf(numba is None, "Numba is not installed")
+    def test_output_times_jit_blocks(self):
+        for model in SIMULATORS:
+            module = load_model(model)
+            for block in (module.COMPILED_BLOCK_STEPS, 7, 1):
+                with self.subTest(model=model, block=block):
+                    self.patch(module, 'COMPILED_BLOCK_STEPS', block)
+                    self.assert_output_times(model, jit=True)
+
+    def test_output_times_continuation(self):
+        for model in SIMULATORS:
+            module = load_model(model)
+            simulation = getattr(module, SIMULATORS[model])
+            with self.subTest(model=model):
+                full = simulation(seed=4, end_year=2 * END_YEAR).run()
+                sim = simulation(seed=4, end_year=END_YEAR)
+                first = sim.run(output_times=TIMES)
+                sim.end_year = 2 * END_YEAR
+                rest = sim.run(output_times=TIMES)
+                expected = module.resample_results(full, TIMES)
+                self.assertEqual(first['year'].tolist() + rest['year'].tolist(), expected['year'].tolist())
+                for name in expected.columns:
+                    np.testing.assert_array_equal(np.concatenate([first[name], rest[name]]),
+                                                  expected[name], err_msg=name)
+
+    def assert_record_changes(self, model: str, tolerances, keep_recent: int, **kwargs):
+        module = load_model(model)
+        simulation = getattr(module, SIMULATORS[model])
+        full = simulation(seed=3, end_year=END_YEAR, **kwargs).run()
+        recorded = simulation(seed=3, end_year=END_YEAR, **kwargs).run(record_changes=tolerances,
+                                                                      keep_recent=keep_recent)
+        rows = zip(*(full[name].tolist() for name in module.STATE_COLUMNS))
+        kept = list(module.changed_rows(rows, tolerances))
+        if keep_recent:
+            # The decimated history up to the recent steps, then all of them
+            recent = len(full) - keep_recent
+            kept = [row for row in kept if row[0] < full['year'][recent]] + \
+                [tuple(full[name][i] for name in module.STATE_COLUMNS) for i in range(recent, len(full))]
+        expected = np.array(kept).T
+        self.assertEqual(len(recorded), len(kept))
+        self.assertLess(len(recorded), len(full))
+        for i, name in enumerate(module.STATE_COLUMNS):
+            np.testing.assert_array_equal(recorded[name], expected[i], err_msg=name)
+
+    def test_record_changes(self):
+        for model in SIMULATORS:
+            for tolerances, keep_recent in (({}, 0), ({}, 50), ({'temp_anomaly_c': 1e-3}, 0)):
+                with self.subTest(model=model, tolerances=tolerances, keep_recent=keep_recent):
+                    self.assert_record_changes(model, tolerances, keep_recent)
+
+    @unittest.skipIf(numba is None, "Numba is not installed")
+    def test_record_changes_jit_blocks(self):
+        for model in SIMULATORS:
+            module = load_model(model)
+            for block in (module.COMPILED_BLOCK_STEPS, 7, 1):
+                with self.subTest(model=model, block=block):
+                    self.patch(module, 'COMPILED_BLOCK_STEPS', block)
+                    self.assert_record_changes(model, {}, 0, jit=True)
+                    self.assert_record_changes(model, {}, 50, jit=True)
+
+    def test_record_changes_stream(self):
+        for model in SIMULATORS:
+            module = load_model(model)
+            simulation = getattr(module, SIMULATORS[model])
+            with self.subTest(model=model):
+                recorded = simulation(seed=3, end_year=END_YEAR).run(record_changes={})
+                streamed = list(simulation(seed=3, end_year=END_YEAR).run_iter(record_changes={}))
+                self.assertEqual(recorded.to_dicts(), module.SimulationResults(
+                    {name: [row[name] for row in streamed] for name in module.STATE_COLUMNS}).to_dicts())
+
+    def patch(self, module, name, value):
+        old = getattr(module, name)
+        setattr(module, name, value)
+        self.addCleanup(setattr, module, name, old)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Aftershock replay (asteroid, see STOCHASTIC_STATE): a seeded Euler run
+that reuses the memoized trajectory of another seed must give exactly the
+trajectory and final state of a full run, and only runs that ask for it
+(run(replay=True): sweeps, the server) may keep trajectories in the memo.
+
+  python -m pytest tests/test_replay.py
+"""
+
+import json
+import unittest
+import warnings
+
+import numpy as np
+
+from earth_sims import load_model
+
+SEEDS = (0, 1, 2, 3)
+END_YEAR = 500.0
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.module = load_model('asteroid')
+        self.module._cores.clear()
+        self.addCleanup(self.module._cores.clear)
+        # The default Euler steps overflow late in the run
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def simulator(self, **kwargs):
+        return self.module.AsteroidImpactEnhanced(end_year=END_YEAR, **kwargs)
+
+    def assert_replay_exact(self, **kwargs):
+        for seed in SEEDS:
+            with self.subTest(seed=seed, **kwargs):
+                full, replayed = self.simulator(seed=seed, **kwargs), self.simulator(seed=seed, **kwargs)
+                a = full.run()
+                self.simulator(seed=seed + 100, **kwargs).run(replay=True)
+                self.assertEqual(len(self.module._cores), 1)
+                b = replayed.run(replay=True)
+                self.assertEqual(len(a), len(b))
+                for name in self.module.STATE_COLUMNS:
+                    np.testing.assert_array_equal(b[name], a[name], err_msg=name)
+                self.assertEqual(json.dumps(replayed.snapshot()), json.dumps(full.snapshot()))
+
+    def test_step_aftershocks(self):
+        self.assert_replay_exact()
+
+    def test_poisson_aftershocks(self):
+        self.assert_replay_exact(aftershocks='poisson')
+
+    def test_continuation_after_replay(self):
+        full, replayed = self.simulator(seed=5), self.simulator(seed=5)
+        self.simulator(seed=6).run(replay=True)
+        full.run(), replayed.run(replay=True)
+        full.end_year = replayed.end_year = 2 * END_YEAR
+        a, b = full.run(), replayed.run(replay=True)
+        for name in self.module.STATE_COLUMNS:
+            np.testing.assert_array_equal(b[name], a[name], err_msg=name)
+
+    def test_plain_runs_keep_no_memo(self):
+        self.simulator(seed=1).run()
+        self.simulator(seed=2).run(output_times=[0.0, 10.0, 100.0])
+        self.assertEqual(self.module._cores, {})
+
+    def test_memo_is_bounded(self):
+        for diameter in range(1, self.module.CORE_MEMO_SIZE + 3):
+            self.simulator(seed=0, diameter=float(diameter)).run(replay=True)
+        self.assertEqual(len(self.module._cores), self.module.CORE_MEMO_SIZE)
+
+    def test_check_replay(self):
+        self.assertTrue(self.module.check_replay(seeds=(0, 1), end_year=END_YEAR))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Columnar results (earth_sims.recording, both models): run() records into a
+float64 buffer, and to_dicts() must give back exactly the rounded row
+dicts run() used to return, one get_state() per step.
+
+The Euler runs use dt_final = 1 year: with the default 10-year steps the
+temperature relaxation blows up late in the run, and rounding such values
+is not a test of the recording.
+
+  python -m pytest tests/test_results.py
+"""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from earth_sims import load_model, recording
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+END_YEAR = 3000.0
+
+
+def old_rows(module, rows):
+    """The rows as run() returned them before the columnar buffer: get_state() of each step."""
+    return [{name: round(row[name], module.STATE_ROUNDING[name]) for name in module.STATE_COLUMNS}
+            for row in rows]
+
+
+class ResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def test_to_dicts_is_the_old_rows(self):
+        for model, module, simulation in self.models():
+            for options in ({'dt_final': 1.0}, {'dt_final': 1.0, 'aftershocks': 'poisson'},
+                            {'integrator': 'adaptive'}, {'integrator': 'multirate'}):
+                with self.subTest(model=model, **options):
+                    results = simulation(seed=0, end_year=END_YEAR, **options).run()
+                    rows = list(simulation(seed=0, end_year=END_YEAR, **options).run_iter())
+                    self.assertIsInstance(results, module.SimulationResults)
+                    self.assertEqual(results.columns, list(module.STATE_COLUMNS))
+                    self.assertEqual(results.to_dicts(), old_rows(module, rows))
+                    self.assertEqual(results.to_dicts(rounded=False), rows)
+                    self.assertEqual([results.row(i, rounded=True) for i in (0, -1)],
+                                     old_rows(module, [rows[0], rows[-1]]))
+                    self.assertEqual(list(results), rows)
+
+    def test_get_state_is_a_row(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                sim = simulation(seed=0, end_year=END_YEAR, dt_final=1.0)
+                results = sim.run()
+                self.assertEqual(results.row(-1, rounded=True), sim.get_state(sim.time))
+
+    def test_recorder_grows(self):
+        rows = np.arange(30.0).reshape(10, 3)
+        for capacity in (1, 4, 10, 64):
+            with self.subTest(capacity=capacity):
+                recorder = recording.ResultRecorder(('year', 'a', 'b'), capacity=capacity)
+                for row in rows:
+                    recorder.append(tuple(row))
+                results = recorder.results()
+                self.assertEqual(len(recorder), 10)
+                np.testing.assert_array_equal(np.array([results[name] for name in results.columns]),
+                                              rows.T)
+                # Unrounded: the base class has no output rounding
+                self.assertEqual(results.rounded_columns()['a'], rows[:, 1].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
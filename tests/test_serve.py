@@ -0,0 +1,164 @@
+"""
+The local simulation server (earth_sims.serve) on a pool of two warm
+workers: responses must be the NDJSON the simulators write themselves,
+bad requests a 400 before any row, and the runs stream back as they finish.
+A worker that dies costs a pool restart, not the requests.
+
+  python -m pytest tests/test_serve.py
+"""
+
+import http.client
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from earth_sims import load_model, serve
+
+END_YEAR = 300.0
+# Scenarios with this end_year kill the worker that runs them (see dying_run_group())
+DYING_YEAR = 123.0
+run_group = serve.run_group
+
+
+def dying_run_group(model, scenarios, *args):
+    if any(params.get('end_year') == DYING_YEAR for params in scenarios):
+        os._exit(1)
+    return run_group(model, scenarios, *args)
+
+
+class ServeTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.service = serve.SimulationService(workers=2, cache_dir=cls.tmp.name)
+        cls.service.start()
+        cls.server = serve.make_server(cls.service, port=0)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def post(self, path: str, request) -> tuple:
+        connection = http.client.HTTPConnection(*self.server.server_address[:2], timeout=120)
+        self.addCleanup(connection.close)
+        connection.request('POST', path, json.dumps(request))
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def expected_ndjson(self, model: str, params, **options) -> bytes:
+        module = load_model(model)
+        simulation = getattr(module, serve.SERVE_MODELS[model][0])
+        path = Path(self.tmp.name) / 'expected.ndjson'
+        module.write_ndjson(simulation(**params).run(**options), path)
+        return path.read_bytes()
+
+    def test_run_is_the_simulators_ndjson(self):
+        for model, params in (('asteroid', {'diameter': 8.0, 'seed': 1, 'end_year': END_YEAR}),
+                              ('supervolcano', {'volume': 700.0, 'seed': 2, 'end_year': END_YEAR})):
+            with self.subTest(model=model):
+                for attempt in ('computed', 'cached'):
+                    status, body = self.post('/run', {'model': model, 'params': params})
+                    self.assertEqual(status, 200)
+                    self.assertEqual(body, self.expected_ndjson(model, params), attempt)
+
+    def test_run_output_times(self):
+        params = {'seed': 3, 'end_year': END_YEAR}
+        status, body = self.post('/run', {'model': 'asteroid', 'params': params,
+                                          'output_times': [0, 10, 100, 250]})
+        self.assertEqual(status, 200)
+        times = load_model('asteroid').parse_output_times('0,10,100,250')
+        self.assertEqual(body, self.expected_ndjson('asteroid', params, output_times=times))
+
+    def test_batch(self):
+        scenarios = [{'volume': volume, 'seed': seed, 'end_year': END_YEAR}
+                     for seed, volume in enumerate((300.0, 1000.0, 2500.0))]
+        scenarios.append({'volume': 400.0, 'seed': 9, 'end_year': END_YEAR, 'integrator': 'multirate'})
+        status, body = self.post('/batch', {'model': 'supervolcano', 'scenarios': scenarios})
+        self.assertEqual(status, 200)
+        rows = {}
+        for line in body.decode().splitlines():
+            row = json.loads(line)
+            rows.setdefault(row.pop('scenario'), []).append(row)
+        self.assertEqual(sorted(rows), list(range(len(scenarios))))
+        for i, params in enumerate(scenarios):
+            expected = [json.loads(line) for line in self.expected_ndjson('supervolcano', params).splitlines()]
+            self.assertEqual(len(rows[i]), len(expected))
+            # Ensemble members agree with the scalar runs to rounding
+            for name in expected[0]:
+                np.testing.assert_allclose([r[name] for r in rows[i]], [r[name] for r in expected],
+                                           rtol=1e-6, atol=1e-9, err_msg=f'{i} {name}')
+
+    def test_bad_requests(self):
+        for path, request in (('/run', {'model': 'comet'}),
+                              ('/run', {'model': 'asteroid', 'params': {'integrator': 'rk4'}}),
+                              ('/run', {'model': 'asteroid', 'params': {'colour': 'red'}}),
+                              ('/batch', {'model': 'asteroid'}),
+                              ('/run', {'model': 'asteroid', 'output_times': [1], 'record_changes': {}})):
+            with self.subTest(request=request):
+                status, body = self.post(path, request)
+                self.assertEqual(status, 400)
+                self.assertIn('error', json.loads(body))
+
+    def test_results_as_they_complete(self):
+        # A cached scenario comes first, whatever its place in the batch
+        cached = {'diameter': 5.0, 'seed': 11, 'end_year': END_YEAR}
+        self.assertEqual(self.post('/run', {'model': 'asteroid', 'params': cached})[0], 200)
+        runs = self.service.run('asteroid', [{'diameter': 6.0, 'seed': 12, 'end_year': END_YEAR,
+                                              'integrator': 'multirate'}, cached])
+        self.assertEqual([i for i, _ in runs], [1, 0])
+
+    def test_worker_death(self):
+        params = {'diameter': 9.0, 'seed': 21, 'end_year': END_YEAR}
+        pool = self.service.pool
+        os.kill(next(iter(pool._processes)), signal.SIGKILL)
+        status, body = self.post('/run', {'model': 'asteroid', 'params': params})
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.expected_ndjson('asteroid', params))
+        self.assertIsNot(self.service.pool, pool)
+        self.assertEqual(self.post('/run', {'model': 'asteroid', 'params': {'end_year': 10.0}})[0], 200)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork',
+                         "the workers must inherit the patched run_group")
+    def test_task_that_keeps_killing_its_worker(self):
+        self.addCleanup(setattr, serve, 'run_group', run_group)
+        serve.run_group = dying_run_group
+        with serve.SimulationService(workers=1, cache=False) as service:
+            runs = service.run('supervolcano', [{'seed': 1, 'end_year': 10.0},
+                                                {'seed': 1, 'end_year': DYING_YEAR, 'integrator': 'multirate'}])
+            with self.assertRaises(serve.BrokenProcessPool):
+                list(runs)
+            # Reported once; the next request gets a new pool
+            pool = service.pool
+            self.assertEqual([i for i, _ in service.run('supervolcano', [{'seed': 1, 'end_year': 10.0}])], [0])
+            self.assertIsNot(service.pool, pool)
+
+    def test_health(self):
+        connection = http.client.HTTPConnection(*self.server.server_address[:2], timeout=30)
+        self.addCleanup(connection.close)
+        connection.request('GET', '/health')
+        health = json.loads(connection.getresponse().read())
+        self.assertEqual(health['workers'], 2)
+        self.assertEqual(health['models'], list(serve.SERVE_MODELS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Checkpoint, resume and fork (both models): a run continued from its
+checkpoint file must produce exactly the rows and final state of the same
+run continued in memory, and a fork must continue as the run it was
+copied from.  Euler and multirate runs must also match the run that never
+stopped; adaptive steps and Poisson aftershocks are laid out up to
+end_year, so an extended run is an equally valid but different draw.
+
+  python -m pytest tests/test_snapshot.py
+"""
+
+import json
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from earth_sims import load_model
+
+try:
+    import numba  # noqa: F401
+except ImportError:
+    numba = None
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+SPLIT_YEAR = 700.0
+END_YEAR = 2000.0
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def simulators(self):
+        for model, name in SIMULATORS.items():
+            yield model, load_model(model), getattr(load_model(model), name)
+
+    def assert_rows(self, parts, expected):
+        for name in expected.columns:
+            np.testing.assert_array_equal(np.concatenate([part[name] for part in parts]),
+                                          expected[name], err_msg=name)
+
+    def assert_same_state(self, a, b):
+        self.assertEqual(json.dumps(a.snapshot(), sort_keys=True), json.dumps(b.snapshot(), sort_keys=True))
+
+    def test_resume_from_checkpoint(self):
+        for options, unbroken in (({}, True), ({'integrator': 'multirate'}, True),
+                                  ({'aftershocks': 'poisson'}, False),
+                                  ({'integrator': 'adaptive'}, False)):
+            for model, module, simulation in self.simulators():
+                with self.subTest(model=model, **options):
+                    checkpoint = self.tmp / f'{model}.json'
+                    first = simulation(seed=1, end_year=SPLIT_YEAR, **options).run(checkpoint, 100.0)
+                    resumed = simulation.load_snapshot(checkpoint)
+                    in_memory = simulation(seed=1, end_year=SPLIT_YEAR, **options)
+                    self.assert_rows([in_memory.run()], first)
+                    resumed.end_year = in_memory.end_year = END_YEAR
+                    rest = resumed.run()
+                    self.assert_rows([rest], in_memory.run())
+                    self.assert_same_state(resumed, in_memory)
+                    if unbroken:
+                        full = simulation(seed=1, end_year=END_YEAR, **options)
+                        self.assert_rows([first, rest], full.run())
+                        self.assert_same_state(resumed, full)
+
+    @unittest.skipIf(numba is None, "Numba is not installed")
+    def test_resume_jit(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                full = simulation(seed=2, end_year=END_YEAR, jit=True)
+                expected = full.run()
+                sim = simulation(seed=2, end_year=SPLIT_YEAR, jit=True)
+                first = sim.run()
+                sim.end_year = END_YEAR
+                self.assert_rows([first, sim.run()], expected)
+                self.assert_same_state(sim, full)
+
+    def test_resume_after_interruption(self):
+        # A streamed run that stops part way resumes from its last periodic checkpoint
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                expected = simulation(seed=3, end_year=END_YEAR).run()
+                checkpoint = self.tmp / f'{model}_stream.json'
+                for row in simulation(seed=3, end_year=END_YEAR).run_iter(checkpoint, 250.0):
+                    if row['year'] > 1100.0:
+                        break
+                resumed = simulation.load_snapshot(checkpoint)
+                split = resumed.time
+                self.assertTrue(250.0 <= split <= 1100.0)
+                rest = resumed.run()
+                before = expected['year'] <= split
+                self.assertEqual(rest['year'][0], expected['year'][before.sum()])
+                for name in expected.columns:
+                    np.testing.assert_array_equal(rest[name], expected[name][~before], err_msg=name)
+
+    def test_snapshot_round_trip(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                sim = simulation(seed=4, end_year=SPLIT_YEAR, aftershocks='poisson')
+                sim.run()
+                restored = simulation.from_snapshot(json.loads(json.dumps(sim.snapshot())))
+                self.assert_same_state(restored, sim)
+                sim.end_year = restored.end_year = END_YEAR
+                self.assert_rows([restored.run()], sim.run())
+
+    def test_fork(self):
+        for model, module, simulation in self.simulators():
+            with self.subTest(model=model):
+                prefix = simulation(seed=5, end_year=SPLIT_YEAR)
+                prefix.run()
+                same, reseeded = prefix.fork(end_year=END_YEAR), prefix.fork(seed=6, end_year=END_YEAR)
+                self.assertEqual(prefix.end_year, SPLIT_YEAR)
+                prefix.end_year = END_YEAR
+                expected = prefix.run()
+                self.assert_rows([same.run()], expected)
+                self.assert_same_state(same, prefix)
+                other = reseeded.run()
+                np.testing.assert_array_equal(other['year'], expected['year'])
+                self.assertNotEqual(reseeded.rng.random(), prefix.rng.random())
+
+    def test_bad_snapshots(self):
+        asteroid, volcano = (getattr(load_model(m), n) for m, n in SIMULATORS.items())
+        with self.assertRaises(ValueError):
+            volcano.from_snapshot(asteroid(seed=0).snapshot())
+        snapshot = asteroid(seed=0).snapshot()
+        snapshot['format_version'] = -1
+        with self.assertRaises(ValueError):
+            asteroid.from_snapshot(snapshot)
+        with self.assertRaises(ValueError):
+            asteroid(seed=0).fork(colour='red')
+
+
+if __name__ == '__main__':
+    unittest.main()
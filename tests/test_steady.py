@@ -0,0 +1,89 @@
+"""
+Steady-state fast-forward (steady_tol, both models): a run that stops
+stepping once steady must reach the same output times and the same loop
+position as the run that steps all the way, with the watched variables
+within STEADY_RTOL and the aftershocks (the same rng draws) exact.
+
+The stepped reference uses dt_final = 1 year: the default 10-year Euler
+steps are unstable on the temperature relaxation late in the run, which
+the fast-forward is not.  For the default steps the reference is the
+adaptive integrator.
+
+  python -m pytest tests/test_steady.py
+"""
+
+import unittest
+import warnings
+
+import numpy as np
+
+from earth_sims import load_model
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+END_YEAR = 2e4
+OUTPUT_TIMES = np.linspace(0.0, END_YEAR, 21)
+STEADY_RTOL = 1e-3
+
+
+class SteadyStateTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def assert_close(self, module, actual, expected):
+        """The watched columns within STEADY_RTOL of their magnitude (STEADY_SCALE at least)."""
+        for name, scale in zip(module.STEADY_COLUMNS, module.STEADY_SCALE):
+            error = np.abs(actual[name] - expected[name]) / np.maximum(np.abs(expected[name]), scale)
+            self.assertLess(error.max(), STEADY_RTOL, name)
+
+    def test_matches_the_stepped_run(self):
+        for aftershocks in ('step', 'poisson'):
+            for model, module, simulation in self.models():
+                with self.subTest(model=model, aftershocks=aftershocks):
+                    options = dict(seed=0, end_year=END_YEAR, dt_final=1.0, aftershocks=aftershocks)
+                    stepped = simulation(**options)
+                    expected = stepped.run(output_times=OUTPUT_TIMES)
+                    steady = simulation(steady_tol=module.STEADY_TOL, **options)
+                    with self.assertLogs(level='INFO') as logs:
+                        results = steady.run(output_times=OUTPUT_TIMES)
+                    self.assertIn('fast-forwarded', '\n'.join(logs.output))
+                    np.testing.assert_array_equal(results['year'], expected['year'])
+                    self.assert_close(module, results, expected)
+                    np.testing.assert_array_equal(results['subsurface_habitat_fraction'],
+                                                  expected['subsurface_habitat_fraction'])
+                    for name in ('time', 'dt', 'last_quake_time', 'quake_times'):
+                        self.assertEqual(getattr(steady, name), getattr(stepped, name), name)
+                    self.assertEqual(steady.rng.random(), stepped.rng.random())
+
+    def test_matches_adaptive(self):
+        for model, module, simulation in self.models():
+            with self.subTest(model=model):
+                expected = simulation(seed=0, end_year=END_YEAR,
+                                      integrator='adaptive').run(output_times=OUTPUT_TIMES)
+                results = simulation(seed=0, end_year=END_YEAR,
+                                     steady_tol=module.STEADY_TOL).run(output_times=OUTPUT_TIMES)
+                # The Euler grid stops short of end_year, the adaptive run lands on it
+                expected = {name: expected[name][:len(results)] for name in module.STEADY_COLUMNS}
+                self.assert_close(module, results, expected)
+
+    def test_needs_the_python_euler_loop(self):
+        for model, module, simulation in self.models():
+            for options in ({'integrator': 'adaptive'}, {'integrator': 'multirate'}, {'jit': True},
+                            {'steady_tol': 0.0}):
+                with self.subTest(model=model, **options), self.assertRaises(ValueError):
+                    simulation(**{'steady_tol': module.STEADY_TOL, **options})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Streaming (run_iter() and the stream writers of earth_sims.writers, both
+models): run_iter() must yield exactly the rows run() records, on every
+integrator and recording policy, and a file streamed row by row must be
+byte for byte the file write_csv()/write_ndjson() make of the finished run.
+
+The Euler runs use dt_final = 1 year (see tests/test_results.py).
+
+  python -m pytest tests/test_streaming.py
+"""
+
+import io
+import json
+import tempfile
+import unittest
+import warnings
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import numpy as np
+
+from earth_sims import load_model
+
+try:
+    import scipy  # noqa: F401
+except ImportError:
+    scipy = None
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+END_YEAR = 1000.0
+TIMES = np.linspace(0.0, END_YEAR, 21)
+OPTIONS = [
+    {'dt_final': 1.0},
+    {'dt_final': 1.0, 'aftershocks': 'poisson'},
+    {'integrator': 'adaptive', 'end_year': 20.0},      # thousands of small steps
+    {'integrator': 'multirate'},
+]
+RECORDING = [{}, {'output_times': TIMES}, {'record_changes': {}}]
+
+
+class StreamingTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def models(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            yield model, module, getattr(module, name)
+
+    def assert_streams_run(self, module, simulation, options, recording):
+        options = {'seed': 0, 'end_year': END_YEAR, **options}
+        results = simulation(**options).run(**recording)
+        rows = list(simulation(**options).run_iter(**recording))
+        self.assertEqual(list(results), rows)
+        return results, rows
+
+    def test_run_iter_rows(self):
+        for model, module, simulation in self.models():
+            for options in OPTIONS:
+                for recording in RECORDING:
+                    with self.subTest(model=model, **options, recording=list(recording)):
+                        self.assert_streams_run(module, simulation, options, recording)
+
+    @unittest.skipIf(scipy is None, "SciPy is not installed")
+    def test_run_iter_rows_ivp(self):
+        for model, module, simulation in self.models():
+            for recording in RECORDING:
+                with self.subTest(model=model, recording=list(recording)):
+                    self.assert_streams_run(module, simulation, {'integrator': 'ivp'}, recording)
+
+    def test_streamed_files(self):
+        for model, module, simulation in self.models():
+            for recording in RECORDING:
+                with self.subTest(model=model, recording=list(recording)):
+                    results, rows = self.assert_streams_run(module, simulation, {'dt_final': 1.0},
+                                                            recording)
+                    module.write_csv(results, self.tmp / 'batch.csv')
+                    module.write_ndjson(results, self.tmp / 'batch.ndjson')
+                    for writer_cls, suffix in ((module.CsvStreamWriter, '.csv'),
+                                               (module.NdjsonStreamWriter, '.ndjson')):
+                        with writer_cls(self.tmp / f'streamed{suffix}') as writer:
+                            for row in rows:
+                                writer.write(row)
+                        self.assertEqual(writer.rows, len(results))
+                        self.assertEqual((self.tmp / f'streamed{suffix}').read_bytes(),
+                                         (self.tmp / f'batch{suffix}').read_bytes(), suffix)
+                    # JSON holds the same rounded rows
+                    module.write_json(results, self.tmp / 'batch.json')
+                    with open(self.tmp / 'batch.json') as f:
+                        self.assertEqual(json.load(f), results.to_dicts())
+
+    def test_stdout(self):
+        module = load_model('asteroid')
+        rows = list(module.AsteroidImpactEnhanced(seed=0, end_year=100.0).run_iter())
+        with redirect_stdout(io.StringIO()) as out:
+            with module.NdjsonStreamWriter('-') as writer:
+                self.assertEqual(writer.flush_every, 1)
+                for row in rows:
+                    writer.write(row)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [dict(zip(writer.columns, writer._rounded(row))) for row in rows])
+        self.assertEqual(list(json.loads(lines[0])), list(module.STATE_COLUMNS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Parameter sweeps (earth_sims.sweep, both models): --sweep specs must expand
+to the Cartesian grid in spec order, and a two-worker sweep must write each
+scenario to its sharded scenario_dir() and index every run, in grid order,
+with the same results as the scenarios run one after another.
+
+  python -m pytest tests/test_sweep.py
+"""
+
+import json
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+from earth_sims import load_model
+from earth_sims.sweep import run_sweep, scenario_dir
+
+MODELS = ('asteroid', 'supervolcano')
+SPECS = ('--sweep', 'seed=0,1', '--sweep', 'dt-final=5:10:5')
+GRID = [(0, 5.0), (0, 10.0), (1, 5.0), (1, 10.0)]
+
+
+class SweepTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def test_expand_sweep(self):
+        for model in MODELS:
+            module = load_model(model)
+            with self.subTest(model=model):
+                base = {'seed': None, 'dt_final': 10.0, 'end_year': 300.0}
+                scenarios = module.expand_sweep(base, ['seed=0:1', 'dt-final=5,10'])
+                self.assertEqual([(p['seed'], p['dt_final']) for p in scenarios], GRID)
+                self.assertTrue(all(type(p['seed']) is int and type(p['dt_final']) is float
+                                    for p in scenarios))
+                self.assertTrue(all(p['end_year'] == 300.0 for p in scenarios))
+                self.assertEqual(base['seed'], None)
+                self.assertEqual(module.expand_sweep(base, []), [base])
+                for spec in ('end_year=1,2', 'seed', 'integrator=leapfrog', 'seed=0:1:0'):
+                    with self.assertRaises(ValueError, msg=spec):
+                        module.expand_sweep(base, [spec])
+
+    def test_two_workers(self):
+        for model in MODELS:
+            module = load_model(model)
+            with self.subTest(model=model):
+                out = self.tmp / model
+                with self.assertLogs(level='INFO'):
+                    module.main(['--years', '0', '300', '--output-dir', str(out), '--output', 'run',
+                                 '--format', 'csv', '--no-cache', '--workers', '2', *SPECS])
+                root = out / 'run_sweep'
+                with open(root / 'index.json') as f:
+                    index = json.load(f)
+                runs = index['runs']
+                self.assertEqual(index['n_runs'], 4)
+                self.assertEqual(index['telemetry']['workers'], 2)
+                self.assertEqual([(r['params']['seed'], r['params']['dt_final']) for r in runs], GRID)
+                # Only the swept parameters differ between the runs
+                base = {k: v for k, v in runs[0]['params'].items() if k not in ('seed', 'dt_final')}
+                for run in runs:
+                    self.assertLessEqual(base.items(), run['params'].items())
+                # Each run is in its sharded directory, indexed relative to the sweep root
+                paths = [root / run['path'] for run in runs]
+                self.assertEqual(paths, [scenario_dir(root, run['params']) for run in runs])
+                self.assertEqual(len(set(paths)), 4)
+                self.assertEqual(sorted(p.name for p in root.iterdir()),
+                                 sorted({p.parent.name for p in paths} | {'index.json'}))
+                for path in paths:
+                    self.assertEqual(path.parent.name, path.name[:2])
+                    self.assertEqual(sorted(f.name for f in path.iterdir()),
+                                     ['run.csv', 'run_metadata.json'])
+                # The same scenarios run in this process give the same files and final rows
+                serial = self.tmp / f'{model}_serial'
+                with self.assertLogs(level='INFO'):
+                    run_sweep(module.run_scenario, [run['params'] for run in runs], serial, 'run',
+                              'csv', workers=1)
+                with open(serial / 'index.json') as f:
+                    expected = json.load(f)['runs']
+                self.assertEqual([r['path'] for r in runs], [r['path'] for r in expected])
+                self.assertEqual([r['final'] for r in runs], [r['final'] for r in expected])
+                for run in runs:
+                    self.assertEqual((root / run['path'] / 'run.csv').read_bytes(),
+                                     (serial / run['path'] / 'run.csv').read_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Run telemetry (earth_sims.telemetry, both models): every run's
+<output>_metadata.json and a sweep's index.json must carry the telemetry
+keys, with step counts that add up and the sizes of the files written.
+
+  python -m pytest tests/test_telemetry.py
+"""
+
+import json
+import tempfile
+import tracemalloc
+import unittest
+import warnings
+from pathlib import Path
+
+from earth_sims import load_model
+
+MODELS = ('asteroid', 'supervolcano')
+RUN_KEYS = {'steps', 'accepted_steps', 'rejected_steps', 'cache_hit', 'wall_seconds',
+            'steps_per_second', 'output_bytes', 'peak_rss_bytes', 'peak_traced_bytes',
+            'versions', 'cpu_count'}
+SWEEP_KEYS = {'workers', 'wall_seconds', 'simulation_seconds', 'steps', 'cache_hits',
+              'runs_per_second', 'steps_per_second', 'output_bytes', 'peak_rss_bytes',
+              'peak_traced_bytes', 'versions', 'cpu_count'}
+HOST_KEYS = {'python', 'numpy', 'scipy', 'numba'}
+
+
+class TelemetryTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def run_main(self, model: str, *argv) -> Path:
+        out = self.tmp / model
+        with self.assertLogs(level='INFO'):
+            load_model(model).main(['--years', '0', '300', '--output-dir', str(out), '--output', 'run',
+                                    *argv])
+        return out
+
+    def metadata(self, path: Path) -> dict:
+        with open(path) as f:
+            return json.load(f)
+
+    def test_run_metadata(self):
+        for model in MODELS:
+            for integrator in ('euler', 'adaptive'):
+                with self.subTest(model=model, integrator=integrator):
+                    out = self.run_main(model, '--format', 'all', '--no-cache', '--integrator', integrator)
+                    telemetry = self.metadata(out / 'run_metadata.json')['telemetry']
+                    self.assertEqual(set(telemetry), RUN_KEYS)
+                    self.assertEqual(set(telemetry['versions']), HOST_KEYS)
+                    self.assertEqual(set(telemetry['wall_seconds']),
+                                     {'simulation', 'write_csv', 'write_html', 'write_json', 'total'})
+                    self.assertEqual(telemetry['output_bytes'],
+                                     {fmt: (out / f'run.{fmt}').stat().st_size
+                                      for fmt in ('csv', 'html', 'json')})
+                    self.assertEqual(telemetry['steps'],
+                                     telemetry['accepted_steps'] + telemetry['rejected_steps'])
+                    self.assertGreater(telemetry['steps'], 0)
+                    if integrator == 'euler':
+                        self.assertEqual(telemetry['rejected_steps'], 0)
+                    self.assertFalse(telemetry['cache_hit'])
+                    self.assertGreater(telemetry['peak_rss_bytes'], 0)
+                    self.assertIsNone(telemetry['peak_traced_bytes'])
+
+    def test_cache_hit(self):
+        for model in MODELS:
+            with self.subTest(model=model):
+                argv = ('--format', 'csv', '--seed', '1', '--cache-dir', str(self.tmp / 'cache'))
+                first = self.metadata(self.run_main(model, *argv) / 'run_metadata.json')['telemetry']
+                again = self.metadata(self.run_main(model, *argv) / 'run_metadata.json')['telemetry']
+                self.assertFalse(first['cache_hit'])
+                self.assertTrue(again['cache_hit'])
+                self.assertEqual((again['steps'], again['accepted_steps'], again['rejected_steps']),
+                                 (0, 0, 0))
+                self.assertEqual(again['output_bytes'], first['output_bytes'])
+
+    def test_sweep_index(self):
+        self.addCleanup(tracemalloc.stop)        # --trace-memory starts it in this process too
+        for model in MODELS:
+            with self.subTest(model=model):
+                out = self.run_main(model, '--format', 'csv', '--no-cache', '--sweep', 'seed=0,1',
+                                    '--workers', '1', '--trace-memory')
+                index = self.metadata(out / 'run_sweep' / 'index.json')
+                telemetry = index['telemetry']
+                self.assertEqual(set(telemetry), SWEEP_KEYS)
+                self.assertEqual(set(telemetry['versions']), HOST_KEYS)
+                runs = [entry['metadata']['telemetry'] for entry in index['runs']]
+                self.assertEqual(len(runs), 2)
+                for run in runs:
+                    self.assertEqual(set(run), RUN_KEYS)
+                    self.assertGreater(run['peak_traced_bytes'], 0)
+                self.assertEqual(telemetry['workers'], 1)
+                self.assertEqual(telemetry['steps'], sum(run['steps'] for run in runs))
+                self.assertEqual(telemetry['cache_hits'], 0)
+                self.assertEqual(telemetry['output_bytes'],
+                                 {'csv': sum(run['output_bytes']['csv'] for run in runs)})
+                self.assertEqual(telemetry['peak_traced_bytes'],
+                                 max(run['peak_traced_bytes'] for run in runs))
+                self.assertAlmostEqual(telemetry['simulation_seconds'],
+                                       sum(run['wall_seconds']['simulation'] for run in runs))
+
+
+if __name__ == '__main__':
+    unittest.main()
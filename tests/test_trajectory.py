@@ -0,0 +1,124 @@
+"""
+The .npy trajectory format (earth_sims.trajectory, both models): write_npy()
+must store every column unrounded with its header and metadata after the
+array, Trajectory must read it through a memory map, and convert_to_npy()
+must turn CSV/JSON outputs into the same trajectories.
+
+  python -m pytest tests/test_trajectory.py
+"""
+
+import json
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from earth_sims import load_model, trajectory
+
+SIMULATORS = {
+    'asteroid': 'AsteroidImpactEnhanced',
+    'supervolcano': 'SupervolcanoEnhanced',
+}
+END_YEAR = 1000.0
+METADATA = {'seed': 4, 'note': 'round trip', 'telemetry': {'steps': 12}}
+
+
+class TrajectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        caught = warnings.catch_warnings()
+        caught.__enter__()
+        self.addCleanup(caught.__exit__, None, None, None)
+        warnings.simplefilter('ignore', RuntimeWarning)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    def runs(self):
+        for model, name in SIMULATORS.items():
+            module = load_model(model)
+            results = getattr(module, name)(seed=4, end_year=END_YEAR, dt_final=1.0).run()
+            yield model, module, results
+
+    def test_header_round_trip(self):
+        for model, module, results in self.runs():
+            with self.subTest(model=model):
+                path = self.tmp / f'{model}.npy'
+                module.write_npy(results, path, METADATA)
+                traj = module.open_trajectory(path)
+                self.assertEqual(traj.header, {
+                    'format_version': trajectory.NPY_FORMAT_VERSION,
+                    'columns': list(module.STATE_COLUMNS),
+                    'rows': len(results),
+                    'metadata': METADATA,
+                })
+                self.assertEqual(traj.metadata, METADATA)
+                # A plain .npy: np.load ignores the header after the array
+                data = np.load(path)
+                self.assertEqual(data.shape, ())
+                self.assertEqual(data.dtype.names, tuple(module.STATE_COLUMNS))
+                with open(path, 'rb') as f:
+                    f.seek(traj.data.offset + traj.data.nbytes)
+                    self.assertEqual(json.loads(f.read()), traj.header)
+                # No metadata and row dicts are written too
+                module.write_npy(results.to_dicts(rounded=False), path)
+                self.assertEqual(module.open_trajectory(path).metadata, {})
+                with self.assertRaises(ValueError):
+                    module.write_npy(results.__class__({name: [] for name in results.columns}), path)
+
+    def test_memory_mapped_reads(self):
+        for model, module, results in self.runs():
+            with self.subTest(model=model):
+                path = self.tmp / f'{model}.npy'
+                module.write_npy(results, path)
+                traj = module.Trajectory(path)
+                self.assertIsInstance(traj.data, np.memmap)
+                self.assertEqual(traj.data.mode, 'r')
+                self.assertEqual((traj.columns, len(traj)), (results.columns, len(results)))
+                for name in results.columns:
+                    column = traj[name]
+                    # A view of the file's pages, unrounded
+                    self.assertFalse(column.flags.writeable)
+                    np.testing.assert_array_equal(column, results[name], err_msg=name)
+                np.testing.assert_array_equal(traj['co2_ppm'][10:20], results['co2_ppm'][10:20])
+                loaded = traj.results()
+                self.assertIsInstance(loaded, module.SimulationResults)
+                self.assertEqual(loaded.to_dicts(), results.to_dicts())
+                self.assertEqual(loaded.to_dicts(rounded=False), results.to_dicts(rounded=False))
+
+    def test_convert_csv_and_json(self):
+        for model, module, results in self.runs():
+            with self.subTest(model=model):
+                out = self.tmp / model
+                (out / 'nested').mkdir(parents=True)
+                module.write_csv(results, out / 'both.csv')
+                module.write_json(results, out / 'both.json')
+                module.write_json(results, out / 'nested' / 'json_only.json')
+                with open(out / 'both_metadata.json', 'w') as f:
+                    json.dump(METADATA, f)
+                with open(out / 'index.json', 'w') as f:
+                    json.dump([], f)
+                written = module.convert_to_npy(out)
+                self.assertEqual(written, [out / 'both.npy', out / 'nested' / 'json_only.npy'])
+                rounded = results.rounded_columns()
+                for path in written:
+                    traj = module.open_trajectory(path)
+                    self.assertEqual(traj.columns, results.columns)
+                    for name in results.columns:
+                        np.testing.assert_array_equal(traj[name], rounded[name], err_msg=name)
+                self.assertEqual(module.open_trajectory(out / 'both.npy').metadata, METADATA)
+                self.assertEqual(module.open_trajectory(written[1]).metadata, {})
+                # A single file, and what read_output() makes of it
+                (out / 'both.csv').rename(out / 'single.csv')
+                self.assertEqual(module.convert_to_npy(out / 'single.csv'), [out / 'single.npy'])
+                read = module.read_output(out / 'single.csv')
+                self.assertIsInstance(read, module.SimulationResults)
+                self.assertEqual(read.to_dicts(), results.to_dicts())
+                with self.assertRaises(ValueError):
+                    module.read_output(out / 'single.npy')
+
+
+if __name__ == '__main__':
+    unittest.main()